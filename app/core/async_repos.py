@@ -0,0 +1,104 @@
+""" async versions of the hot read queries in repos\n
+- every function takes an AsyncSession or a ThreadedSession (see async_session) and awaits one statement\n
+- results match their sync counterparts in repos, so endpoints can switch without changing responses"""
+
+from __future__ import annotations
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.core.async_session import AnySession
+from app.core.auth_tokens import decode_access_token
+from app.core.db import Accounts, Exercises, Workouts, menu_meals, workout_exercises
+from app.core.menu_features import PROTEINS, feature_mask
+
+
+async def lookup_account_by_token(sess: AnySession, authorization: str) -> Accounts:
+    """
+    hashed token decrypted to UserID then looks up and returns Accounts object if exists
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+
+    token = authorization.split(" ", 1)[1]
+    try:
+        user_id = decode_access_token(token)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid or expired access token")
+
+    user = await sess.get(Accounts, user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+
+async def restaurants_like(sess: AnySession, restaurant: str) -> list[str]:
+    """
+    chain names containing `restaurant`, case-insensitive, from the restaurant index
+    """
+    stmt = select(menu_meals.restaurant).distinct().where(menu_meals.restaurant.ilike(f"%{restaurant}%"))
+    result = await sess.scalars(stmt)
+    return list(result.all())
+
+
+async def lookup_menumeal_by_restaurant(sess: AnySession, restaurant: str) -> list[menu_meals]:
+    """
+    return menu_meals object(s) meeting criteria if exists
+    """
+    names = await restaurants_like(sess, restaurant)
+    if not names:
+        return []
+    result = await sess.scalars(select(menu_meals).where(menu_meals.restaurant.in_(names)))
+    return list(result.all())
+
+
+async def lookup_menumeal_by_protein(sess: AnySession, protein: str) -> list[menu_meals]:
+    """
+    return menu_meals object(s) meeting criteria if exists
+    """
+    if protein not in PROTEINS:
+        return []
+    return await lookup_menumeal_by_features(sess, [protein])
+
+
+async def lookup_menumeal_by_features(sess: AnySession, features: list[str], restaurant: str | None = None) -> list[menu_meals]:
+    """
+    return menu_meals object(s) that have every feature in `features`\n
+    features are bits in menu_meals.features, so this is one AND per row
+    """
+    try:
+        mask = feature_mask(*features)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+    stmt = select(menu_meals).where(menu_meals.features.op("&")(mask) == mask)
+    if restaurant:
+        stmt = stmt.where(menu_meals.restaurant.in_(await restaurants_like(sess, restaurant)))
+    result = await sess.scalars(stmt)
+    return list(result.all())
+
+
+async def workout_rows(sess: AnySession, profile_id: int) -> list[tuple]:
+    """
+    (WorkoutID, workout name, ExerciseID, exercise name, MachineID, sets, reps, weight, notes)
+    for every logged exercise of a profile, ordered by workout then exercise
+    """
+    stmt = (
+        select(
+            workout_exercises.WorkoutID,
+            Workouts.name,
+            workout_exercises.ExerciseID,
+            Exercises.name,
+            workout_exercises.MachineID,
+            workout_exercises.sets,
+            workout_exercises.reps,
+            workout_exercises.weight,
+            workout_exercises.notes,
+        )
+        .join(Workouts, Workouts.WorkoutID == workout_exercises.WorkoutID)
+        .join(Exercises, Exercises.ExerciseID == workout_exercises.ExerciseID)
+        .where(workout_exercises.ProfileID == profile_id)
+        .order_by(workout_exercises.WorkoutID, workout_exercises.ExerciseID)
+    )
+    result = await sess.execute(stmt)
+    return result.all()
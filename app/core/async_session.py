@@ -0,0 +1,152 @@
+""" optional async database path for I/O-bound read endpoints\n
+- with aiosqlite / asyncpg (and greenlet) installed, get_async_db() yields an AsyncSession on an async engine\n
+- that engine uses the same DATABASE_URL and DB_* settings as session.make_engine, with the driver swapped\n
+- without them it falls back to a ThreadedSession: the same awaitable calls, each statement one worker-thread call\n
+- DB_ASYNC [auto]: true requires the async driver, false always uses the thread fallback\n
+- async_repos holds the queries, written once against the AsyncSession API so they run on either"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+from typing import AsyncIterator, Callable, Optional, Union
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.session import DATABASE_URL, SessionLocal, _apply_sqlite_pragmas, engine_settings, sqlite_pragmas
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+except ImportError:                 # pragma: no cover - very old SQLAlchemy
+    AsyncEngine = AsyncSession = None
+
+# backend -> (async driver, module it needs)
+ASYNC_DRIVERS = {
+    "sqlite": ("aiosqlite", "aiosqlite"),
+    "postgresql": ("asyncpg", "asyncpg"),
+}
+
+
+def async_url(url: Optional[str] = None):
+    """url with its driver swapped for the async one, KeyError for a backend without one"""
+    url = make_url(url or DATABASE_URL)
+    driver, _ = ASYNC_DRIVERS[url.get_backend_name()]
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def async_available(url: Optional[str] = None) -> bool:
+    """an async driver for url's backend, and the greenlet bridge SQLAlchemy needs, are importable"""
+    backend = make_url(url or DATABASE_URL).get_backend_name()
+    if AsyncSession is None or backend not in ASYNC_DRIVERS:
+        return False
+    return all(importlib.util.find_spec(m) is not None for m in ("greenlet", ASYNC_DRIVERS[backend][1]))
+
+
+def async_enabled(url: Optional[str] = None) -> bool:
+    mode = os.getenv("DB_ASYNC", "auto").lower()
+    if mode in {"0", "false", "no"}:
+        return False
+    available = async_available(url)
+    if mode in {"1", "true", "yes"} and not available:
+        raise RuntimeError(f"DB_ASYNC={mode} but no async driver is installed for {make_url(url or DATABASE_URL).get_backend_name()}")
+    return available
+
+
+def make_async_engine(url: Optional[str] = None, **overrides) -> "AsyncEngine":
+    """
+    async twin of session.make_engine: same pool settings and sqlite pragmas. The statement
+    timeout reaches postgres as a server setting; aiosqlite has no progress handler, so none there.
+    """
+    url = async_url(url)
+    settings = engine_settings(**overrides)
+    timeout_ms = settings.pop("statement_timeout_ms")
+    performance = settings.pop("sqlite_performance")
+    pragma_overrides = settings.pop("sqlite_pragmas") or {}
+
+    sqlite = url.get_backend_name() == "sqlite"
+    in_memory = sqlite and url.database in (None, "", ":memory:")
+    connect_args = {}
+    if timeout_ms and not sqlite:
+        connect_args["server_settings"] = {"statement_timeout": str(int(timeout_ms))}
+    if in_memory:
+        engine = create_async_engine(url, pool_pre_ping=settings["pool_pre_ping"])
+    else:
+        engine = create_async_engine(url, connect_args=connect_args, **settings)
+    if sqlite and performance:
+        _apply_sqlite_pragmas(engine.sync_engine, sqlite_pragmas(**pragma_overrides), in_memory)
+    return engine
+
+
+class ThreadedSession:
+    """
+    the awaitable subset of AsyncSession that async_repos uses, for when no async driver is installed.
+    Each statement is one worker-thread call that opens a sync Session, runs, buffers the result
+    and closes, so a pooled connection is held only inside that call and never across an await:
+    any number of concurrent requests can share a small pool without deadlocking on it.
+    Read-only: nothing is committed, which is all the async endpoints need.
+    """
+
+    def __init__(self, factory: Callable[[], Session] = SessionLocal):
+        self.factory = factory
+
+    def _run(self, call: Callable[[Session], object]):
+        with self.factory() as sess:
+            return call(sess)
+
+    async def execute(self, statement, *args, **kwargs):
+        frozen = await asyncio.to_thread(self._run, lambda s: s.execute(statement, *args, **kwargs).freeze())
+        return frozen()
+
+    async def scalars(self, statement, *args, **kwargs):
+        return (await self.execute(statement, *args, **kwargs)).scalars()
+
+    async def scalar(self, statement, *args, **kwargs):
+        return (await self.execute(statement, *args, **kwargs)).scalar()
+
+    async def get(self, entity, ident, **kwargs):
+        return await asyncio.to_thread(self._run, lambda s: s.get(entity, ident, **kwargs))
+
+    async def commit(self) -> None:
+        """read-only, there is nothing to commit"""
+
+    async def rollback(self) -> None:
+        """nothing is left open to roll back"""
+
+    async def close(self) -> None:
+        """no session or connection outlives a statement"""
+
+
+AnySession = Union["AsyncSession", ThreadedSession]
+
+_engine: Optional["AsyncEngine"] = None
+_factory = None
+
+
+def get_async_engine() -> Optional["AsyncEngine"]:
+    """process-wide async engine, created on first use; None when the thread fallback is in use"""
+    global _engine, _factory
+    if _factory is None:
+        if async_enabled():
+            _engine = make_async_engine()
+            _factory = async_sessionmaker(_engine, expire_on_commit=False)
+        else:
+            _factory = ThreadedSession
+    return _engine
+
+
+async def get_async_db() -> AsyncIterator[AnySession]:
+    get_async_engine()
+    db = _factory()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def close_async_engine() -> None:
+    global _engine, _factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = _factory = None
@@ -0,0 +1,209 @@
+""" type-ahead for exercise names, machine names and usernames\n
+- every word start of every name is a key in a sorted array, a prefix is a bisect range\n
+- matches are ranked by popularity: uses in workout_exercises + session_exercises, sessions logged for users\n
+- top results for 1-2 character prefixes are precomputed and patched in place, those ranges are the widest\n
+- kept current incrementally (add / remove / bump) by the endpoints that write the sources"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Iterable, Mapping
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.db import (
+    Accounts, Exercises, Machines,
+    workout_exercises, session_exercises, session_workouts,
+)
+
+MAX_K = 25
+CACHE_DEPTH = 2
+KINDS = ("exercises", "machines", "usernames")
+
+
+def _keys(name: str) -> list[str]:
+    """the name from each word start on, lowercased: "Bench Press" -> bench press, press"""
+    text = " ".join(name.lower().split())
+    return [text[i:] for i in range(len(text)) if i == 0 or text[i - 1] == " "]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.entries: list[tuple[str, int]] = []   # (key, item id), sorted
+        self.names: dict[int, str] = {}
+        self.popularity: Counter = Counter()
+        self._top: dict[str, list[int]] = {}       # short prefix -> best MAX_K ids
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, item_id: int, name: str, popularity: int = 0) -> None:
+        """insert or rename; popularity only applies to new items"""
+        with self.lock:
+            if item_id in self.names:
+                if self.names[item_id] == name:
+                    return
+                self.remove(item_id, keep_popularity=True)
+            else:
+                self.popularity[item_id] = popularity
+            self.names[item_id] = name
+            for key in _keys(name):
+                insort(self.entries, (key, item_id))
+            self._touch(item_id)
+
+    def extend(self, rows: Iterable[tuple[int, str, int]]) -> None:
+        """bulk add of (id, name, popularity) for items not yet indexed, sorting once"""
+        with self.lock:
+            for item_id, name, popularity in rows:
+                self.names[item_id] = name
+                self.popularity[item_id] = popularity
+                self.entries.extend((key, item_id) for key in _keys(name))
+            self.entries.sort()
+            self._top.clear()
+            self._warm()
+
+    def remove(self, item_id: int, keep_popularity: bool = False) -> None:
+        with self.lock:
+            name = self.names.pop(item_id, None)
+            if name is None:
+                return
+            for key in _keys(name):
+                i = bisect_left(self.entries, (key, item_id))
+                if i < len(self.entries) and self.entries[i] == (key, item_id):
+                    del self.entries[i]
+            self._drop(name, item_id)
+            if not keep_popularity:
+                del self.popularity[item_id]
+
+    def bump(self, counts: Mapping[int, int]) -> None:
+        with self.lock:
+            for item_id, by in counts.items():
+                if item_id in self.names and by:
+                    if by < 0:
+                        self._drop(self.names[item_id], item_id)
+                    self.popularity[item_id] = max(0, self.popularity[item_id] + by)
+                    self._touch(item_id)
+
+    def _score(self, item_id: int) -> tuple:
+        return (-self.popularity[item_id], self.names[item_id].lower(), item_id)
+
+    def _short_prefixes(self, name: str) -> set[str]:
+        return {key[:n] for key in _keys(name) for n in range(1, CACHE_DEPTH + 1) if len(key) >= n}
+
+    def _warm(self) -> None:
+        """rank every cached (short) prefix in one pass over the entries"""
+        candidates: dict[str, set[int]] = {}
+        for key, item_id in self.entries:
+            for n in range(1, min(CACHE_DEPTH, len(key)) + 1):
+                candidates.setdefault(key[:n], set()).add(item_id)
+        self._top = {p: heapq.nsmallest(MAX_K, ids, key=self._score) for p, ids in candidates.items()}
+
+    def _touch(self, item_id: int) -> None:
+        """an item was added or gained popularity: merge it into the cached short-prefix lists"""
+        for prefix in self._short_prefixes(self.names[item_id]):
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            if item_id in top:
+                top.remove(item_id)
+            if len(top) < MAX_K or self._score(item_id) < self._score(top[-1]):
+                top.append(item_id)
+                top.sort(key=self._score)
+                del top[MAX_K:]
+
+    def _drop(self, name: str, item_id: int) -> None:
+        """an item is leaving or losing popularity: a full list holding it must be re-ranked"""
+        for prefix in self._short_prefixes(name):
+            top = self._top.get(prefix)
+            if top is not None and item_id in top:
+                if len(top) < MAX_K:
+                    top.remove(item_id)
+                else:
+                    del self._top[prefix]
+
+    def _rank(self, prefix: str, k: int) -> list[int]:
+        lo = bisect_left(self.entries, (prefix,))
+        hi = bisect_left(self.entries, (prefix + "\uffff",))
+        ids = {item_id for _, item_id in self.entries[lo:hi]}
+        return heapq.nsmallest(k, ids, key=self._score)
+
+    def complete(self, prefix: str, k: int = 10) -> list[dict]:
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        k = min(k, MAX_K)
+        with self.lock:
+            if len(prefix) <= CACHE_DEPTH:
+                if prefix not in self._top:
+                    self._top[prefix] = self._rank(prefix, MAX_K)
+                ids = self._top[prefix][:k]
+            else:
+                ids = self._rank(prefix, k)
+            return [{"id": i, "name": self.names[i], "uses": self.popularity[i]} for i in ids]
+
+
+class Autocomplete:
+    """one PrefixIndex per kind; the writers below are no-ops until load() has run"""
+
+    def __init__(self):
+        self.indexes = {kind: PrefixIndex() for kind in KINDS}
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self, sess: Session) -> "Autocomplete":
+        with self.lock:
+            uses = {
+                "exercises": _usage(sess, workout_exercises.ExerciseID) + _usage(sess, session_exercises.ExerciseID),
+                "machines": _usage(sess, workout_exercises.MachineID) + _usage(sess, session_exercises.MachineID),
+                "usernames": _usage(sess, session_workouts.ProfileID),
+            }
+            sources = {
+                "exercises": sess.query(Exercises.ExerciseID, Exercises.name),
+                "machines": sess.query(Machines.MachineID, Machines.name),
+                "usernames": sess.query(Accounts.UserID, Accounts.username),
+            }
+            indexes = {kind: PrefixIndex() for kind in KINDS}
+            for kind, rows in sources.items():
+                indexes[kind].extend((item_id, name, uses[kind][item_id]) for item_id, name in rows)
+            self.indexes = indexes
+            self.loaded = True
+        return self
+
+    def ensure_loaded(self, sess: Session) -> "Autocomplete":
+        if not self.loaded:
+            self.load(sess)
+        return self
+
+    def complete(self, kind: str, prefix: str, k: int = 10) -> list[dict]:
+        if kind not in self.indexes:
+            raise KeyError(kind)
+        return self.indexes[kind].complete(prefix, k)
+
+    def add(self, kind: str, item_id: int, name: str) -> None:
+        if self.loaded:
+            self.indexes[kind].add(item_id, name)
+
+    def remove(self, kind: str, item_id: int) -> None:
+        if self.loaded:
+            self.indexes[kind].remove(item_id)
+
+    def bump(self, kind: str, ids: Iterable[int], by: int = 1) -> None:
+        if self.loaded:
+            counts = Counter()
+            for item_id in ids:
+                if item_id is not None:
+                    counts[item_id] += by
+            self.indexes[kind].bump(counts)
+
+
+def _usage(sess: Session, column) -> Counter:
+    rows = sess.query(column, func.count()).filter(column.isnot(None)).group_by(column)
+    return Counter(dict(rows.all()))
+
+
+autocomplete = Autocomplete()
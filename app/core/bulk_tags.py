@@ -0,0 +1,175 @@
+""" bulk tag assignment for meals and exercises\n
+- every referenced ID is validated with set-based queries (one IN query per table, chunked)\n
+- valid items are written with one upsert + one delete/insert of the many-to-many rows, in one transaction\n
+- invalid items are skipped and reported per item, they never abort the batch\n
+- the bitmap indexes and tag summaries are patched afterwards, like the single-item repos functions"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from app.core.db import (
+    Meals, Exercises,
+    MuscleGroupTags, DifficultyTags, ExerciseTypeTags,
+    DietaryTags, meal_tags, meal_dietary_tags, exercise_tags, exercise_muscle_groups,
+)
+from app.core.repos import upsert_rows
+from app.core.tag_index import MEAL_FACETS, NamedTagIndex, exercise_tag_index, meal_tag_index
+from app.core.tag_summary import TagSummary, exercise_tag_summary, meal_tag_summary
+
+CHUNK = 5000        # IN-list size, well under sqlite's bound-parameter limit
+
+
+def _chunks(values: list, size: int = CHUNK) -> Iterable[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+@dataclass(frozen=True)
+class TagSpec:
+    item_label: str             # "meal" / "exercise", used in error messages
+    item_field: str             # request field holding the item id
+    item_pk: object             # e.g. Meals.MealID
+    tag_table: type             # one row per item, one column per single-valued facet
+    single: dict                # facet -> (request field, tag table, tag id column)
+    multi: tuple                # (facet, request field, tag table, tag id column, association table)
+    summary: TagSummary
+    index: Optional[NamedTagIndex] = None
+
+
+MEAL_TAGS = TagSpec(
+    item_label="meal",
+    item_field="meal_id",
+    item_pk=Meals.MealID,
+    tag_table=meal_tags,
+    single={f: (f"{f}_id", model, id_col) for f, (model, id_col, col) in MEAL_FACETS.items() if col},
+    multi=("dietary", "dietary_tag_ids", DietaryTags, "DietaryID", meal_dietary_tags),
+    summary=meal_tag_summary,
+    index=meal_tag_index,
+)
+
+EXERCISE_TAGS = TagSpec(
+    item_label="exercise",
+    item_field="exercise_id",
+    item_pk=Exercises.ExerciseID,
+    tag_table=exercise_tags,
+    single={
+        "difficulty": ("difficulty_id", DifficultyTags, "DifficultyID"),
+        "exercise_type": ("exercise_type_id", ExerciseTypeTags, "ExerciseTypeID"),
+    },
+    multi=("muscle_group", "muscle_group_ids", MuscleGroupTags, "MuscleGroupID", exercise_muscle_groups),
+    summary=exercise_tag_summary,
+    index=exercise_tag_index,
+)
+
+
+def _existing(sess: Session, column, ids: Iterable[int]) -> set[int]:
+    found: set[int] = set()
+    for chunk in _chunks(sorted(set(ids))):
+        found.update(v for (v,) in sess.query(column).filter(column.in_(chunk)))
+    return found
+
+
+def _current_tags(sess: Session, spec: TagSpec, ids: list[int]) -> dict[int, dict[str, list[int]]]:
+    """item id -> facet -> tag ids, for items that already have tags"""
+    key = spec.item_pk.key
+    facet, _, _, id_col, assoc = spec.multi
+    out: dict[int, dict[str, list[int]]] = {}
+    for chunk in _chunks(ids):
+        for row in sess.query(spec.tag_table).filter(getattr(spec.tag_table, key).in_(chunk)):
+            out[getattr(row, key)] = {f: [getattr(row, col)] for f, (_, _, col) in spec.single.items()}
+            out[getattr(row, key)][facet] = []
+        for item_id, tag_id in sess.query(getattr(assoc, key), getattr(assoc, id_col)).filter(getattr(assoc, key).in_(chunk)):
+            if item_id in out:
+                out[item_id][facet].append(tag_id)
+    return out
+
+
+def bulk_tag(sess: Session, spec: TagSpec, items: list[dict]) -> dict:
+    """
+    items: dicts with spec.item_field, one field per single-valued facet and a list for
+    the multi-valued facet (the same fields the single-item endpoints take)
+    """
+    multi_facet, multi_field, multi_model, multi_col, assoc = spec.multi
+    key = spec.item_pk.key
+
+    known_items = _existing(sess, spec.item_pk, (it[spec.item_field] for it in items))
+    valid_tags = {
+        field: _existing(sess, getattr(model, col), (it[field] for it in items))
+        for field, model, col in spec.single.values()
+    }
+    valid_multi = _existing(sess, getattr(multi_model, multi_col), (t for it in items for t in it[multi_field]))
+
+    errors, accepted, seen = [], {}, set()
+    for i, it in enumerate(items):
+        item_id = it[spec.item_field]
+        problems = []
+        if item_id in seen:
+            problems.append(f"duplicate {spec.item_field} in request")
+        elif item_id not in known_items:
+            problems.append(f"{spec.item_label.capitalize()} not found")
+        for field, _, _ in spec.single.values():
+            if it[field] not in valid_tags[field]:
+                problems.append(f"unknown {field}: {it[field]}")
+        unknown = [t for t in it[multi_field] if t not in valid_multi]
+        if unknown:
+            problems.append(f"unknown {multi_field}: {unknown}")
+        seen.add(item_id)
+        if problems:
+            errors.append({"index": i, spec.item_field: item_id, "detail": "; ".join(problems)})
+        else:
+            accepted[item_id] = {
+                **{f: [it[field]] for f, (field, _, _) in spec.single.items()},
+                multi_facet: list(dict.fromkeys(it[multi_field])),
+            }
+
+    if not accepted:
+        return {"tagged": 0, "errors": errors}
+
+    ids = list(accepted)
+    old = _current_tags(sess, spec, ids)
+    try:
+        upsert_rows(sess, spec.tag_table, [key], [
+            {key: item_id, **{col: tags[f][0] for f, (_, _, col) in spec.single.items()}}
+            for item_id, tags in accepted.items()
+        ])
+        assoc_table = assoc.__table__
+        for chunk in _chunks(ids):
+            sess.execute(delete(assoc_table).where(assoc_table.c[key].in_(chunk)))
+        links = [{key: item_id, multi_col: t} for item_id, tags in accepted.items() for t in tags[multi_facet]]
+        if links:
+            sess.execute(insert(assoc_table), links)
+        sess.commit()
+    except Exception:
+        sess.rollback()
+        raise
+
+    if spec.index is not None and spec.index.loaded:
+        for item_id, tags in accepted.items():
+            spec.index.set(item_id, tags)
+    spec.summary.apply(
+        sess,
+        removed=_flatten(old.values()),
+        added=_flatten(accepted.values()),
+    )
+    return {"tagged": len(accepted), "errors": errors}
+
+
+def _flatten(tag_sets: Iterable[dict[str, list[int]]]) -> dict[str, list[int]]:
+    out: dict[str, list[int]] = {}
+    for tags in tag_sets:
+        for facet, ids in tags.items():
+            out.setdefault(facet, []).extend(ids)
+    return out
+
+
+def bulk_tag_meals(sess: Session, items: list[dict]) -> dict:
+    return bulk_tag(sess, MEAL_TAGS, items)
+
+
+def bulk_tag_exercises(sess: Session, items: list[dict]) -> dict:
+    return bulk_tag(sess, EXERCISE_TAGS, items)
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, Text, ForeignKey, Float, DateTime, Boolean
+    Column, Integer, BigInteger, Text, ForeignKey, Float, Date, DateTime, Boolean, Index
 )
 from app.core.session import Base
 
@@ -11,7 +11,7 @@ class Accounts(Base):
     username = Column(Text, nullable=False, unique=True)
     password_hash = Column(Text, nullable=False)               
     bio = Column(Text)
-    refresh_token_hash = Column(Text, nullable=True)
+    refresh_token_hash = Column(Text, nullable=True, index=True)     # /auth/refresh looks users up by it
     refresh_expires_at = Column(DateTime(timezone=True), nullable=True)
 
 class Profiles(Base):
@@ -37,13 +37,14 @@ class Workouts(Base):
     "Back, bicep"
     __tablename__ = 'Workouts'                                             
     WorkoutID = Column(Integer, primary_key=True, autoincrement=True)      
-    name = Column(Text, nullable=False)
+    name = Column(Text, nullable=False, index=True)     # POST /workouts finds the workout by name
 
 class Exercises(Base):
     "Pull-ups, hammer curls"
     __tablename__ = 'Exercises'                                            
     ExerciseID = Column(Integer, primary_key=True, autoincrement=True)     
     name = Column(Text, nullable=False)
+    description = Column(Text)
 
 class Machines(Base):
     "Cables, dumbells, barbell, bodyweight"
@@ -65,6 +66,10 @@ class split_workouts(Base):
 class workout_exercises(Base):
     """Back workout template: pull-ups with dumbbells, 3x10 @ 25lb"""
     __tablename__ = 'workout_exercises'
+    __table_args__ = (
+        # the PK leads with WorkoutID; reads and overwrites are per profile, ordered by workout then exercise
+        Index('ix_workout_exercises_profile_workout', 'ProfileID', 'WorkoutID', 'ExerciseID'),
+    )
     WorkoutID = Column(Integer, ForeignKey('Workouts.WorkoutID'), primary_key=True, nullable=False)
     ExerciseID = Column(Integer, ForeignKey('Exercises.ExerciseID'), primary_key=True, nullable=False)
     MachineID = Column(Integer, ForeignKey('Machines.MachineID'), primary_key=True, nullable=True)
@@ -114,16 +119,16 @@ class Posts(Base):
 class Friends(Base):
     __tablename__ = 'Friends'
     ProfileID1 = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
-    ProfileID2 = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
+    ProfileID2 = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False, index=True)   # PK covers ProfileID1 only
 
 class Likes(Base):
     __tablename__ = 'Likes'
     PostID = Column(Integer, primary_key=True, nullable=False)
-    ProfileID = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
+    ProfileID = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False, index=True)
 
 class Comments(Base):
     __tablename__ = 'Comments'
-    PostID = Column(Integer, primary_key=True, nullable=False)
+    PostID = Column(Integer, primary_key=True, nullable=False)      # comments on a post: the PK leads with PostID
     ProfileID = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
     text = Column(Text, nullable=False)
 
@@ -144,15 +149,28 @@ class meal_ingredients(Base):
     __tablename__ = 'meal_ingredients'
     MealID = Column(Integer, ForeignKey('Meals.MealID'), primary_key=True, nullable=False)
     IngredientID = Column(Integer, ForeignKey('Ingredients.IngredientID'), primary_key=True, nullable=False)
-    serving_size = Column(Float)
+    serving_size = Column(Float)                        # grams
     instructions = Column(Text)
 
+class ingredient_nutrients(Base):
+    "nutrients in per_grams of an ingredient, same columns as menu_meals; see meal_nutrition"
+    __tablename__ = 'ingredient_nutrients'
+    IngredientID    = Column(Integer, ForeignKey('Ingredients.IngredientID'), primary_key=True, nullable=False)
+    per_grams       = Column(Float, nullable=False, default=100.0)
+    energy_kcal     = Column(Float)
+    protein_g       = Column(Float)
+    carbohydrates_g = Column(Float)
+    total_fat_g     = Column(Float)
+    sugar_g         = Column(Float)
+    sodium_mg       = Column(Float)
+    fiber_g         = Column(Float)
+
 # --- STATIC ---
 
 class menu_meals(Base):
     __tablename__ = 'menu_meals'
     MenuMealID = Column(Integer, primary_key=True, autoincrement=True)
-    restaurant = Column(Text, nullable=False)           # Pizza Hut, Burger King, Starbucks, McDonalds, KFC, Dominos, Chick fil A, Shack Shack
+    restaurant = Column(Text, nullable=False, index=True)           # Pizza Hut, Burger King, Starbucks, McDonalds, KFC, Dominos, Chick fil A, Shack Shack
     category = Column(Text, nullable=False)             #                           ***         ***                                    ***
     product = Column(Text, nullable=False)              # Large French Fries
     serving_size = Column(Float)                        # mix of g, ml, oz  -->  guess from product name?
@@ -167,6 +185,7 @@ class menu_meals(Base):
     cholesterol_mg	= Column(Float)
     sodium_mg = Column(Float)
     chicken = Column(Boolean)
+    features = Column(Integer, nullable=False, default=0)   # bitmask, see menu_features.FEATURE_BITS
 
 
 
@@ -247,3 +266,54 @@ class meal_dietary_tags(Base):
     MealID     = Column(Integer, ForeignKey('Meals.MealID'), primary_key=True, nullable=False)
     DietaryID  = Column(Integer, ForeignKey('DietaryTags.DietaryID'), primary_key=True, nullable=False)
 
+
+class seed_versions(Base):
+    __tablename__ = 'seed_versions'
+    name    = Column(Text, primary_key=True, nullable=False)     # seed set, e.g. "static"
+    version = Column(Integer, nullable=False)
+    digest  = Column(Text, nullable=False)                       # hash of the seed data that was applied
+    applied_at = Column(DateTime, nullable=False)
+
+class daily_macro_logs(Base):
+    "one row per (profile, day, tracker), see macro_store"
+    __tablename__ = 'daily_macro_logs'
+    ProfileID  = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
+    log_date   = Column(Date, primary_key=True, nullable=False)
+    tracker_id = Column(Text, primary_key=True, nullable=False)     # calories, protein, ...
+    value      = Column(Float, nullable=False, default=0.0)
+    goal       = Column(Float)
+    direction  = Column(Text, nullable=False, default="under")
+
+class macro_events(Base):
+    "append-only macro entries, seq counts up from 1 per (profile, day), see macro_events"
+    __tablename__ = 'macro_events'
+    ProfileID  = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
+    log_date   = Column(Date, primary_key=True, nullable=False, index=True)     # compaction scans by day
+    seq        = Column(Integer, primary_key=True, nullable=False)
+    kind       = Column(Text, nullable=False)                       # open, log, remove, log_many, set_goal, ...
+    payload    = Column(Text, nullable=False)                       # json
+    created_at = Column(DateTime, nullable=False)
+
+class macro_snapshots(Base):
+    "DailyLog state after event seq; final = the day has been compacted"
+    __tablename__ = 'macro_snapshots'
+    ProfileID = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
+    log_date  = Column(Date, primary_key=True, nullable=False)
+    seq       = Column(Integer, primary_key=True, nullable=False)
+    state     = Column(Text, nullable=False)                        # json, see macro_events.state_of
+    final     = Column(Boolean, nullable=False, default=False)
+
+class profile_macro_goals(Base):
+    "personalized daily targets per profile, recomputed in bulk by macro_goals.recompute_all"
+    __tablename__ = 'profile_macro_goals'
+    ProfileID   = Column(Integer, ForeignKey('Profiles.ProfileID'), primary_key=True, nullable=False)
+    calories    = Column(Float, nullable=False)
+    protein     = Column(Float, nullable=False)
+    carbs       = Column(Float, nullable=False)
+    fat         = Column(Float, nullable=False)
+    sugar       = Column(Float, nullable=False)
+    sodium      = Column(Float, nullable=False)
+    fiber       = Column(Float, nullable=False)
+    water       = Column(Float, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+    inputs      = Column(BigInteger)                    # macro_goals.input_keys of the profile it was computed from
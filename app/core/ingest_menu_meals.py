@@ -2,11 +2,19 @@
 - including Pizza Hut, McDonalds, Dominos, KFC, Starbucks, Chick-fil-A, Subway, Shake Shack\n
 - features restaurant, category, product, serving_size, energy_kcal, carbohydrates_g, protein_g, fiber_g, sugar_g, total_fat_g, saturated_fat_g, trans_fat_g, cholesterol_mg, sodium_mg\n
 - outputs menu_meals.csv\n
-- could still do more cleaning and derive attributes"""
+- derived attributes (chicken, high_protein, ...) come from the rules in menu_features"""
+
+import os
 
 import pandas as pd
 import numpy as np
 
+from app.core.menu_catalog import write_snapshot
+from app.core.menu_features import FEATURE_BITS, derive_feature_bits
+from app.core.menu_pareto import refresh_pareto_index
+
+MENU_MEALS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "menu_meals.csv")
+
 # -----------------------------
 # final schema
 # -----------------------------
@@ -200,58 +208,56 @@ def combine(df1, df2, df3):
 
 
 
-def ingest_menu_meals():
-    """loads menu_meals.csv into a dictionary for sql db"""
-    df = pd.read_csv('./menu_meals.csv')
+def ingest_menu_meals(snapshot: bool = True):
+    """
+    loads menu_meals.csv into a dictionary for sql db
+    - also refreshes the binary snapshot that menu_catalog serves at runtime
+      and the Pareto frontiers stored with it
+    """
+    df = derive_features(pd.read_csv(MENU_MEALS_CSV))
 
     df = df.replace([np.inf, -np.inf], np.nan)
 
+    # chick-fil-a source has no categories, menu_meals.category is NOT NULL
+    df["category"] = df["category"].fillna("All Meals")
+
     # clean numeric fields
     numeric_cols = ["serving_size", "energy_kcal", "carbohydrates_g", "protein_g", "fiber_g", "sugar_g", "total_fat_g", "saturated_fat_g", "trans_fat_g", "cholesterol_mg", "sodium_mg"]
     for c in numeric_cols:
         df[c] = pd.to_numeric(df[c], errors="coerce")
 
+    if snapshot:
+        write_snapshot(df)
+        refresh_pareto_index()
+
     # convert NaN --> None for SQL NULL
-    df = df.where(pd.notnull(df), None)
+    df = df.astype(object).where(pd.notnull(df), None)
 
     records = df.to_dict(orient="records")
     return records
 
 
 
-def derive_features():
+def derive_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     attaching features to menu meals that can be used as criteria for queries
-    - show all meals with chicken
-    - show low calorie meals 
+    - all rules in menu_features run in one pass and land in the `features` bitmask
+    - `chicken` is kept as its own column for older queries
     """
-    df = pd.read_csv('./app/core/menu_meals.csv')
-
-    # ----------
-    # chicken
-    # ----------
-    chick_fil_a = ['Chicken', 'Chick-n-Minis', 'Heart-Shaped', 'Chick-n-Strips', 'Nuggets', 'Filet', 'Sandwich']
-    cfa_pattern = '|'.join(chick_fil_a)
-
-    df['chicken'] = (
-        ((df['restaurant'] == 'Chick-fil-A') & (df['product'].str.contains(cfa_pattern, case=False, na=False))) |
-        ((df['restaurant'] == 'McDonalds') & (df['product'].str.contains('chicken', case=False, na=False))) |
-        ((df['restaurant'] == 'Shake Shack') & (df['product'].str.contains('chicken', case=False, na=False))) |
-        (df['product'].str.contains('chicken', case=False, na=False)) |
-        ((df['restaurant'] == 'KFC') & ~(df['product'].str.contains('veg', case=False, na=False)))
-    )
-
-    print(df['chicken'])
-
-    df.copy().to_csv('./app/core/menu_meals.csv')
+    df = df.copy()
+    df["features"] = derive_feature_bits(df)
+    df["chicken"] = (df["features"] & FEATURE_BITS["chicken"]) != 0
+    return df
     
 
 
 
 if __name__ == '__main__':
-    df1 = pd.read_csv('./app/core/first5.csv', encoding="utf-8")
-    df2 = pd.read_csv('./app/core/chickfila.csv', encoding="utf-8")
-    df3 = pd.read_csv('./app/core/shakeshack.csv', encoding="utf-8")
+    # raw sources are not checked in, only needed to rebuild menu_meals.csv
+    #df1 = pd.read_csv('./app/core/first5.csv', encoding="utf-8")
+    #df2 = pd.read_csv('./app/core/chickfila.csv', encoding="utf-8")
+    #df3 = pd.read_csv('./app/core/shakeshack.csv', encoding="utf-8")
     #combine(df1, df2, df3)
-            
-    derive_features()
\ No newline at end of file
+
+    records = ingest_menu_meals(snapshot=True)
+    print(f"{len(records)} menu meals ingested, snapshot written")
\ No newline at end of file
@@ -0,0 +1,218 @@
+""" event-sourced macro logs\n
+- every change to a day is an appended macro_events row, seq 1, 2, ... per (profile, day), never updated\n
+- seq 1 is an "open" event carrying the day's starting state (carried-over goals)\n
+- a macro_snapshots row holds the state after some seq; a day is rebuilt from its latest snapshot + the events after it\n
+- undo appends an "undo" event naming an earlier entry, replay skips the entries it names\n
+- compact() folds finished days into one final snapshot, oldest first and a batch at a time; their events stay for the audit trail\n
+- days before the newest final snapshot are done, so compaction only scans from that day on"""
+
+from __future__ import annotations
+
+import json
+from array import array
+from datetime import date, datetime, timezone
+from math import isnan, nan
+from typing import Optional
+
+from sqlalchemy import delete, exists, func
+from sqlalchemy.orm import Session
+
+from app.core.db import macro_events, macro_snapshots
+from app.core.macro_tracker import MACROS, DailyLog
+
+DEFAULT_SNAPSHOT_EVERY = 50
+COMPACT_BATCH = 500                              # days compacted per call / transaction
+ENTRY_KINDS = ("log", "remove", "log_many")      # what "undo last entry" can take back
+
+
+# ---- state <-> json ----
+def state_of(log: DailyLog) -> dict:
+    n = log.schema.n
+    return {
+        "ids": list(log.schema.ids),
+        "values": list(log.data[:n]),
+        "goals": [None if isnan(g) else g for g in log.data[n:]],
+        "over": log.over,
+        "int_goals": log.int_goals,
+    }
+
+
+def restore(state: dict, day: date) -> DailyLog:
+    if tuple(state["ids"]) != MACROS.ids:
+        raise ValueError(f"Snapshot trackers {state['ids']} do not match {list(MACROS.ids)}")
+    log = DailyLog.default()
+    log.log_date = day
+    n = MACROS.n
+    log.data[:n] = array("d", state["values"])
+    log.data[n:] = array("d", [nan if g is None else g for g in state["goals"]])
+    log.over, log.int_goals = state["over"], state["int_goals"]
+    return log
+
+
+# ---- applying one event ----
+def apply_event(log: DailyLog, kind: str, payload: dict):
+    """the single place a DailyLog is changed, live and on replay; raises before changing anything"""
+    if kind == "open":
+        fresh = restore(payload, log.log_date)
+        log.data[:] = fresh.data
+        log.over, log.int_goals = fresh.over, fresh.int_goals
+    elif kind == "log":
+        log.log(payload["tracker_id"], payload["amount"])
+    elif kind == "remove":
+        log.remove(payload["tracker_id"], payload["amount"])
+    elif kind == "log_many":
+        amounts = payload["amounts"]
+        trackers = {tid: log.get(tid) for tid in amounts}
+        skipped = [tid for tid, t in trackers.items() if not t.has_goal]
+        for tid, t in trackers.items():
+            if t.has_goal and amounts[tid] > 0:
+                t.log(amounts[tid])
+        return skipped
+    elif kind == "set_goal":
+        log.set_goal(payload["tracker_id"], payload["goal"], payload.get("direction"))
+    elif kind == "clear_goal":
+        log.clear_goal(payload["tracker_id"])
+    elif kind == "reset":
+        log.reset_all()
+    elif kind != "undo":
+        raise ValueError(f"Unknown macro event '{kind}'")
+    return None
+
+
+def touched(kind: str, payload: dict) -> Optional[list[str]]:
+    """tracker ids an event changes, None = all of them"""
+    if "tracker_id" in payload:
+        return [payload["tracker_id"]]
+    if kind == "log_many":
+        return list(payload["amounts"])
+    return None
+
+
+def event_row(profile_id: int, day: date, seq: int, kind: str, payload: dict) -> dict:
+    return {
+        "ProfileID": profile_id, "log_date": day, "seq": seq, "kind": kind,
+        "payload": json.dumps(payload), "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+
+
+def snapshot_row(profile_id: int, day: date, seq: int, log: DailyLog, final: bool = False) -> dict:
+    return {
+        "ProfileID": profile_id, "log_date": day, "seq": seq,
+        "state": json.dumps(state_of(log)), "final": final,
+    }
+
+
+# ---- reads ----
+def last_seq(sess: Session, profile_id: int, day: date) -> int:
+    return sess.query(func.coalesce(func.max(macro_events.seq), 0)).filter_by(ProfileID=profile_id, log_date=day).scalar()
+
+
+def _snapshot(sess: Session, profile_id: int, day: date, before: Optional[int] = None):
+    q = sess.query(macro_snapshots).filter_by(ProfileID=profile_id, log_date=day)
+    if before is not None:
+        q = q.filter(macro_snapshots.seq < before)
+    return q.order_by(macro_snapshots.seq.desc()).first()
+
+
+def _events(sess: Session, profile_id: int, day: date, after: int):
+    return (
+        sess.query(macro_events)
+        .filter(macro_events.ProfileID == profile_id, macro_events.log_date == day, macro_events.seq > after)
+        .order_by(macro_events.seq)
+        .all()
+    )
+
+
+def _undone(events) -> set[int]:
+    return {json.loads(e.payload)["target"] for e in events if e.kind == "undo"}
+
+
+def rebuild(sess: Session, profile_id: int, day: date) -> Optional[DailyLog]:
+    """latest snapshot + the events after it, None if the day has no events"""
+    snap = _snapshot(sess, profile_id, day)
+    start = snap.seq if snap else 0
+    tail = _events(sess, profile_id, day, start)
+    undone = _undone(tail)
+    while undone and min(undone) <= start:
+        # an undo reaches behind the snapshot: start from one taken before the entry
+        snap = _snapshot(sess, profile_id, day, before=min(undone))
+        start = snap.seq if snap else 0
+        tail = _events(sess, profile_id, day, start)
+        undone = _undone(tail)
+    if snap is None and not tail:
+        return None
+
+    log = restore(json.loads(snap.state), day) if snap else DailyLog.default()
+    log.log_date = day
+    for e in tail:
+        if e.seq not in undone:
+            apply_event(log, e.kind, json.loads(e.payload))
+    return log
+
+
+def last_entry(sess: Session, profile_id: int, day: date) -> Optional[int]:
+    """seq of the newest log/remove/log_many that has not been undone, walking back from the end"""
+    undone: set[int] = set()
+    q = (
+        sess.query(macro_events.seq, macro_events.kind, macro_events.payload)
+        .filter_by(ProfileID=profile_id, log_date=day)
+        .order_by(macro_events.seq.desc())
+    )
+    for seq, kind, payload in q.yield_per(100):
+        if kind == "undo":
+            undone.add(json.loads(payload)["target"])
+        elif kind in ENTRY_KINDS and seq not in undone:
+            return seq
+    return None
+
+
+def audit_trail(sess: Session, profile_id: int, day: date) -> list[dict]:
+    rows = _events(sess, profile_id, day, 0)
+    undone = _undone(rows)
+    return [
+        {
+            "seq": e.seq, "kind": e.kind, "at": e.created_at.isoformat(),
+            "undone": e.seq in undone, **json.loads(e.payload),
+        }
+        for e in rows if e.kind != "open"
+    ]
+
+
+# ---- maintenance ----
+def compacted_through(sess: Session) -> Optional[date]:
+    """newest day with a final snapshot; compaction runs oldest first, so every day before it is final"""
+    return sess.query(func.max(macro_snapshots.log_date)).filter(macro_snapshots.final.is_(True)).scalar()
+
+
+def compact(sess: Session, before: date, limit: int = COMPACT_BATCH) -> int:
+    """
+    one final snapshot for each of the oldest `limit` days older than `before` that have none yet,
+    earlier snapshots dropped; returns days compacted, fewer than `limit` once caught up
+    """
+    final = exists().where(
+        macro_snapshots.ProfileID == macro_events.ProfileID,
+        macro_snapshots.log_date == macro_events.log_date,
+        macro_snapshots.final.is_(True),
+    )
+    q = sess.query(macro_events.ProfileID, macro_events.log_date, func.max(macro_events.seq)).filter(
+        macro_events.log_date < before, ~final,
+    )
+    since = compacted_through(sess)
+    if since is not None:
+        q = q.filter(macro_events.log_date >= since)        # that day may have been left half done
+    days = (
+        q.group_by(macro_events.ProfileID, macro_events.log_date)
+        .order_by(macro_events.log_date, macro_events.ProfileID)
+        .limit(limit)
+        .all()
+    )
+    done = 0
+    for profile_id, day, seq in days:
+        log = rebuild(sess, profile_id, day)
+        sess.execute(delete(macro_snapshots).where(
+            macro_snapshots.ProfileID == profile_id, macro_snapshots.log_date == day,
+        ))
+        sess.add(macro_snapshots(**snapshot_row(profile_id, day, seq, log, final=True)))
+        done += 1
+    sess.flush()
+    return done
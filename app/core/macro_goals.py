@@ -0,0 +1,189 @@
+""" personalized macro targets from Profiles\n
+- BMR is Mifflin-St Jeor from weight (lb), height (in), age and gender, times one activity factor\n
+- health_goals text is bucketed into fat_loss / muscle_gain / maintenance, which shifts calories and protein\n
+- every formula is a numpy expression over whole columns, a single profile is a batch of one\n
+- recompute_all() pages through Profiles by key and upserts profile_macro_goals in bulk\n
+- each stored row keeps input_keys() of the profile it came from, a profile edited since is recomputed on read"""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.db import Profiles, profile_macro_goals
+from app.core.macro_tracker import MACROS
+from app.core.repos import upsert_rows
+
+KG_PER_LB = 0.45359237
+CM_PER_IN = 2.54
+CUP_L = 0.2365882
+
+ACTIVITY_FACTOR = 1.375         # lightly active, Profiles has no activity level
+GENDER_OFFSET = {"male": 5.0, "female": -161.0, "other": -78.0}
+
+# goal -> (calorie change, protein g per kg)
+GOAL_PLANS = {
+    "fat_loss":    (-500.0, 2.0),
+    "maintenance": (0.0, 1.6),
+    "muscle_gain": (300.0, 1.8),
+}
+GOALS = tuple(GOAL_PLANS)
+GOAL_WORDS = {
+    "fat_loss": re.compile(r"\b(lose|loss|losing|fat|cut|cutting|lean|slim)", re.I),
+    "muscle_gain": re.compile(r"\b(gain|muscle|bulk|bulking|build|strength|mass)", re.I),
+}
+
+MIN_CALORIES = 1200.0
+FAT_SHARE = 0.25                # of calories
+SUGAR_SHARE = 0.10
+FIBER_PER_1000_KCAL = 14.0
+SODIUM_MG = 2300.0
+WATER_L_PER_KG = 0.033
+
+
+def gender_code(text: Optional[str]) -> str:
+    t = (text or "").strip().lower()
+    if t.startswith("m"):
+        return "male"
+    if t.startswith(("f", "w")):
+        return "female"
+    return "other"
+
+
+def goal_code(text: Optional[str]) -> str:
+    """first matching bucket wins, so "lose fat, keep muscle" is fat_loss"""
+    t = text or ""
+    hits = {g: m.start() for g, rx in GOAL_WORDS.items() if (m := rx.search(t))}
+    return min(hits, key=hits.get) if hits else "maintenance"
+
+
+def _codes(values: Iterable[Optional[str]], classify, labels: tuple[str, ...]) -> np.ndarray:
+    """classify each distinct text once, then look it up: free text repeats a lot"""
+    index = {label: i for i, label in enumerate(labels)}
+    seen: dict = {}
+
+    def code(v):
+        c = seen.get(v)
+        if c is None:
+            c = seen[v] = index[classify(v)]
+        return c
+
+    return np.fromiter((code(v) for v in values), dtype=np.int64)
+
+
+def compute_goals(age, weight_lb, height_in, gender: np.ndarray, goal: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    gender / goal are integer codes into GENDER_OFFSET / GOALS order.
+    Returns tracker id -> targets, in MACROS order.
+    """
+    kg = np.asarray(weight_lb, dtype=np.float64) * KG_PER_LB
+    cm = np.asarray(height_in, dtype=np.float64) * CM_PER_IN
+    age = np.asarray(age, dtype=np.float64)
+    offsets = np.array(list(GENDER_OFFSET.values()))
+    shift = np.array([GOAL_PLANS[g][0] for g in GOALS])
+    protein_per_kg = np.array([GOAL_PLANS[g][1] for g in GOALS])
+
+    bmr = 10.0 * kg + 6.25 * cm - 5.0 * age + offsets[gender]
+    calories = np.maximum(np.round(bmr * ACTIVITY_FACTOR + shift[goal], -1), MIN_CALORIES)
+    protein = np.round(kg * protein_per_kg[goal])
+    fat = np.round(calories * FAT_SHARE / 9.0)
+    carbs = np.maximum(np.round((calories - protein * 4.0 - fat * 9.0) / 4.0), 0.0)
+    return {
+        "calories": calories,
+        "protein": protein,
+        "carbs": carbs,
+        "fat": fat,
+        "sugar": np.round(calories * SUGAR_SHARE / 4.0),
+        "sodium": np.full_like(calories, SODIUM_MG),
+        "fiber": np.round(calories / 1000.0 * FIBER_PER_1000_KCAL),
+        "water": np.round(kg * WATER_L_PER_KG / CUP_L),
+    }
+
+
+def encode_rows(rows) -> tuple[np.ndarray, ...]:
+    """rows: (age, weight, height_in, gender, health_goals) tuples -> the columns compute_goals takes"""
+    age, weight, height, gender, goals = (list(c) for c in zip(*rows)) if rows else ([],) * 5
+    return (
+        np.asarray(age, dtype=np.float64),
+        np.asarray(weight, dtype=np.float64),
+        np.asarray(height, dtype=np.float64),
+        _codes(gender, gender_code, tuple(GENDER_OFFSET)),
+        _codes(goals, goal_code, GOALS),
+    )
+
+
+def goals_for_rows(rows) -> dict[str, np.ndarray]:
+    """rows: (age, weight, height_in, gender, health_goals) tuples"""
+    return compute_goals(*encode_rows(rows))
+
+
+def input_keys(age, weight_lb, height_in, gender: np.ndarray, goal: np.ndarray) -> np.ndarray:
+    """
+    int64 fingerprint per row of everything compute_goals reads, mixed over the encoded
+    columns (splitmix64 steps), so a page of keys costs a few array ops
+    """
+    h = np.full(len(gender), 0x9E3779B97F4A7C15, dtype=np.uint64)
+    for col in (age, weight_lb, height_in, gender, goal):
+        h ^= np.ascontiguousarray(col, dtype=np.float64).view(np.uint64)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(31)
+    return h.view(np.int64)
+
+
+def _profile_row(profile: Profiles) -> tuple:
+    return profile.age, profile.weight, profile.height_in, profile.gender, profile.health_goals
+
+
+def goals_for(profile: Profiles) -> dict[str, float]:
+    """tracker id -> target for one profile"""
+    out = goals_for_rows([_profile_row(profile)])
+    return {t: float(v[0]) for t, v in out.items()}
+
+
+def stored_goals(sess: Session, profile_id: int) -> Optional[dict[str, float]]:
+    """the last bulk result while the profile is unchanged since, else computed now from the profile, else None"""
+    profile = sess.get(Profiles, profile_id)
+    if profile is None:
+        return None
+    row = sess.get(profile_macro_goals, profile_id)
+    encoded = encode_rows([_profile_row(profile)])
+    if row is not None and row.inputs == int(input_keys(*encoded)[0]):
+        return {t: getattr(row, t) for t in MACROS.ids}
+    return {t: float(v[0]) for t, v in compute_goals(*encoded).items()}
+
+
+def recompute_all(sess: Session, chunk: int = 50_000) -> int:
+    """every profile's targets, one keyset page of Profiles and one bulk upsert at a time; commits"""
+    cols = (Profiles.ProfileID, Profiles.age, Profiles.weight, Profiles.height_in, Profiles.gender, Profiles.health_goals)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    last, done = None, 0
+    while True:
+        q = sess.query(*cols)
+        if last is not None:
+            q = q.filter(Profiles.ProfileID > last)
+        page = q.order_by(Profiles.ProfileID).limit(chunk).all()
+        if not page:
+            return done
+        ids = [r[0] for r in page]
+        encoded = encode_rows([r[1:] for r in page])
+        goals = compute_goals(*encoded)
+        columns = {t: goals[t].tolist() for t in MACROS.ids}
+        keys = input_keys(*encoded).tolist()
+        upsert_rows(sess, profile_macro_goals, ["ProfileID"], [
+            {"ProfileID": pid, **{t: columns[t][i] for t in MACROS.ids}, "computed_at": now, "inputs": keys[i]}
+            for i, pid in enumerate(ids)
+        ])
+        sess.commit()
+        last, done = ids[-1], done + len(ids)
+
+
+if __name__ == "__main__":
+    # nightly job
+    from app.core.session import SessionLocal
+
+    with SessionLocal() as sess:
+        print(f"{recompute_all(sess)} profiles updated")
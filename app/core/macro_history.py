@@ -0,0 +1,229 @@
+""" multi-day macro history as dense arrays\n
+- values and goals are (days x trackers) float matrices, NaN goal = no goal that day\n
+- direction is one bool per tracker (True = "over"), logged is one bool per day\n
+- goal-met masks, progress, rollups, rolling means and streaks are whole-matrix numpy ops\n
+- same goal semantics as Tracker: a zero value or a missing goal is "no verdict", not a miss"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import cached_property
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.db import daily_macro_logs
+from app.core.macro_tracker import DailyLog
+
+TRACKER_IDS = tuple(t.id for t in DailyLog.default().trackers)
+PERIODS = ("week", "month")
+
+
+@dataclass
+class MacroHistory:
+    start: date
+    tracker_ids: tuple[str, ...]
+    values: np.ndarray      # (days, trackers) float64
+    goals: np.ndarray       # (days, trackers) float64, NaN = no goal
+    over: np.ndarray        # (trackers,) bool
+    logged: np.ndarray      # (days,) bool, any row stored that day
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, start: date, end: date,
+                  tracker_ids: tuple[str, ...] = TRACKER_IDS) -> "MacroHistory":
+        """rows: anything with log_date, tracker_id, value, goal, direction"""
+        days = (end - start).days + 1
+        col = {t: i for i, t in enumerate(tracker_ids)}
+        values = np.zeros((days, len(tracker_ids)))
+        goals = np.full((days, len(tracker_ids)), np.nan)
+        over = np.array([t.direction == "over" for t in DailyLog.default().trackers if t.id in col])
+        logged = np.zeros(days, dtype=bool)
+        for r in rows:
+            d, j = (r.log_date - start).days, col.get(r.tracker_id)
+            if j is None or not 0 <= d < days:
+                continue
+            values[d, j] = r.value
+            goals[d, j] = np.nan if r.goal is None else r.goal
+            over[j] = r.direction == "over"
+            logged[d] = True
+        return cls(start, tracker_ids, values, goals, over, logged)
+
+    @property
+    def days(self) -> int:
+        return self.values.shape[0]
+
+    def dates(self) -> list[str]:
+        return (np.datetime64(self.start, "D") + np.arange(self.days)).astype(str).tolist()
+
+    def window(self, start: Optional[date] = None, end: Optional[date] = None) -> "MacroHistory":
+        """a view of the days in [start, end]"""
+        lo = 0 if start is None else max(0, (start - self.start).days)
+        hi = self.days if end is None else min(self.days, (end - self.start).days + 1)
+        return MacroHistory(
+            self.start + timedelta(days=lo), self.tracker_ids,
+            self.values[lo:hi], self.goals[lo:hi], self.over, self.logged[lo:hi],
+        )
+
+    # ---- per day (arrays are treated as read-only once the masks have been asked for) ----
+    @cached_property
+    def _masks(self) -> tuple[np.ndarray, np.ndarray]:
+        verdict = ~np.isnan(self.goals) & (self.values != 0)
+        with np.errstate(invalid="ignore"):
+            met = np.where(self.over, self.values >= self.goals, self.values <= self.goals)
+        return verdict, met & verdict
+
+    def verdict(self) -> np.ndarray:
+        """(days, trackers) bool: a goal is set and something was logged"""
+        return self._masks[0]
+
+    def goal_met(self) -> np.ndarray:
+        """(days, trackers) bool, only meaningful where verdict() is True"""
+        return self._masks[1]
+
+    def progress_pct(self) -> np.ndarray:
+        """(days, trackers) 0.0-1.0, 0 where there is no positive goal"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = np.where(self.goals > 0, self.values / self.goals, 0.0)
+        return np.minimum(np.nan_to_num(pct), 1.0)
+
+    def all_goals_met(self) -> np.ndarray:
+        """(days,) bool, like DailyLog.all_goals_met on each logged day"""
+        has_goal = ~np.isnan(self.goals)
+        return self.logged & np.all(~has_goal | self.goal_met(), axis=1)
+
+    # ---- over the window ----
+    def rolling_mean(self, window: int = 7) -> np.ndarray:
+        """(days, trackers) mean over the trailing `window` logged days (NaN until one is logged)"""
+        csum = np.cumsum(np.vstack([np.zeros(self.values.shape[1]), self.values * self.logged[:, None]]), axis=0)
+        ccount = np.cumsum(np.concatenate([[0], self.logged]))
+        idx = np.arange(1, self.days + 1)
+        lo = np.maximum(idx - window, 0)
+        n = (ccount[idx] - ccount[lo])[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (csum[idx] - csum[lo]) / np.where(n > 0, n, np.nan)
+
+    def rollup(self, period: str = "week") -> dict:
+        """per calendar week (Monday start) or month: mean over logged days and goal-met rate"""
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of {list(PERIODS)}")
+        day_index = np.arange(self.days)
+        if period == "week":
+            key = (day_index + self.start.weekday()) // 7
+        else:
+            first = np.datetime64(self.start, "D")
+            key = (first + day_index).astype("datetime64[M]").astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        logged = self.logged.astype(np.int64)
+        n = np.add.reduceat(logged, starts)[:, None] if self.days else np.zeros((0, 1))
+        sums = np.add.reduceat(self.values * logged[:, None], starts, axis=0)
+        verdict = self.verdict()
+        met = np.add.reduceat(self.goal_met().astype(np.int64), starts, axis=0)
+        judged = np.add.reduceat(verdict.astype(np.int64), starts, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, sums / np.maximum(n, 1), np.nan)
+            rate = np.where(judged > 0, met / np.maximum(judged, 1), np.nan)
+        return {
+            "starts": (np.datetime64(self.start, "D") + starts).astype(str).tolist(),
+            "logged_days": n[:, 0].tolist(),
+            "mean": mean,
+            "goal_met_rate": rate,
+        }
+
+    def streaks(self) -> dict:
+        """current and longest runs of consecutive days meeting the goal, per tracker and overall"""
+        runs = _runs(np.column_stack([self.goal_met(), self.all_goals_met()]))
+        if not len(runs):
+            runs = np.zeros((1, runs.shape[1]), dtype=np.int64)
+        return {"current": runs[-1], "longest": runs.max(axis=0)}
+
+    def trend(self) -> np.ndarray:
+        """least-squares slope per tracker over the logged days, in units per day"""
+        x = np.flatnonzero(self.logged).astype(float)
+        if len(x) < 2:
+            return np.full(len(self.tracker_ids), np.nan)
+        y = self.values[self.logged]
+        dx = x - x.mean()
+        return dx @ (y - y.mean(axis=0)) / (dx @ dx)
+
+    def summary(self, rolling: int = 7, period: str = "week", series: bool = True) -> dict:
+        """per-tracker aggregates, plus per-day / per-period series (day i is start + i) unless series=False"""
+        n = int(self.logged.sum())
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (self.values * self.logged[:, None]).sum(axis=0) / n
+            met_rate = self.goal_met().sum(axis=0) / self.verdict().sum(axis=0)
+        streaks = self.streaks()
+        trend = self.trend()
+
+        trackers = {}
+        for j, tid in enumerate(self.tracker_ids):
+            trackers[tid] = {
+                "mean": _num(mean[j]),
+                "trend_per_day": _num(trend[j]),
+                "goal_met_rate": _num(met_rate[j]),
+                "current_streak": int(streaks["current"][j]),
+                "longest_streak": int(streaks["longest"][j]),
+            }
+        out = {
+            "start": str(self.start),
+            "days": self.days,
+            "logged_days": n,
+            "all_goals_met_streak": {"current": int(streaks["current"][-1]), "longest": int(streaks["longest"][-1])},
+            "trackers": trackers,
+        }
+        if series:
+            roll = _series(self.rolling_mean(rolling).T)
+            progress = np.round(self.progress_pct().T * 100, 1).tolist()
+            periods = self.rollup(period)
+            by_period = _series(periods["mean"].T)
+            out[f"{period}_starts"] = periods["starts"]
+            for j, tid in enumerate(self.tracker_ids):
+                trackers[tid].update({"rolling_mean": roll[j], "progress_pct": progress[j], period: by_period[j]})
+        return out
+
+
+def _num(v) -> Optional[float]:
+    v = float(v)
+    return None if np.isnan(v) else round(v, 2)
+
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """(days, cols) length of the run of True ending on each day: the count since the last False"""
+    count = np.cumsum(mask, axis=0)
+    return count - np.maximum.accumulate(np.where(mask, 0, count), axis=0)
+
+
+def _series(values: np.ndarray) -> list:
+    """rounded floats for JSON, NaN -> None"""
+    out = np.round(values, 2)
+    return np.where(np.isnan(out), None, out).tolist()
+
+
+def load_history(sess: Session, profile_id: int, start: date, end: date,
+                 pending: Optional[dict[date, DailyLog]] = None) -> MacroHistory:
+    """
+    stored days from daily_macro_logs, overlaid with cached logs that have entries or unflushed changes
+    (MacroLogStore.cached_logs); each one replaces the stored day and counts as logged
+    """
+    rows = (
+        sess.query(daily_macro_logs)
+        .filter(
+            daily_macro_logs.ProfileID == profile_id,
+            daily_macro_logs.log_date >= start,
+            daily_macro_logs.log_date <= end,
+        )
+        .all()
+    )
+    history = MacroHistory.from_rows(rows, start, end)
+    col = {t: j for j, t in enumerate(history.tracker_ids)}
+    for day, log in (pending or {}).items():
+        d = (day - start).days
+        if not 0 <= d < history.days:
+            continue
+        for t in log.trackers:
+            if t.id in col:
+                history.values[d, col[t.id]] = t.value
+                history.goals[d, col[t.id]] = np.nan if t.goal is None else t.goal
+        history.logged[d] = True
+    return history
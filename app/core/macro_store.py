@@ -0,0 +1,417 @@
+""" persisted DailyLogs with an in-process cache and write-behind\n
+- the database holds one daily_macro_logs row per (profile, day, tracker)\n
+- the current day's DailyLog per profile lives in memory, a mutation is a dict lookup + float write\n
+- changed (profile, day, tracker) keys are upserted in batches by a background flusher\n
+- every mutation is also an event (see macro_events), appended in the same flush, with a snapshot every N events\n
+- close() (wired to app shutdown and atexit) flushes whatever is still pending\n
+- a flush that fails on bad data is retried one profile at a time; a profile that still fails is quarantined\n
+- old days are compacted once a day on their own thread, a batch per transaction, so flushes never wait on it\n
+- database reads happen outside the store-wide lock, serialized per (profile, day) by a striped lock\n
+- a crash loses at most one flush interval of entries"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import macro_events as events
+from app.core.db import Profiles, daily_macro_logs, macro_events, macro_snapshots
+from app.core.macro_goals import stored_goals
+from app.core.macro_tracker import DailyLog, GoalDirection
+from app.core.repos import upsert_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 2.0    # seconds
+DEFAULT_BATCH_SIZE = 500        # pending keys that trigger an early flush
+DEFAULT_COMPACT_AFTER = 2       # days before a day is folded into its final snapshot
+KEY_LOCK_STRIPES = 64           # locks that serialize loads / undo of one (profile, day)
+
+
+class MacroLogStore:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        background: bool = True,
+        snapshot_every: int = events.DEFAULT_SNAPSHOT_EVERY,
+        compact_after: int = DEFAULT_COMPACT_AFTER,
+        compact_batch: int = events.COMPACT_BATCH,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+        self.compact_after = compact_after
+        self.compact_batch = compact_batch
+        self.logs: dict[tuple[int, date], DailyLog] = {}
+        self.dirty: set[tuple[int, date, str]] = set()
+        self.seq: dict[tuple[int, date], int] = {}          # last event seq per cached day
+        self.snapped: dict[tuple[int, date], int] = {}      # seq of the last snapshot written
+        self.events: list[dict] = []                        # macro_events rows not yet written
+        self.undoing: set[tuple[int, date]] = set()         # days whose cached log predates a queued undo
+        self.quarantined: dict[int, dict] = {}              # profile -> rows / events its flush was refused
+        self._compacted: Optional[date] = None
+        self._compactor: Optional[threading.Thread] = None
+        self.lock = threading.RLock()
+        self._key_locks = [threading.RLock() for _ in range(KEY_LOCK_STRIPES)]
+        self._flush_lock = threading.Lock()                 # one flush at a time, so flush() returns once all is written
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="macro-log-flusher", daemon=True)
+            self._thread.start()
+
+    def _key_lock(self, key: tuple[int, date]) -> threading.RLock:
+        return self._key_locks[hash(key) % KEY_LOCK_STRIPES]
+
+    # ---- reads ----
+    def get_log(self, profile_id: int, day: Optional[date] = None) -> DailyLog:
+        """the cached day, loaded on first use; KeyError if the profile does not exist"""
+        day = day or date.today()
+        key = (profile_id, day)
+        log = self.logs.get(key)
+        if log is None:
+            with self._key_lock(key):
+                log = self.logs.get(key)
+                if log is None:
+                    log, seq = self._load(profile_id, day)
+                    with self.lock:
+                        self.logs[key] = log
+                        self.seq[key] = self.snapped[key] = seq
+        return log
+
+    def cached_logs(self, profile_id: int) -> dict[date, DailyLog]:
+        """
+        the profile's in-memory days with entries or unflushed changes, which may be newer than what
+        has been flushed; a day that was only opened to be read is left out
+        """
+        with self.lock:
+            dirty = {d for p, d, _ in self.dirty if p == profile_id}
+            return {
+                d: log for (p, d), log in self.logs.items()
+                if p == profile_id and (d in dirty or self.seq.get((p, d)))
+            }
+
+    def _load(self, profile_id: int, day: date) -> tuple[DailyLog, int]:
+        """
+        (log, last event seq): the day rebuilt from its events, else its stored rows, else a fresh day
+        carrying over the profile's latest goals, else the profile's personalized targets, else defaults
+        """
+        with self.session_factory() as sess:
+            if sess.get(Profiles, profile_id) is None:
+                raise KeyError(f"Profile {profile_id} not found")
+            seq = events.last_seq(sess, profile_id, day)
+            if seq:
+                return events.rebuild(sess, profile_id, day), seq
+            rows = sess.query(daily_macro_logs).filter_by(ProfileID=profile_id, log_date=day).all()
+            carry = False
+            if not rows:
+                latest = (
+                    sess.query(func.max(daily_macro_logs.log_date))
+                    .filter(daily_macro_logs.ProfileID == profile_id, daily_macro_logs.log_date < day)
+                    .scalar()
+                )
+                if latest is not None:
+                    rows = sess.query(daily_macro_logs).filter_by(ProfileID=profile_id, log_date=latest).all()
+                    carry = True
+            targets = None if rows else stored_goals(sess, profile_id)
+        log = DailyLog.default()
+        log.log_date = day
+        for tracker_id, goal in (targets or {}).items():
+            log.get(tracker_id).goal = goal
+        for row in rows:
+            try:
+                t = log.get(row.tracker_id)
+            except KeyError:
+                continue
+            t.goal, t.direction = row.goal, row.direction
+            t.value = 0.0 if carry else row.value
+        return log, 0
+
+    # ---- writes ----
+    def record(self, profile_id: int, kind: str, payload: dict, day: Optional[date] = None):
+        """
+        apply one event to the cached log, queue it for append and its trackers for upsert;
+        returns (log, whatever apply_event returned). A rejected event changes nothing.
+        """
+        while True:
+            log = self.get_log(profile_id, day)
+            key = (profile_id, log.log_date)
+            with self.lock:
+                if self.logs.get(key) is not log:
+                    continue    # evicted at midnight or replaced by undo since get_log, its seq went with it
+                opening = events.state_of(log) if not self.seq.get(key) else None
+                result = events.apply_event(log, kind, payload)
+                if opening is not None:
+                    self._append(key, "open", opening)
+                self._append(key, kind, payload)
+                ids = events.touched(kind, payload) or list(log.schema.ids)
+                self.dirty.update((profile_id, log.log_date, i) for i in ids)
+                pending = len(self.dirty)
+                break
+        if pending >= self.batch_size:
+            self._wake.set()
+        return log, result
+
+    def _append(self, key: tuple[int, date], kind: str, payload: dict) -> None:
+        seq = self.seq[key] = self.seq.get(key, 0) + 1
+        self.events.append(events.event_row(*key, seq, kind, payload))
+
+    def log(self, profile_id: int, tracker_id: str, amount: float) -> DailyLog:
+        return self.record(profile_id, "log", {"tracker_id": tracker_id, "amount": amount})[0]
+
+    def log_many(self, profile_id: int, amounts: dict[str, float]) -> tuple[DailyLog, list[str]]:
+        """
+        add several trackers as one entry under the lock, so readers see all of it or none;
+        trackers without a goal are skipped and returned instead of failing the batch
+        """
+        return self.record(profile_id, "log_many", {"amounts": amounts})
+
+    def remove(self, profile_id: int, tracker_id: str, amount: float) -> DailyLog:
+        return self.record(profile_id, "remove", {"tracker_id": tracker_id, "amount": amount})[0]
+
+    def set_goal(self, profile_id: int, tracker_id: str, goal: float,
+                 direction: Optional[GoalDirection] = None) -> DailyLog:
+        payload = {"tracker_id": tracker_id, "goal": goal, "direction": direction}
+        return self.record(profile_id, "set_goal", payload)[0]
+
+    def clear_goal(self, profile_id: int, tracker_id: str) -> DailyLog:
+        return self.record(profile_id, "clear_goal", {"tracker_id": tracker_id})[0]
+
+    def reset_all(self, profile_id: int) -> DailyLog:
+        return self.record(profile_id, "reset", {})[0]
+
+    def undo(self, profile_id: int, day: Optional[date] = None) -> DailyLog:
+        """
+        take back the day's newest log / remove / log_many entry, ValueError if there is none;
+        the database round trips hold only this day's key lock, other profiles keep logging
+        """
+        day = day or date.today()
+        key = (profile_id, day)
+        with self._key_lock(key):
+            while True:
+                log = self.get_log(profile_id, day)
+                with self.lock:
+                    seen = self.seq.get(key)
+                self.flush()
+                with self.session_factory() as sess:
+                    target = events.last_entry(sess, profile_id, day)
+                if target is None:
+                    raise ValueError("Nothing to undo")
+                with self.lock:
+                    if self.logs.get(key) is log and self.seq.get(key) == seen:
+                        self._append(key, "undo", {"target": target})
+                        self.undoing.add(key)       # no snapshots of the cached log until it is rebuilt
+                        seen = self.seq[key]
+                        break
+                # an entry arrived after the flush, that is the newest one now
+
+            try:
+                while True:
+                    self.flush()
+                    with self.session_factory() as sess:
+                        rebuilt = events.rebuild(sess, profile_id, day)
+                    with self.lock:
+                        if self.logs.get(key) is not log:
+                            return rebuilt          # evicted, the next get_log reads the undo back
+                        if self.seq.get(key) == seen:
+                            self.logs[key] = rebuilt
+                            self.dirty.update((profile_id, day, i) for i in rebuilt.schema.ids)
+                            return rebuilt
+                        seen = self.seq[key]
+                    # entries landed on the cached log meanwhile, flush them and rebuild again
+            finally:
+                with self.lock:
+                    self.undoing.discard(key)
+
+    def audit_trail(self, profile_id: int, day: Optional[date] = None) -> list[dict]:
+        self.flush()
+        with self.session_factory() as sess:
+            return events.audit_trail(sess, profile_id, day or date.today())
+
+    # ---- write-behind ----
+    def flush(self) -> int:
+        """
+        upsert every pending row in one transaction, returns the number written; if the database
+        rejects the batch it is retried one profile at a time and profiles that still fail are quarantined
+        """
+        with self._flush_lock:
+            with self.lock:
+                if not self.dirty and not self.events:
+                    return 0
+                pending, self.dirty = self.dirty, set()
+                appended, self.events = self.events, []
+                rows = []
+                for profile_id, day, tracker_id in pending:
+                    t = self.logs[(profile_id, day)].get(tracker_id)
+                    rows.append({
+                        "ProfileID": profile_id, "log_date": day, "tracker_id": tracker_id,
+                        "value": t.value, "goal": t.goal, "direction": t.direction,
+                    })
+                snapshots = [
+                    events.snapshot_row(*key, seq, self.logs[key])
+                    for key, seq in self.seq.items()
+                    if seq - self.snapped.get(key, 0) >= self.snapshot_every and key not in self.undoing
+                ]
+            try:
+                self._write(appended, snapshots, rows)
+            except IntegrityError:
+                rows, snapshots = self._write_per_profile(appended, snapshots, rows)
+            except Exception:
+                self._requeue(appended, rows)       # retried on the next flush
+                raise
+            with self.lock:
+                for snap in snapshots:
+                    key = (snap["ProfileID"], snap["log_date"])
+                    self.snapped[key] = max(self.snapped.get(key, 0), snap["seq"])
+        self._evict()
+        return len(rows)
+
+    def _write(self, appended: list[dict], snapshots: list[dict], rows: list[dict]) -> None:
+        with self.session_factory() as sess:
+            if appended:
+                sess.execute(insert(macro_events), appended)
+            if snapshots:
+                sess.execute(insert(macro_snapshots), snapshots)
+            upsert_rows(sess, daily_macro_logs, ["ProfileID", "log_date", "tracker_id"], rows)
+            sess.commit()
+
+    def _write_per_profile(self, appended: list[dict], snapshots: list[dict], rows: list[dict]):
+        """one transaction per profile; returns the (rows, snapshots) that were written"""
+        batches: dict[int, tuple[list, list, list]] = {}
+        for i, group in enumerate((appended, snapshots, rows)):
+            for item in group:
+                batches.setdefault(item["ProfileID"], ([], [], []))[i].append(item)
+        written_rows, written_snaps = [], []
+        profiles = list(batches)
+        for n, profile_id in enumerate(profiles):
+            ev, snaps, rw = batches[profile_id]
+            try:
+                self._write(ev, snaps, rw)
+            except IntegrityError as exc:
+                logger.error("Quarantined macro log writes for profile %s: %s", profile_id, exc.orig)
+                self._quarantine(profile_id, ev, rw)
+                continue
+            except Exception:
+                for rest in profiles[n:]:
+                    self._requeue(batches[rest][0], batches[rest][2])
+                raise
+            written_rows += rw
+            written_snaps += snaps
+        return written_rows, written_snaps
+
+    def _requeue(self, appended: list[dict], rows: list[dict]) -> None:
+        with self.lock:
+            self.dirty |= {(r["ProfileID"], r["log_date"], r["tracker_id"]) for r in rows}
+            self.events[:0] = appended
+
+    def _quarantine(self, profile_id: int, appended: list[dict], rows: list[dict]) -> None:
+        """
+        park a profile's refused writes (and anything it queued since) in self.quarantined and drop
+        its cached days, so the next request reloads them from what the database actually holds
+        """
+        with self.lock:
+            held = self.quarantined.setdefault(profile_id, {"events": [], "rows": []})
+            held["events"] += appended + [e for e in self.events if e["ProfileID"] == profile_id]
+            held["rows"] += rows
+            self.events = [e for e in self.events if e["ProfileID"] != profile_id]
+            self.dirty = {k for k in self.dirty if k[0] != profile_id}
+            for key in [k for k in self.logs if k[0] == profile_id]:
+                del self.logs[key]
+                self.seq.pop(key, None)
+                self.snapped.pop(key, None)
+
+    def _evict(self) -> None:
+        """drop cached past days that have nothing pending"""
+        today = date.today()
+        with self.lock:
+            busy = {(p, d) for p, d, _ in self.dirty} | {(e["ProfileID"], e["log_date"]) for e in self.events}
+            for key in [k for k in self.logs if k[1] < today and k not in busy]:
+                del self.logs[key]
+                self.seq.pop(key, None)
+                self.snapped.pop(key, None)
+
+    def compact(self, before: Optional[date] = None) -> int:
+        """fold days older than `compact_after` days into their final snapshots, one short transaction per batch"""
+        before = before or date.today() - timedelta(days=self.compact_after)
+        done = 0
+        while not self._closed:
+            with self.session_factory() as sess:
+                n = events.compact(sess, before, self.compact_batch)
+                sess.commit()
+            done += n
+            if n < self.compact_batch:
+                break
+        return done
+
+    def _start_compaction(self) -> None:
+        """once a day, on a thread of its own"""
+        today = date.today()
+        if self._compacted == today or (self._compactor is not None and self._compactor.is_alive()):
+            return
+
+        def run():
+            try:
+                self.compact()
+                self._compacted = today
+            except Exception:
+                logger.exception("Macro log compaction failed, will retry")
+
+        self._compactor = threading.Thread(target=run, name="macro-log-compactor", daemon=True)
+        self._compactor.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Macro log flush failed, will retry")
+            self._start_compaction()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+        self.flush()
+
+
+_store: Optional[MacroLogStore] = None
+
+
+def get_macro_store() -> MacroLogStore:
+    """process-wide store, MACRO_FLUSH_INTERVAL / MACRO_FLUSH_BATCH tune the write-behind"""
+    global _store
+    if _store is None:
+        from app.core.session import SessionLocal
+        _store = MacroLogStore(
+            SessionLocal,
+            flush_interval=float(os.getenv("MACRO_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)),
+            batch_size=int(os.getenv("MACRO_FLUSH_BATCH", DEFAULT_BATCH_SIZE)),
+        )
+        atexit.register(_store.close)
+    return _store
+
+
+def close_macro_store() -> None:
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -1,20 +1,129 @@
-from dataclasses import dataclass, field
-from typing import Literal, Optional
+""" macro trackers for one day\n
+- tracker ids / names / units live once in a shared TrackerSchema, not on every log\n
+- a DailyLog is a slotted object holding one fixed-width array: n values then n goals (NaN = no goal)\n
+- directions are a bitmask (bit i set = tracker i is an "over" goal), as is "goal was given as an int"\n
+- Tracker is a two-slot view onto (log, index); summary() output is unchanged"""
+
+from array import array
 from datetime import date
+from math import isnan, nan
+from typing import Iterable, Literal, Optional
 
 
 GoalDirection = Literal["under", "over"]
 
 
-@dataclass
+class TrackerSchema:
+    """the fixed tracker layout of a log, interned so every log with the same layout shares one"""
+
+    __slots__ = ("ids", "names", "units", "index", "n")
+    _interned: dict = {}
+
+    def __init__(self, specs: tuple[tuple[str, str, str], ...]):
+        self.ids = tuple(s[0] for s in specs)
+        self.names = tuple(s[1] for s in specs)
+        self.units = tuple(s[2] for s in specs)
+        self.index = {tid: i for i, tid in enumerate(self.ids)}
+        self.n = len(self.ids)
+
+    @classmethod
+    def of(cls, specs: Iterable[tuple[str, str, str]]) -> "TrackerSchema":
+        specs = tuple(tuple(s) for s in specs)
+        schema = cls._interned.get(specs)
+        if schema is None:
+            schema = cls._interned.setdefault(specs, cls(specs))
+        return schema
+
+    def __len__(self) -> int:
+        return self.n
+
+
+MACROS = TrackerSchema.of([
+    ("calories", "Calories", "kcal"),
+    ("protein",  "Protein",  "g"),
+    ("carbs",    "Carbs",    "g"),
+    ("fat",      "Fat",      "g"),
+    ("sugar",    "Sugar",    "g"),
+    ("sodium",   "Sodium",   "mg"),
+    ("fiber",    "Fiber",    "g"),
+    ("water",    "Water",    "cups"),
+])
+DEFAULT_GOALS = (2000, 150, 250, 65, 50, 2300, 28, 8)
+DEFAULT_OVER = 0b11000010          # protein, fiber, water
+
+
 class Tracker:
-    id: str
-    name: str
-    unit: str
-    goal: Optional[float]
-    direction: GoalDirection = "under"
-    value: float = 0.0
-    
+    """one tracker of a DailyLog; Tracker(...) on its own builds a single-tracker log behind it"""
+
+    __slots__ = ("_log", "_i")
+
+    def __init__(self, id: str, name: str, unit: str, goal: Optional[float],
+                 direction: GoalDirection = "under", value: float = 0.0):
+        self._log = DailyLog._make(
+            TrackerSchema.of([(id, name, unit)]), [value], [goal], 1 if direction == "over" else 0,
+        )
+        self._i = 0
+
+    @classmethod
+    def _view(cls, log: "DailyLog", i: int) -> "Tracker":
+        t = object.__new__(cls)
+        t._log, t._i = log, i
+        return t
+
+    @property
+    def id(self) -> str:
+        return self._log.schema.ids[self._i]
+
+    @property
+    def name(self) -> str:
+        return self._log.schema.names[self._i]
+
+    @property
+    def unit(self) -> str:
+        return self._log.schema.units[self._i]
+
+    @property
+    def value(self) -> float:
+        return self._log.data[self._i]
+
+    @value.setter
+    def value(self, v: float) -> None:
+        self._log.data[self._i] = v
+
+    @property
+    def goal(self) -> Optional[float]:
+        g = self._log.data[self._log.schema.n + self._i]
+        if isnan(g):
+            return None
+        return int(g) if self._log.int_goals >> self._i & 1 else g
+
+    @goal.setter
+    def goal(self, g: Optional[float]) -> None:
+        log, bit = self._log, 1 << self._i
+        log.data[log.schema.n + self._i] = nan if g is None else g
+        log.int_goals = log.int_goals | bit if isinstance(g, int) else log.int_goals & ~bit
+
+    @property
+    def direction(self) -> GoalDirection:
+        return "over" if self._log.over >> self._i & 1 else "under"
+
+    @direction.setter
+    def direction(self, d: GoalDirection) -> None:
+        bit = 1 << self._i
+        self._log.over = self._log.over | bit if d == "over" else self._log.over & ~bit
+
+    def __repr__(self) -> str:
+        return (f"Tracker(id={self.id!r}, name={self.name!r}, unit={self.unit!r}, goal={self.goal!r}, "
+                f"direction={self.direction!r}, value={self.value!r})")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Tracker):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def _fields(self) -> tuple:
+        return (self.id, self.name, self.unit, self.goal, self.direction, self.value)
+
     def log(self, amount: float) -> None:
         if amount <= 0:
             raise ValueError("Amount must be positive.")
@@ -45,89 +154,124 @@ class Tracker:
 
     @property
     def is_goal_met(self) -> Optional[bool]:
-        if self.goal is None or self.value == 0:
-            return None
-        if self.direction == "under":
-            return self.value <= self.goal
-        return self.value >= self.goal
+        return _goal_met(self.value, self.goal, self.direction)
 
     @property
     def progress_pct(self) -> float:
         """0.0–1.0. Returns 0 when no goal is set."""
-        if self.goal is None or self.goal <= 0:
-            return 0.0
-        return min(self.value / self.goal, 1.0)
+        return _progress(self.value, self.goal)
 
     @property
     def status_text(self) -> str:
-        met = self.is_goal_met
-        if met is None:
-            return "no goal set" if self.goal is None else "not started"
-        diff = abs(self.goal - self.value)
-        if met:
-            return f"{diff:.1f}{self.unit} left" if self.direction == "under" else "goal met"
-        return f"{diff:.1f}{self.unit} over" if self.direction == "under" else f"{diff:.1f}{self.unit} to go"
+        return _status(self.value, self.goal, self.direction, self.unit)
 
     def summary(self) -> dict:
+        log, i = self._log, self._i
+        schema = log.schema
+        value, goal, direction = log.data[i], self.goal, self.direction
         return {
-            "id":           self.id,
-            "name":         self.name,
-            "unit":         self.unit,
-            "value":        round(self.value, 1),
-            "goal":         self.goal,
-            "has_goal":     self.has_goal,
-            "direction":    self.direction,
-            "progress_pct": round(self.progress_pct * 100, 1),
-            "goal_met":     self.is_goal_met,
-            "status":       self.status_text,
+            "id":           schema.ids[i],
+            "name":         schema.names[i],
+            "unit":         schema.units[i],
+            "value":        round(value, 1),
+            "goal":         goal,
+            "has_goal":     goal is not None,
+            "direction":    direction,
+            "progress_pct": round(_progress(value, goal) * 100, 1),
+            "goal_met":     _goal_met(value, goal, direction),
+            "status":       _status(value, goal, direction, schema.units[i]),
         }
 
 
-@dataclass
+def _goal_met(value: float, goal: Optional[float], direction: GoalDirection) -> Optional[bool]:
+    if goal is None or value == 0:
+        return None
+    if direction == "under":
+        return value <= goal
+    return value >= goal
+
+
+def _progress(value: float, goal: Optional[float]) -> float:
+    if goal is None or goal <= 0:
+        return 0.0
+    return min(value / goal, 1.0)
+
+
+def _status(value: float, goal: Optional[float], direction: GoalDirection, unit: str) -> str:
+    met = _goal_met(value, goal, direction)
+    if met is None:
+        return "no goal set" if goal is None else "not started"
+    diff = abs(goal - value)
+    if met:
+        return f"{diff:.1f}{unit} left" if direction == "under" else "goal met"
+    return f"{diff:.1f}{unit} over" if direction == "under" else f"{diff:.1f}{unit} to go"
+
+
+def _int_mask(goals: Iterable[Optional[float]]) -> int:
+    return sum(1 << i for i, g in enumerate(goals) if isinstance(g, int))
+
+
 class DailyLog:
-    log_date: date = field(default_factory=date.today)
-    trackers: list[Tracker] = field(default_factory=list)
+    __slots__ = ("log_date", "schema", "data", "over", "int_goals")
+
+    def __init__(self, log_date: Optional[date] = None, trackers: Iterable[Tracker] = ()):
+        trackers = list(trackers)
+        self.log_date = log_date or date.today()
+        self.schema = TrackerSchema.of((t.id, t.name, t.unit) for t in trackers)
+        self.data = array("d", [t.value for t in trackers] + [nan if t.goal is None else t.goal for t in trackers])
+        self.over = sum(1 << i for i, t in enumerate(trackers) if t.direction == "over")
+        self.int_goals = _int_mask(t.goal for t in trackers)
+
+    @classmethod
+    def _make(cls, schema: TrackerSchema, values: Iterable[float], goals: Iterable[Optional[float]],
+              over: int, log_date: Optional[date] = None) -> "DailyLog":
+        log = object.__new__(cls)
+        log.log_date = log_date or date.today()
+        log.schema = schema
+        goals = list(goals)
+        log.data = array("d", list(values) + [nan if g is None else g for g in goals])
+        log.over = over
+        log.int_goals = _int_mask(goals)
+        return log
 
     @classmethod
     def default(cls) -> "DailyLog":
-        return cls(trackers=[
-            Tracker("calories", "Calories", "kcal", 2000, "under"),
-            Tracker("protein",  "Protein",  "g",    150,  "over"),
-            Tracker("carbs",    "Carbs",    "g",    250,  "under"),
-            Tracker("fat",      "Fat",      "g",    65,   "under"),
-            Tracker("sugar",    "Sugar",    "g",    50,   "under"),
-            Tracker("sodium",   "Sodium",   "mg",   2300, "under"),
-            Tracker("fiber",    "Fiber",    "g",    28,   "over"),
-            Tracker("water",    "Water",    "cups", 8,    "over"),
-        ])
+        return cls._make(MACROS, [0.0] * len(MACROS), DEFAULT_GOALS, DEFAULT_OVER)
 
     @classmethod
     def blank(cls) -> "DailyLog":
-        return cls(trackers=[
-            Tracker("calories", "Calories", "kcal", None, "under"),
-            Tracker("protein",  "Protein",  "g",    None, "over"),
-            Tracker("carbs",    "Carbs",    "g",    None, "under"),
-            Tracker("fat",      "Fat",      "g",    None, "under"),
-            Tracker("sugar",    "Sugar",    "g",    None, "under"),
-            Tracker("sodium",   "Sodium",   "mg",   None, "under"),
-            Tracker("fiber",    "Fiber",    "g",    None, "over"),
-            Tracker("water",    "Water",    "cups", None, "over"),
-        ])
+        return cls._make(MACROS, [0.0] * len(MACROS), [None] * len(MACROS), DEFAULT_OVER)
+
+    @property
+    def trackers(self) -> list[Tracker]:
+        return [Tracker._view(self, i) for i in range(len(self.schema))]
+
+    def __repr__(self) -> str:
+        return f"DailyLog(log_date={self.log_date!r}, trackers={self.trackers!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DailyLog):
+            return NotImplemented
+        return self.log_date == other.log_date and self.trackers == other.trackers
 
     def get(self, tracker_id: str) -> Tracker:
-        for t in self.trackers:
-            if t.id == tracker_id:
-                return t
-        raise KeyError(f"No tracker with id '{tracker_id}'")
+        i = self.schema.index.get(tracker_id)
+        if i is None:
+            raise KeyError(f"No tracker with id '{tracker_id}'")
+        return Tracker._view(self, i)
 
     def log(self, tracker_id: str, amount: float) -> None:
-        t = self.get(tracker_id)
-        if not t.has_goal:
+        i = self.schema.index.get(tracker_id)
+        if i is None:
+            raise KeyError(f"No tracker with id '{tracker_id}'")
+        if isnan(self.data[self.schema.n + i]):
             raise ValueError(
                 f"Cannot log to '{tracker_id}' — no goal has been set. "
                 "Call set_goal() first."
             )
-        t.log(amount)
+        if amount <= 0:
+            raise ValueError("Amount must be positive.")
+        self.data[i] += amount
 
     def remove(self, tracker_id: str, amount: float) -> None:
         self.get(tracker_id).remove(amount)
@@ -144,8 +288,8 @@ class DailyLog:
         self.get(tracker_id).clear_goal()
 
     def reset_all(self) -> None:
-        for t in self.trackers:
-            t.reset()
+        for i in range(len(self.schema)):
+            self.data[i] = 0.0
 
     def all_goals_met(self) -> bool:
         return all(
@@ -158,11 +302,12 @@ class DailyLog:
         return [t for t in self.trackers if not t.has_goal]
 
     def summary(self) -> dict:
+        trackers = [t.summary() for t in self.trackers]
         return {
             "date":           str(self.log_date),
-            "all_goals_met":  self.all_goals_met(),
-            "missing_goals":  [t.id for t in self.trackers_without_goals()],
-            "trackers":       [t.summary() for t in self.trackers],
+            "all_goals_met":  all(t["goal_met"] is True for t in trackers if t["has_goal"]),
+            "missing_goals":  [t["id"] for t in trackers if not t["has_goal"]],
+            "trackers":       trackers,
         }
 
 
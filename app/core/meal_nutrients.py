@@ -0,0 +1,89 @@
+""" nutrient vectors for logging meals straight into macro trackers\n
+- one row per item, one column per tracker in TRACKER_COLUMNS order, built once per catalog\n
+- a batch of (item, servings) is one fancy-index + one vector-matrix product\n
+- menu items come from the menu snapshot, homemade Meals from their ingredients (see meal_nutrition)"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.core.menu_catalog import MenuCatalog, load_catalog
+
+# DailyLog tracker id -> menu_meals column
+TRACKER_COLUMNS = {
+    "calories": "energy_kcal",
+    "protein":  "protein_g",
+    "carbs":    "carbohydrates_g",
+    "fat":      "total_fat_g",
+    "sugar":    "sugar_g",
+    "sodium":   "sodium_mg",
+    "fiber":    "fiber_g",
+}
+TRACKERS = tuple(TRACKER_COLUMNS)
+
+
+class NutrientTable:
+    """(items, trackers) float matrix, a missing nutrient counts as 0"""
+
+    def __init__(self, ids: Iterable[int], matrix: np.ndarray, label: str = "item"):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.matrix = np.nan_to_num(np.asarray(matrix, dtype=np.float64))
+        self.label = label
+        self._row_of = {int(i): r for r, i in enumerate(self.ids)}
+
+    @classmethod
+    def from_catalog(cls, catalog: MenuCatalog) -> "NutrientTable":
+        matrix = np.column_stack([np.asarray(catalog.column(c), dtype=np.float64) for c in TRACKER_COLUMNS.values()])
+        return cls(catalog.ids, matrix, label="MenuMealID")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, ids: Iterable[int]) -> np.ndarray:
+        """row index per id, KeyError naming every unknown id"""
+        ids = list(ids)
+        missing = [i for i in ids if i not in self._row_of]
+        if missing:
+            raise KeyError(f"Unknown {self.label}: {missing}")
+        return np.fromiter((self._row_of[i] for i in ids), dtype=np.int64, count=len(ids))
+
+    def totals(self, ids: Iterable[int], servings: Iterable[float]) -> np.ndarray:
+        """(trackers,) summed nutrients of ids[i] x servings[i]"""
+        rows = self.rows(ids)
+        return np.asarray(list(servings), dtype=np.float64) @ self.matrix[rows]
+
+
+def menu_nutrients() -> NutrientTable:
+    return _menu_nutrients(load_catalog())
+
+
+@lru_cache(maxsize=1)
+def _menu_nutrients(catalog: MenuCatalog) -> NutrientTable:
+    return NutrientTable.from_catalog(catalog)
+
+
+def meal_nutrients() -> Optional[NutrientTable]:
+    """homemade meals, None until meal_nutrition has been loaded"""
+    from app.core.meal_nutrition import meal_nutrition
+    return meal_nutrition.table() if meal_nutrition.loaded else None
+
+
+def batch_totals(menu_items: list[tuple[int, float]], meal_items: list[tuple[int, float]]) -> dict[str, float]:
+    """
+    tracker id -> amount for a batch of (MenuMealID, servings) and (MealID, servings);
+    every id is resolved before anything is summed, KeyError if any is unknown
+    """
+    total = np.zeros(len(TRACKERS))
+    if menu_items:
+        ids, servings = zip(*menu_items)
+        total += menu_nutrients().totals(ids, servings)
+    if meal_items:
+        table = meal_nutrients()
+        if table is None:
+            raise KeyError(f"No nutrition data for MealID: {[i for i, _ in meal_items]}")
+        ids, servings = zip(*meal_items)
+        total += table.totals(ids, servings)
+    return {t: float(v) for t, v in zip(TRACKERS, total)}
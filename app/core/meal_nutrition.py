@@ -0,0 +1,187 @@
+""" homemade meal nutrition from ingredients\n
+- composition is a sparse meals x ingredients matrix of grams (meal_ingredients.serving_size)\n
+- ingredient_nutrients gives an ingredients x nutrients matrix, scaled to per gram\n
+- every meal's totals are one sparse product, scipy.sparse when installed, a numpy scatter-add otherwise\n
+- totals are cached; an ingredient change recomputes only the meals that contain it, a recipe change only that meal"""
+
+from __future__ import annotations
+
+import threading
+from typing import Mapping, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.db import ingredient_nutrients, meal_ingredients
+from app.core.meal_nutrients import TRACKER_COLUMNS, NutrientTable
+
+try:
+    from scipy import sparse
+except ModuleNotFoundError:
+    sparse = None
+
+NUTRIENTS = tuple(TRACKER_COLUMNS.values())       # energy_kcal, protein_g, ...
+
+
+class MealNutrition:
+    """the writers below are no-ops until load() has run"""
+
+    def __init__(self, use_scipy: Optional[bool] = None):
+        self.use_scipy = sparse is not None if use_scipy is None else use_scipy and sparse is not None
+        self.loaded = False
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.meal_row: dict[int, int] = {}
+        self.ing_col: dict[int, int] = {}
+        self.recipes: list[dict[int, float]] = []           # meal row -> {ingredient col: grams}
+        self.used_in: list[set[int]] = []                   # ingredient col -> meal rows
+        self.per_gram = np.zeros((0, len(NUTRIENTS)))
+        self.known = np.zeros(0, dtype=bool)                # ingredient col has nutrient data
+        self.totals = np.zeros((0, len(NUTRIENTS)))         # meal row -> nutrients, the cache
+        self.missing = np.zeros(0, dtype=np.int64)          # meal row -> ingredients without data
+        self._table: Optional[NutrientTable] = None
+
+    # ---- building ----
+    def load(self, sess: Session) -> "MealNutrition":
+        with self.lock:
+            self._reset()
+            for row in sess.query(ingredient_nutrients):
+                self._set_nutrients(row.IngredientID, _per_gram(row))
+            for meal_id, ingredient_id, grams in sess.query(
+                meal_ingredients.MealID, meal_ingredients.IngredientID, meal_ingredients.serving_size,
+            ):
+                r, c = self._row(meal_id), self._col(ingredient_id)
+                self.recipes[r][c] = grams or 0.0
+                self.used_in[c].add(r)
+            self._recompute(np.arange(len(self.recipes)))
+            self.loaded = True
+        return self
+
+    def ensure_loaded(self, sess: Session) -> "MealNutrition":
+        if not self.loaded:
+            self.load(sess)
+        return self
+
+    def _row(self, meal_id: int) -> int:
+        r = self.meal_row.get(meal_id)
+        if r is None:
+            r = self.meal_row[meal_id] = len(self.recipes)
+            self.recipes.append({})
+            self.totals = _grow(self.totals, r + 1)
+            self.missing = _grow(self.missing, r + 1)
+        return r
+
+    def _col(self, ingredient_id: int) -> int:
+        c = self.ing_col.get(ingredient_id)
+        if c is None:
+            c = self.ing_col[ingredient_id] = len(self.used_in)
+            self.used_in.append(set())
+            self.per_gram = _grow(self.per_gram, c + 1)
+            self.known = _grow(self.known, c + 1)
+        return c
+
+    def _set_nutrients(self, ingredient_id: int, per_gram: Optional[np.ndarray]) -> int:
+        c = self._col(ingredient_id)
+        self.known[c] = per_gram is not None
+        self.per_gram[c] = 0.0 if per_gram is None else per_gram
+        return c
+
+    # ---- the product ----
+    def _recompute(self, rows: np.ndarray) -> None:
+        """totals[rows] = composition[rows] @ per_gram, and the missing-data counts alongside"""
+        self._table = None
+        if not len(rows):
+            return
+        sub_rows, cols, grams = [], [], []
+        for i, r in enumerate(rows):
+            recipe = self.recipes[r]
+            sub_rows.extend([i] * len(recipe))
+            cols.extend(recipe)
+            grams.extend(recipe.values())
+        sub_rows, cols = np.asarray(sub_rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        grams = np.asarray(grams, dtype=np.float64)
+        n = len(self.used_in)          # arrays below have spare capacity past n
+
+        if self.use_scipy:
+            composition = sparse.csr_matrix((grams, (sub_rows, cols)), shape=(len(rows), n))
+            out = composition @ self.per_gram[:n]
+            listed = sparse.csr_matrix((np.ones_like(grams), (sub_rows, cols)), shape=(len(rows), n))
+            unknown = listed @ ~self.known[:n]
+        else:
+            out = np.zeros((len(rows), len(NUTRIENTS)))
+            np.add.at(out, sub_rows, grams[:, None] * self.per_gram[cols])
+            unknown = np.bincount(sub_rows, weights=~self.known[cols], minlength=len(rows))
+        self.totals[rows] = out
+        self.missing[rows] = np.asarray(unknown, dtype=np.int64)
+
+    # ---- changes ----
+    def set_ingredient(self, ingredient_id: int, nutrients: Optional[Mapping[str, Optional[float]]],
+                       per_grams: float = 100.0) -> int:
+        """new nutrient data for one ingredient; returns how many meals were recomputed"""
+        if not self.loaded:
+            return 0
+        with self.lock:
+            per_gram = None if nutrients is None else _scale(nutrients, per_grams)
+            c = self._set_nutrients(ingredient_id, per_gram)
+            rows = np.fromiter(self.used_in[c], dtype=np.int64)
+            self._recompute(rows)
+            return len(rows)
+
+    def set_recipe(self, meal_id: int, grams: Mapping[int, Optional[float]]) -> None:
+        """replace a meal's ingredient list, {IngredientID: grams}"""
+        if not self.loaded:
+            return
+        with self.lock:
+            r = self._row(meal_id)
+            for c in self.recipes[r]:
+                self.used_in[c].discard(r)
+            self.recipes[r] = {self._col(i): g or 0.0 for i, g in grams.items()}
+            for c in self.recipes[r]:
+                self.used_in[c].add(r)
+            self._recompute(np.array([r]))
+
+    # ---- reads ----
+    def get(self, meal_id: int) -> dict:
+        """KeyError if the meal has no ingredients on record"""
+        r = self.meal_row.get(meal_id)
+        if r is None or not self.recipes[r]:
+            raise KeyError(f"No ingredients on record for meal {meal_id}")
+        return {
+            "MealID": meal_id,
+            **{n: round(float(v), 2) for n, v in zip(NUTRIENTS, self.totals[r])},
+            "ingredients": len(self.recipes[r]),
+            "ingredients_missing_nutrients": int(self.missing[r]),
+        }
+
+    def table(self) -> NutrientTable:
+        """every meal with a recipe as a NutrientTable for logging, rebuilt after changes"""
+        with self.lock:
+            if self._table is None:
+                ids = [m for m, r in self.meal_row.items() if self.recipes[r]]
+                rows = [self.meal_row[m] for m in ids]
+                self._table = NutrientTable(ids, self.totals[rows].reshape(len(rows), len(NUTRIENTS)), label="MealID")
+            return self._table
+
+
+def _grow(a: np.ndarray, n: int) -> np.ndarray:
+    """at least n rows, doubling capacity; rows past the old length are zero"""
+    if len(a) >= n:
+        return a
+    out = np.zeros((max(n, 2 * len(a)),) + a.shape[1:], dtype=a.dtype)
+    out[:len(a)] = a
+    return out
+
+
+def _scale(nutrients: Mapping[str, Optional[float]], per_grams: float) -> np.ndarray:
+    if per_grams <= 0:
+        raise ValueError("per_grams must be positive")
+    return np.array([nutrients.get(n) or 0.0 for n in NUTRIENTS], dtype=np.float64) / per_grams
+
+
+def _per_gram(row) -> np.ndarray:
+    return _scale({n: getattr(row, n) for n in NUTRIENTS}, row.per_grams or 100.0)
+
+
+meal_nutrition = MealNutrition()
@@ -0,0 +1,206 @@
+""" binary columnar snapshot of menu_meals\n
+- one .npy file per numeric column, memory-mapped on load\n
+- restaurant/category/product are int32 codes into a shared interned string table\n
+- written by ingest_menu_meals, read at runtime without pandas\n
+- load_catalog() maps the snapshot once per write; caches built from it are keyed on the catalog object"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from typing import Iterable, Mapping
+
+import numpy as np
+
+from app.core.menu_features import FEATURE_BITS, FEATURES, rules_digest
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "menu_snapshot")
+SNAPSHOT_VERSION = 1
+
+TEXT_COLS = ["restaurant", "category", "product"]
+NUMERIC_COLS = [
+    "serving_size",
+    "energy_kcal",
+    "carbohydrates_g",
+    "protein_g",
+    "fiber_g",
+    "sugar_g",
+    "total_fat_g",
+    "saturated_fat_g",
+    "trans_fat_g",
+    "cholesterol_mg",
+    "sodium_mg",
+]
+
+
+class MenuCatalog:
+    """
+    Read-only view over a snapshot directory.\n
+    Columns are numpy arrays (memmaps when loaded from disk), row i is MenuMealID ids[i].
+    """
+
+    def __init__(self, ids: np.ndarray, numeric: dict[str, np.ndarray], features: np.ndarray,
+                 codes: dict[str, np.ndarray], strings: list[str]):
+        self.ids = ids
+        self.numeric = numeric
+        self.features = features
+        self.codes = codes
+        self.strings = strings
+        self._row_of = {int(i): r for r, i in enumerate(ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, name: str) -> np.ndarray:
+        """numeric column, or the decoded strings of a text column"""
+        if name in self.numeric:
+            return self.numeric[name]
+        if name == "features":
+            return self.features
+        if name == "MenuMealID":
+            return self.ids
+        return np.array([self.strings[c] for c in self.codes[name]], dtype=object)
+
+    def row_of(self, menu_meal_id: int) -> int:
+        """row index for a MenuMealID, KeyError if it is not in the catalog"""
+        return self._row_of[menu_meal_id]
+
+    def text(self, name: str, row: int) -> str:
+        return self.strings[self.codes[name][row]]
+
+    def record(self, row: int) -> dict:
+        out = {"MenuMealID": int(self.ids[row])}
+        for c in TEXT_COLS:
+            out[c] = self.text(c, row)
+        for c in NUMERIC_COLS:
+            v = float(self.numeric[c][row])
+            out[c] = None if np.isnan(v) else v
+        bits = int(self.features[row])
+        out["chicken"] = bool(bits & FEATURE_BITS["chicken"])
+        out["features"] = bits
+        return out
+
+    def records(self) -> list[dict]:
+        """rows in the shape ingest_menu_meals() returns, ready for bulk_insert_mappings"""
+        return [self.record(r) for r in range(len(self))]
+
+
+def _intern(columns: Iterable[Iterable[str]]) -> tuple[list[str], list[np.ndarray]]:
+    table: dict[str, int] = {}
+    codes = []
+    for values in columns:
+        codes.append(np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int32))
+    return list(table), codes
+
+
+def write_snapshot(table: Mapping[str, Iterable], path: str = SNAPSHOT_DIR) -> str:
+    """
+    `table` maps column name -> column for MenuMealID, TEXT_COLS, NUMERIC_COLS and features.\n
+    Everything is written to a temp directory beside `path` that is then renamed into place
+    (os.replace), so readers see the old snapshot or the whole new one, never a mix.
+    Other files kept in the snapshot directory (pareto.json) are carried over.
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".menu_snapshot-", dir=parent)
+    try:
+        os.chmod(tmp, 0o755)
+        _write_files(table, tmp)
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if not os.path.exists(os.path.join(tmp, name)):
+                    shutil.copy2(os.path.join(path, name), os.path.join(tmp, name))
+            # a directory can only be renamed onto an empty one: move the old snapshot aside first
+            old = f"{tmp}.old"
+            os.replace(path, old)
+            try:
+                os.replace(tmp, path)
+            except OSError:
+                os.replace(old, path)
+                raise
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+def _write_files(table: Mapping[str, Iterable], path: str) -> None:
+
+    ids = np.asarray(table["MenuMealID"], dtype=np.int64)
+    np.save(os.path.join(path, "MenuMealID.npy"), ids)
+    np.save(os.path.join(path, "features.npy"), np.asarray(table["features"], dtype=np.int64))
+    for c in NUMERIC_COLS:
+        values = np.array([np.nan if v is None else v for v in table[c]], dtype=np.float64)
+        np.save(os.path.join(path, f"{c}.npy"), values)
+
+    texts = [["" if not isinstance(v, str) else v for v in table[c]] for c in TEXT_COLS]
+    strings, codes = _intern(texts)
+    for c, code in zip(TEXT_COLS, codes):
+        np.save(os.path.join(path, f"{c}.npy"), code)
+
+    # interned string table: utf-8 blob + offsets, strings[i] = blob[offsets[i]:offsets[i + 1]]
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    with open(os.path.join(path, "strings.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(path, "string_offsets.npy"), offsets)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "rows": int(len(ids)),
+        "numeric": NUMERIC_COLS,
+        "text": TEXT_COLS,
+        "features": FEATURES,
+        "rules": rules_digest(),
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_snapshot(path: str = SNAPSHOT_DIR) -> MenuCatalog:
+    """memory-map a snapshot; FileNotFoundError if none has been written yet"""
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if (manifest["version"] != SNAPSHOT_VERSION or manifest["features"] != FEATURES
+            or manifest.get("rules") != rules_digest()):
+        raise ValueError(f"Stale menu snapshot at {path}, re-run ingest_menu_meals")
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+    offsets = np.load(os.path.join(path, "string_offsets.npy"))
+    with open(os.path.join(path, "strings.bin"), "rb") as f:
+        blob = f.read()
+    strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    return MenuCatalog(
+        ids=load("MenuMealID"),
+        numeric={c: load(c) for c in manifest["numeric"]},
+        features=load("features"),
+        codes={c: load(c) for c in manifest["text"]},
+        strings=strings,
+    )
+
+
+def snapshot_stamp(path: str = SNAPSHOT_DIR, name: str = "manifest.json") -> tuple[int, int, int]:
+    """identity of a snapshot file, it changes whenever the file is rewritten or replaced"""
+    st = os.stat(os.path.join(path, name))
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def load_catalog() -> MenuCatalog:
+    """process-wide catalog, mapped again after the snapshot is rewritten (by this or another process)"""
+    return _catalog_at(SNAPSHOT_DIR, snapshot_stamp(SNAPSHOT_DIR))
+
+
+@lru_cache(maxsize=1)
+def _catalog_at(path: str, stamp: tuple[int, int, int]) -> MenuCatalog:
+    return read_snapshot(path)
@@ -0,0 +1,186 @@
+""" derived attributes for menu_meals, declared as rules and packed into one bitmask column\n
+- every feature is the OR of its rules; a rule ANDs its keyword/regex test, restaurant scope and nutrient bounds\n
+- rules are compiled once and evaluated a whole column at a time at ingest\n
+- bit i of menu_meals.features is set when FEATURES[i] holds for that row\n
+- rules_digest() changes with any rule, so stored bits can be checked against the rules that made them"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Mapping, Optional
+
+import numpy as np
+
+
+Bounds = tuple[Optional[float], Optional[float]]   # (min, max), either side open
+
+
+@dataclass(frozen=True)
+class FeatureRule:
+    feature: str
+    pattern: Optional[str] = None                   # regex searched in `text_column`, case-insensitive
+    text_column: str = "product"
+    restaurant: Optional[str] = None                # only rows from this chain
+    exclude: Optional[str] = None                   # regex that vetoes a match
+    bounds: Mapping[str, Bounds] = field(default_factory=dict)
+    unless: tuple[str, ...] = ()                    # earlier features that veto a match
+
+
+def keyword(feature: str, *words: str, restaurant: str | None = None,
+            exclude: Iterable[str] = (), unless: Iterable[str] = ()) -> FeatureRule:
+    """match when the product mentions any of `words`"""
+    return FeatureRule(
+        feature,
+        pattern=_alternation(words) if words else None,
+        restaurant=restaurant,
+        exclude=_alternation(exclude) if exclude else None,
+        unless=tuple(unless),
+    )
+
+
+def regex(feature: str, pattern: str, *, text_column: str = "product",
+          restaurant: str | None = None) -> FeatureRule:
+    return FeatureRule(feature, pattern=pattern, text_column=text_column, restaurant=restaurant)
+
+
+def threshold(feature: str, *, restaurant: str | None = None, **bounds: Bounds) -> FeatureRule:
+    """match when every named nutrient column lies inside its (min, max)"""
+    return FeatureRule(feature, restaurant=restaurant, bounds=bounds)
+
+
+def _alternation(words: Iterable[str]) -> str:
+    return "|".join(re.escape(w) for w in words)
+
+
+# -----------------------------
+# rule set
+# -----------------------------
+MEAT_WORDS = (
+    "chicken", "beef", "pork", "bacon", "sausage", "pepperoni", "salami", "turkey",
+    "mutton", "lamb", "fish", "tuna", "salmon", "shrimp", "prawn", "nugget", "meat",
+)
+
+RULES: list[FeatureRule] = [
+    # chicken, same coverage as the old hand-written flag
+    keyword("chicken", "chicken"),
+    keyword("chicken", "Chicken", "Chick-n-Minis", "Heart-Shaped", "Chick-n-Strips", "Nuggets", "Filet", "Sandwich",
+            restaurant="Chick-fil-A"),
+    keyword("chicken", restaurant="KFC", exclude=["veg"]),
+
+    keyword("beef", "beef", "hamburger", "cheeseburger", "shackburger", "smokeshack", "shack stack",
+            "big mac", "quarter pounder"),
+    keyword("beef", "burger", restaurant="Shake Shack", exclude=["chicken", "veg", "shroom"]),
+
+    regex("pork", r"\b(pork|bacon|ham|pepperoni|salami)\b|(?<!chicken )\bsausage\b"),
+    keyword("fish", "fish", "tuna", "salmon", "shrimp", "prawn", "filet-o"),
+
+    # best guess: nothing meaty in the name and not already flagged as a meat
+    keyword("vegetarian", exclude=MEAT_WORDS, unless=("chicken", "beef", "pork", "fish")),
+
+    threshold("high_protein", protein_g=(20, None)),
+    threshold("low_cal", energy_kcal=(None, 400)),
+    threshold("keto_friendly", carbohydrates_g=(None, 10), total_fat_g=(10, None)),
+]
+
+FEATURES: list[str] = list(dict.fromkeys(r.feature for r in RULES))
+FEATURE_BITS: dict[str, int] = {name: 1 << i for i, name in enumerate(FEATURES)}
+PROTEINS = ("chicken", "beef", "pork", "fish")
+
+
+def rules_digest(rules: Iterable[FeatureRule] = RULES) -> str:
+    payload = json.dumps([asdict(r) for r in rules], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def feature_mask(*names: str) -> int:
+    """OR of the bits for `names`; raises KeyError on an unknown feature"""
+    mask = 0
+    for name in names:
+        if name not in FEATURE_BITS:
+            raise KeyError(f"Unknown menu feature '{name}'")
+        mask |= FEATURE_BITS[name]
+    return mask
+
+
+def decode_features(bits: int) -> list[str]:
+    return [name for name, bit in FEATURE_BITS.items() if bits & bit]
+
+
+# -----------------------------
+# evaluation
+# -----------------------------
+class CompiledRules:
+    """
+    RULES compiled for repeated evaluation.\n
+    Regexes are compiled once and every distinct (column, pattern) pair is searched
+    once per call, however many rules share it.
+    """
+
+    def __init__(self, rules: list[FeatureRule]):
+        self.rules = rules
+        self.features = list(dict.fromkeys(r.feature for r in rules))
+        self.bits = {name: i for i, name in enumerate(self.features)}
+        self._regex: dict[str, re.Pattern] = {}
+        for r in rules:
+            for p in (r.pattern, r.exclude):
+                if p is not None and p not in self._regex:
+                    self._regex[p] = re.compile(p, re.IGNORECASE)
+
+    def evaluate(self, table: Mapping[str, Iterable]) -> np.ndarray:
+        """
+        `table` maps column name -> column (DataFrame, dict of arrays, ...).\n
+        Returns one int64 bitmask per row.
+        """
+        cols: dict[str, np.ndarray] = {}
+
+        def col(name: str) -> np.ndarray:
+            if name not in cols:
+                cols[name] = np.asarray(table[name])
+            return cols[name]
+
+        n = len(col("product"))
+        searched: dict[tuple[str, str], np.ndarray] = {}
+
+        def search(column: str, pattern: str) -> np.ndarray:
+            key = (column, pattern)
+            if key not in searched:
+                rx = self._regex[pattern]
+                values = col(column)
+                searched[key] = np.fromiter(
+                    (isinstance(v, str) and rx.search(v) is not None for v in values), dtype=bool, count=n
+                )
+            return searched[key]
+
+        hits = {name: np.zeros(n, dtype=bool) for name in self.features}
+        for r in self.rules:
+            m = np.ones(n, dtype=bool)
+            if r.restaurant is not None:
+                m &= col("restaurant") == r.restaurant
+            if r.pattern is not None:
+                m &= search(r.text_column, r.pattern)
+            if r.exclude is not None:
+                m &= ~search(r.text_column, r.exclude)
+            for column, (lo, hi) in r.bounds.items():
+                v = col(column).astype(float)
+                if lo is not None:
+                    m &= v >= lo        # NaN compares False, so missing data never matches
+                if hi is not None:
+                    m &= v <= hi
+            for other in r.unless:
+                m &= ~hits[other]
+            hits[r.feature] |= m
+
+        out = np.zeros(n, dtype=np.int64)
+        for name, m in hits.items():
+            out |= m.astype(np.int64) << self.bits[name]
+        return out
+
+
+COMPILED = CompiledRules(RULES)
+
+
+def derive_feature_bits(table: Mapping[str, Iterable]) -> np.ndarray:
+    return COMPILED.evaluate(table)
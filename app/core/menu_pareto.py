@@ -0,0 +1,194 @@
+""" Pareto frontier of menu_meals per restaurant and across the whole catalog\n
+- an item is on the frontier when no other item is at least as good on every axis and better on one\n
+- ingest stores the frontier for PARETO_AXES next to the menu snapshot (pareto.json)\n
+- re-ingest only recomputes restaurants whose rows changed\n
+- reads for the default axes touch only the stored frontier"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.menu_catalog import SNAPSHOT_DIR, MenuCatalog, load_catalog, snapshot_stamp
+
+Axis = tuple[str, str]      # (column, "min" | "max")
+
+PARETO_AXES: list[Axis] = [
+    ("protein_g", "max"),
+    ("energy_kcal", "min"),
+    ("sodium_mg", "min"),
+]
+PARETO_FILE = "pareto.json"
+
+
+def parse_axes(spec: str) -> list[Axis]:
+    """'protein_g:max,energy_kcal:min' -> [("protein_g", "max"), ("energy_kcal", "min")]"""
+    axes = []
+    for part in spec.split(","):
+        column, _, sense = part.strip().partition(":")
+        sense = sense or "min"
+        if sense not in ("min", "max"):
+            raise ValueError(f"Axis sense must be min or max, got '{sense}'")
+        axes.append((column, sense))
+    if not axes:
+        raise ValueError("At least one axis is required")
+    return axes
+
+
+def pareto_front(values: np.ndarray) -> np.ndarray:
+    """
+    positions of the non-dominated rows of `values` (n, d), smaller is better on every column.\n
+    Rows are visited in lexicographic order, so a row can only be dominated by one already
+    kept; each visit is one vectorized comparison against the current frontier. The result
+    keeps that order, best first on the leading axis.
+    """
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort(values.T[::-1])
+    front: list[int] = []
+    kept = np.empty((n, values.shape[1]))
+    for i in order:
+        v = values[i]
+        if front:
+            f = kept[:len(front)]
+            if np.any(np.all(f <= v, axis=1) & np.any(f < v, axis=1)):
+                continue
+        kept[len(front)] = v
+        front.append(i)
+    return np.array(front, dtype=np.int64)
+
+
+def _oriented(catalog: MenuCatalog, axes: Sequence[Axis], rows: np.ndarray) -> np.ndarray:
+    cols = []
+    for column, sense in axes:
+        v = np.asarray(catalog.column(column), dtype=np.float64)[rows]
+        cols.append(-v if sense == "max" else v)
+    return np.column_stack(cols)
+
+
+def _frontier_rows(catalog: MenuCatalog, axes: Sequence[Axis], rows: np.ndarray) -> np.ndarray:
+    """rows of `rows` on the frontier; rows missing any axis value never qualify"""
+    values = _oriented(catalog, axes, rows)
+    complete = ~np.isnan(values).any(axis=1)
+    rows, values = rows[complete], values[complete]
+    return rows[pareto_front(values)]
+
+
+def _group_digest(catalog: MenuCatalog, axes: Sequence[Axis], rows: np.ndarray) -> str:
+    h = hashlib.sha1()
+    h.update(np.asarray(catalog.ids)[rows].tobytes())
+    h.update(_oriented(catalog, axes, rows).tobytes())
+    return h.hexdigest()
+
+
+def build_pareto_index(catalog: MenuCatalog, axes: Sequence[Axis] = PARETO_AXES,
+                       previous: Optional[dict] = None) -> dict:
+    """
+    {"axes", "groups": {restaurant: {"digest", "ids"}}, "global"} for `catalog`.\n
+    Restaurants whose digest matches `previous` keep their stored frontier. The global
+    frontier is taken over the union of restaurant frontiers, since anything dominated
+    inside its own restaurant is dominated globally too.
+    """
+    axes = [list(a) for a in axes]
+    reuse = previous if previous and previous.get("axes") == axes else None
+    ids = np.asarray(catalog.ids)
+    restaurants = np.asarray(catalog.codes["restaurant"])
+
+    groups: dict[str, dict] = {}
+    candidates = []
+    for code in np.unique(restaurants):
+        rows = np.flatnonzero(restaurants == code)
+        name = catalog.strings[code]
+        digest = _group_digest(catalog, axes, rows)
+        old = reuse["groups"].get(name) if reuse else None
+        if old and old["digest"] == digest:
+            front_ids = old["ids"]
+        else:
+            front_ids = [int(i) for i in ids[_frontier_rows(catalog, axes, rows)]]
+        groups[name] = {"digest": digest, "ids": front_ids}
+        candidates.extend(catalog.row_of(i) for i in front_ids)
+
+    cand = np.array(sorted(candidates), dtype=np.int64)
+    global_ids = [int(i) for i in ids[_frontier_rows(catalog, axes, cand)]]
+    return {"axes": axes, "groups": groups, "global": global_ids}
+
+
+def refresh_pareto_index(path: str = SNAPSHOT_DIR, catalog: Optional[MenuCatalog] = None) -> dict:
+    """
+    rebuild pareto.json against the snapshot at `path`, reusing unchanged restaurants;
+    readers pick the new file up on their next load_pareto_index()
+    """
+    from app.core.menu_catalog import read_snapshot
+
+    catalog = catalog or read_snapshot(path)
+    file = os.path.join(path, PARETO_FILE)
+    previous = None
+    if os.path.exists(file):
+        with open(file, encoding="utf-8") as f:
+            previous = json.load(f)
+    index = build_pareto_index(catalog, PARETO_AXES, previous)
+    # written beside the old file and renamed over it, readers never see a partial pareto.json
+    fd, tmp = tempfile.mkstemp(prefix=".pareto-", suffix=".json", dir=path)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return index
+
+
+def load_pareto_index() -> dict:
+    """pareto.json, read again after it is rewritten"""
+    return _pareto_index_at(snapshot_stamp(SNAPSHOT_DIR, PARETO_FILE))
+
+
+@lru_cache(maxsize=1)
+def _pareto_index_at(stamp: tuple[int, int, int]) -> dict:
+    with open(os.path.join(SNAPSHOT_DIR, PARETO_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=32)
+def _adhoc_index(catalog: MenuCatalog, axes: tuple[Axis, ...]) -> dict:
+    return build_pareto_index(catalog, axes)
+
+
+def pareto_options(restaurant: Optional[str] = None, axes: Optional[Sequence[Axis]] = None) -> list[dict]:
+    """
+    frontier items as catalog records, for one restaurant (case-insensitive) or globally.\n
+    The stored index answers the default axes; other axes are computed once and cached.
+    KeyError for an unknown restaurant, ValueError for an unknown axis column.
+    """
+    catalog = load_catalog()
+    axes = [tuple(a) for a in (axes or PARETO_AXES)]
+    for column, _ in axes:
+        if column not in catalog.numeric:
+            raise ValueError(f"Unknown nutrient axis '{column}'")
+
+    index = None
+    if axes == [tuple(a) for a in PARETO_AXES]:
+        try:
+            index = load_pareto_index()
+        except FileNotFoundError:
+            pass
+    if index is None or index["axes"] != [list(a) for a in axes]:
+        index = _adhoc_index(catalog, tuple(axes))
+
+    if restaurant is None:
+        ids = index["global"]
+    else:
+        match = {name.lower(): name for name in index["groups"]}.get(restaurant.strip().lower())
+        if match is None:
+            raise KeyError(restaurant)
+        ids = index["groups"][match]["ids"]
+    return [catalog.record(catalog.row_of(i)) for i in ids]
@@ -0,0 +1,217 @@
+""" "healthier swap" suggestions for menu_meals\n
+- every item is a z-scored nutrient vector plus a scaled one-hot of its category\n
+- a swap is one of the k nearest items that is strictly better on the chosen axis\n
+- single lookups are one vectorized distance pass (or a KD-tree query when scipy is installed)\n
+- precompute_swaps() fills the whole catalog in parallel blocks"""
+
+from __future__ import annotations
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Literal, Optional
+
+import numpy as np
+
+from app.core.menu_catalog import MenuCatalog, load_catalog
+
+try:
+    from scipy.spatial import cKDTree
+except ModuleNotFoundError:
+    cKDTree = None
+
+
+Better = Literal["min", "max"]
+
+VECTOR_COLS = [
+    "energy_kcal",
+    "carbohydrates_g",
+    "protein_g",
+    "fiber_g",
+    "sugar_g",
+    "total_fat_g",
+    "saturated_fat_g",
+    "sodium_mg",
+]
+
+# which way is "healthier" for each axis a swap can be asked for
+AXES: dict[str, Better] = {
+    "energy_kcal":     "min",
+    "carbohydrates_g": "min",
+    "protein_g":       "max",
+    "fiber_g":         "max",
+    "sugar_g":         "min",
+    "total_fat_g":     "min",
+    "saturated_fat_g": "min",
+    "sodium_mg":       "min",
+}
+
+CATEGORY_PENALTY = 4.0      # squared-distance cost of crossing categories, in z-score units
+
+
+@dataclass(frozen=True)
+class Swap:
+    row: int
+    distance: float
+    improvement: float      # how much better on the axis, always > 0
+
+
+class NutrientSpace:
+    """normalized nutrient matrix over a catalog, built once and queried many times"""
+
+    def __init__(self, catalog: MenuCatalog, category_penalty: float = CATEGORY_PENALTY):
+        self.catalog = catalog
+        raw = np.column_stack([np.asarray(catalog.column(c), dtype=np.float64) for c in VECTOR_COLS])
+        self.raw = raw
+
+        mean = np.nanmean(raw, axis=0)
+        std = np.nanstd(raw, axis=0)
+        std[std == 0] = 1.0
+        z = (raw - mean) / std
+        z[np.isnan(z)] = 0.0            # missing nutrient -> treated as average
+
+        # ||s*e_a - s*e_b||^2 = 2s^2, so categories add exactly category_penalty when they differ
+        categories = np.asarray(catalog.codes["category"])
+        _, cat_idx = np.unique(categories, return_inverse=True)
+        onehot = np.zeros((len(categories), cat_idx.max() + 1 if len(categories) else 0))
+        onehot[np.arange(len(categories)), cat_idx] = math.sqrt(category_penalty / 2)
+
+        self.vectors = np.hstack([z, onehot])
+        self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.categories = cat_idx
+        self._tree = None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def axis_values(self, axis: str) -> np.ndarray:
+        if axis not in AXES:
+            raise ValueError(f"Unknown swap axis '{axis}', expected one of {list(AXES)}")
+        return self.raw[:, VECTOR_COLS.index(axis)]
+
+    def _better(self, axis: str, rows: np.ndarray) -> np.ndarray:
+        """(len(rows), n) mask of candidates strictly better than each row on `axis`"""
+        v = self.axis_values(axis)
+        with np.errstate(invalid="ignore"):
+            if AXES[axis] == "min":
+                return v[None, :] < v[rows, None]
+            return v[None, :] > v[rows, None]
+
+    def _improvement(self, axis: str, row: int, cand: np.ndarray) -> np.ndarray:
+        v = self.axis_values(axis)
+        return v[row] - v[cand] if AXES[axis] == "min" else v[cand] - v[row]
+
+    def swaps(self, row: int, axis: str, k: int = 5, same_category: bool = False,
+              use_tree: Optional[bool] = None) -> list[Swap]:
+        """k nearest items strictly better than `row` on `axis`, closest first"""
+        better = self._better(axis, np.array([row]))[0]
+        if same_category:
+            better &= self.categories == self.categories[row]
+        if not better.any():
+            return []
+
+        if use_tree is None:
+            use_tree = cKDTree is not None
+        if use_tree and cKDTree is not None:
+            cand, dist = self._tree_query(row, better, k)
+        else:
+            d2 = self.sq_norms + self.sq_norms[row] - 2 * (self.vectors @ self.vectors[row])
+            d2[~better] = np.inf
+            cand = _top_k(d2, k)
+            cand = cand[np.isfinite(d2[cand])]
+            dist = np.sqrt(np.maximum(d2[cand], 0))
+
+        gain = self._improvement(axis, row, cand)
+        return [Swap(int(c), float(d), float(g)) for c, d, g in zip(cand, dist, gain)]
+
+    def _tree_query(self, row: int, allowed: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        if self._tree is None:
+            self._tree = cKDTree(self.vectors)
+        n = len(self)
+        want = min(n, 4 * k)
+        while True:
+            dist, idx = self._tree.query(self.vectors[row], k=want)
+            keep = allowed[idx]
+            if keep.sum() >= k or want >= n:
+                return idx[keep][:k], dist[keep][:k]
+            want = min(n, want * 4)
+
+    def precompute_swaps(self, axis: str, k: int = 5, jobs: int = 4,
+                         block: int = 256) -> tuple[np.ndarray, np.ndarray]:
+        """
+        top-k swaps for every row at once.\n
+        Returns (rows, distances), both (n, k); rows are -1 where fewer than k swaps exist.
+        Blocks of rows are scored with one matrix product each and spread over `jobs` threads
+        (numpy releases the GIL inside the product).
+        """
+        n = len(self)
+        out_rows = np.full((n, k), -1, dtype=np.int64)
+        out_dist = np.full((n, k), np.inf)
+
+        def run(start: int) -> None:
+            rows = np.arange(start, min(start + block, n))
+            d2 = self.sq_norms[rows, None] + self.sq_norms[None, :] - 2 * (self.vectors[rows] @ self.vectors.T)
+            d2[~self._better(axis, rows)] = np.inf
+            kk = min(k, n)
+            part = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+            pd2 = np.take_along_axis(d2, part, axis=1)
+            order = np.argsort(pd2, axis=1)
+            part = np.take_along_axis(part, order, axis=1)
+            pd2 = np.take_along_axis(pd2, order, axis=1)
+            found = np.isfinite(pd2)
+            out_rows[rows, :kk] = np.where(found, part, -1)
+            out_dist[rows, :kk] = np.sqrt(np.maximum(pd2, 0))
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            list(pool.map(run, range(0, n, block)))
+        return out_rows, out_dist
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """indices of the k smallest scores, sorted ascending"""
+    k = min(k, len(scores))
+    part = np.argpartition(scores, k - 1)[:k]
+    return part[np.argsort(scores[part])]
+
+
+def get_nutrient_space() -> NutrientSpace:
+    return _nutrient_space(load_catalog())
+
+
+@lru_cache(maxsize=1)
+def _nutrient_space(catalog: MenuCatalog) -> NutrientSpace:
+    return NutrientSpace(catalog)
+
+
+def precomputed_swaps(axis: str, k: int = 5) -> dict[int, list[int]]:
+    """MenuMealID -> MenuMealIDs of its top-k swaps on `axis`, for the whole catalog"""
+    return _precomputed_swaps(get_nutrient_space(), axis, k)
+
+
+@lru_cache(maxsize=16)
+def _precomputed_swaps(space: NutrientSpace, axis: str, k: int) -> dict[int, list[int]]:
+    space.axis_values(axis)
+    rows, _ = space.precompute_swaps(axis, k)
+    ids = np.asarray(space.catalog.ids)
+    return {
+        int(ids[r]): [int(ids[c]) for c in rows[r] if c >= 0]
+        for r in range(len(space))
+    }
+
+
+def suggest_swaps(menu_meal_id: int, axis: str = "energy_kcal", k: int = 5,
+                  same_category: bool = False) -> list[dict]:
+    """
+    swap suggestions for one MenuMealID as catalog records with distance/improvement.\n
+    KeyError for an unknown id, ValueError for an unknown axis.
+    """
+    space = get_nutrient_space()
+    row = space.catalog.row_of(menu_meal_id)
+    results = []
+    for s in space.swaps(row, axis, k, same_category=same_category):
+        rec = space.catalog.record(s.row)
+        rec["distance"] = round(s.distance, 4)
+        rec["improvement"] = round(s.improvement, 2)
+        results.append(rec)
+    return results
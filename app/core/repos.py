@@ -1,3 +1,6 @@
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.core.db import (
     Accounts,
@@ -23,138 +26,86 @@ from app.core.db import (
     DietaryTags,
     meal_tags,
     meal_dietary_tags,
+    meal_ingredients,
+    ingredient_nutrients,
 )
 from fastapi import HTTPException, Header
 from app.core.auth_tokens import decode_access_token
-from app.core.ingest_menu_meals import ingest_menu_meals
+from app.core.menu_catalog import load_catalog
+from app.core.meal_nutrition import NUTRIENTS, meal_nutrition
+from app.core.menu_features import PROTEINS, feature_mask
+from app.core.seed_data import SEED_DATA
+from app.core.tag_index import bits_to_ids, exercise_tag_index, meal_tag_index
+from app.core.tag_summary import exercise_tag_summary, meal_tag_summary
 
 
-# fill all these lists out 
+def insert_missing(sess: Session, model, names: list[str]) -> int:
+    """
+    set-based insert-if-missing keyed on `name`: one SELECT .. IN plus one multi-row
+    INSERT. Does not commit.
+    """
+    names = list(dict.fromkeys(names))
+    existing = {n for (n,) in sess.query(model.name).filter(model.name.in_(names))}
+    missing = [{"name": n} for n in names if n not in existing]
+    if missing:
+        sess.execute(insert(model.__table__), missing)
+    return len(missing)
+
+
+def upsert_rows(sess: Session, model, keys: list[str], rows: list[dict], chunk: int = 5000) -> None:
+    """
+    INSERT .. ON CONFLICT (keys) DO UPDATE for postgres and sqlite, delete + insert
+    elsewhere. `rows` must all have the same columns. Does not commit.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = sess.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={c: stmt.excluded[c] for c in rows[0] if c not in keys},
+        )
+        for i in range(0, len(rows), chunk):
+            sess.execute(stmt, rows[i:i + chunk])
+    else:
+        for row in rows:
+            sess.execute(delete(table).where(*(table.c[k] == row[k] for k in keys)))
+        sess.execute(insert(table), rows)
+
 
 def populate_splits(sess):
-    s = [
-        Splits(name="back & bicep"),
-        Splits(name='chest, shoulder, tricep'),
-        Splits(name='calisthenics')
-    ]
-
-    for obj in s:
-        exists = sess.query(Splits).filter_by(name=obj.name).first()
-        if not exists:
-            sess.add(obj)
+    insert_missing(sess, Splits, SEED_DATA[Splits])
     sess.commit()
-    return s
 
 
 def populate_workouts(sess):
-    w = [
-        Workouts(name='back'),
-        Workouts(name='bicep'),
-        Workouts(name='chest'),
-        Workouts(name='triceps'),
-        Workouts(name='shoulders'),
-        Workouts(name='quads'),
-        Workouts(name='abs'),
-        Workouts(name='cardio'),
-        Workouts(name='forearms'),
-        Workouts(name='obliques'),
-        Workouts(name='lower_back'),
-        Workouts(name='hamstrings'),
-        Workouts(name='glutes'),
-        Workouts(name='calves'),
-        Workouts(name='hip_flexors'),
-        Workouts(name='full_body')
-    ]
-
-    for obj in w:
-        exists = sess.query(Workouts).filter_by(name=obj.name).first()
-        if not exists:
-            sess.add(obj)
+    insert_missing(sess, Workouts, SEED_DATA[Workouts])
     sess.commit()
-    return w
 
 
 def populate_exercises(sess):
-    e = [
-        Exercises(name='pull up'),
-        Exercises(name='bicep curl'),
-        Exercises(name='bench press'),
-        Exercises(name='skull crushers'),
-        Exercises(name='tricep pushdown'),
-        Exercises(name='shoulder press'),
-        Exercises(name='bulgarian split squat'),
-        Exercises(name='romanian deadlift'),
-        Exercises(name='shrugs'),
-        Exercises(name='power clean'),
-        Exercises(name='incline press'),
-        Exercises(name='decline press'),
-        Exercises(name='face pull'),
-        Exercises(name='push ups'),
-        Exercises(name='sit ups'),
-        Exercises(name='burpees'),
-        Exercises(name='sled push'),
-        Exercises(name='russian twists'),
-        Exercises(name='sled pulls'),
-        Exercises(name='box jumps'),
-    ]
-
-    for obj in e:
-        exists = sess.query(Exercises).filter_by(name=obj.name).first()
-        if not exists:
-            sess.add(obj)
+    insert_missing(sess, Exercises, SEED_DATA[Exercises])
     sess.commit()
-    return e
 
 
 def populate_machines(sess):
-    m = [
-        Machines(name='dumbbell'),
-        Machines(name='barbell'),
-        Machines(name='body'),
-        Machines(name='cable'),
-        Machines(name='lat pulldown'),
-        Machines(name='pec deck'),
-        Machines(name='preacher curls'),
-        Machines(name='tricep extension'),
-        Machines(name='lateral raise'),
-        Machines(name='leg extension'),
-        Machines(name='leg curl'),
-        Machines(name='ab crunch'),
-        Machines(name='rows'),
-        Machines(name='back extension'),
-        Machines(name='dip machine'),
-        Machines(name='kickback'),
-        Machines(name='calf extension'),
-        Machines(name='hip adduction'),
-        Machines(name='hip abduction'),
-        Machines(name='dumbbell')
-    ]
-    for obj in m:
-        exists = sess.query(Machines).filter_by(name=obj.name).first()
-        if not exists:
-            sess.add(obj)
+    insert_missing(sess, Machines, SEED_DATA[Machines])
     sess.commit()
-    return m
 
 
 def populate_meals(sess):
-    m = [
-        Meals(name='chicken & rice'),
-        Meals(name='salmon and broccoli'),
-        Meals(name='cheesy 5-layer burrito'),
-        Meals(name='oatmeal')
-    ]
-
-    for obj in m:
-        exists = sess.query(Meals).filter_by(name=obj.name).first()
-        if not exists:
-            sess.add(obj)
+    insert_missing(sess, Meals, SEED_DATA[Meals])
     sess.commit()
-    return m
-
 
 def populate_menu_meals(sess):
-    records_dict = ingest_menu_meals()
+    try:
+        records_dict = load_catalog().records()
+    except (FileNotFoundError, ValueError):
+        # no snapshot yet, or one from an older version / feature list: rebuild from the csv (needs pandas)
+        from app.core.ingest_menu_meals import ingest_menu_meals
+        records_dict = ingest_menu_meals()
     sess.bulk_insert_mappings(menu_meals, records_dict) 
     sess.commit()
     return True
@@ -207,11 +158,23 @@ def lookup_profile_by_id(sess: Session, profile_id: int) -> Profiles:
 
 
 
+def restaurants_like(sess: Session, restaurant: str) -> list[str]:
+    """
+    chain names containing `restaurant`, case-insensitive\n
+    reads only the small restaurant index, the meals are then fetched by exact name through it
+    """
+    q = sess.query(menu_meals.restaurant).distinct().filter(menu_meals.restaurant.ilike(f"%{restaurant}%"))
+    return [name for (name,) in q]
+
+
 def lookup_menumeal_by_restaurant(sess: Session, restaurant: str) -> menu_meals:
     """
     return menu_meals object(s) meeting criteria if exists
     """
-    results = sess.query(menu_meals).filter(menu_meals.restaurant.ilike(f"%{restaurant}%")).all()
+    names = restaurants_like(sess, restaurant)
+    if not names:
+        return []
+    results = sess.query(menu_meals).filter(menu_meals.restaurant.in_(names)).all()
     return results if results else []
 
 
@@ -219,10 +182,26 @@ def lookup_menumeal_by_protein(sess: Session, protein: str) -> menu_meals:
     """
     return menu_meals object(s) meeting criteria if exists
     """
-    if protein == 'chicken':
-        results = sess.query(menu_meals).filter(menu_meals.chicken == True).all()
-        return results if results else []
-    return []
+    if protein not in PROTEINS:
+        return []
+    return lookup_menumeal_by_features(sess, [protein])
+
+
+def lookup_menumeal_by_features(sess: Session, features: list[str], restaurant: str | None = None) -> menu_meals:
+    """
+    return menu_meals object(s) that have every feature in `features`\n
+    features are bits in menu_meals.features, so this is one AND per row
+    """
+    try:
+        mask = feature_mask(*features)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+    query = sess.query(menu_meals).filter(menu_meals.features.op("&")(mask) == mask)
+    if restaurant:
+        query = query.filter(menu_meals.restaurant.in_(restaurants_like(sess, restaurant)))
+    results = query.all()
+    return results if results else []
 
 
 def delete_account_by_id(sess: Session, user_id: int) -> bool:
@@ -239,52 +218,126 @@ def delete_account_by_id(sess: Session, user_id: int) -> bool:
         return True
     return False
 def populate_muscle_groups(sess: Session):
-    muscle_groups = [
-        MuscleGroupTags(name="chest"), MuscleGroupTags(name="back"),
-        MuscleGroupTags(name="shoulders"), MuscleGroupTags(name="biceps"),
-        MuscleGroupTags(name="triceps"), MuscleGroupTags(name="forearms"),
-        MuscleGroupTags(name="abs"), MuscleGroupTags(name="obliques"),
-        MuscleGroupTags(name="lower_back"), MuscleGroupTags(name="quads"),
-        MuscleGroupTags(name="hamstrings"), MuscleGroupTags(name="glutes"),
-        MuscleGroupTags(name="calves"), MuscleGroupTags(name="hip_flexors"),
-        MuscleGroupTags(name="full_body"),
-    ]
-    for obj in muscle_groups:
-        if not sess.query(MuscleGroupTags).filter_by(name=obj.name).first():
-            sess.add(obj)
+    insert_missing(sess, MuscleGroupTags, SEED_DATA[MuscleGroupTags])
     sess.commit()
 
 def populate_difficulties(sess: Session):
-    difficulties = [
-        DifficultyTags(name="beginner"), DifficultyTags(name="intermediate"),
-        DifficultyTags(name="advanced"), DifficultyTags(name="elite"),
-    ]
-    for obj in difficulties:
-        if not sess.query(DifficultyTags).filter_by(name=obj.name).first():
-            sess.add(obj)
+    insert_missing(sess, DifficultyTags, SEED_DATA[DifficultyTags])
     sess.commit()
 
 def populate_exercise_types(sess: Session):
-    types = [
-        ExerciseTypeTags(name="strength"),
-        ExerciseTypeTags(name="cardio"),
-        ExerciseTypeTags(name="hybrid"),
-    ]
-    for obj in types:
-        if not sess.query(ExerciseTypeTags).filter_by(name=obj.name).first():
-            sess.add(obj)
+    insert_missing(sess, ExerciseTypeTags, SEED_DATA[ExerciseTypeTags])
     sess.commit()
 
 def tag_exercise(sess: Session, exercise_id: int, difficulty_id: int, exercise_type_id: int, muscle_group_ids: list[int]) -> bool:
-    if not sess.query(Exercises).filter_by(ExerciseID=exercise_id).first():
+    exercise = sess.query(Exercises).filter_by(ExerciseID=exercise_id).first()
+    if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
+    old = _exercise_tag_ids(sess, exercise_id)
     sess.merge(exercise_tags(ExerciseID=exercise_id, DifficultyID=difficulty_id, ExerciseTypeID=exercise_type_id))
     sess.query(exercise_muscle_groups).filter_by(ExerciseID=exercise_id).delete()
     for mg_id in muscle_group_ids:
         sess.add(exercise_muscle_groups(ExerciseID=exercise_id, MuscleGroupID=mg_id))
     sess.commit()
+    new = {"difficulty": [difficulty_id], "exercise_type": [exercise_type_id], "muscle_group": muscle_group_ids}
+    if exercise_tag_index.loaded:
+        exercise_tag_index.set(exercise_id, new, (exercise.name, exercise.description))
+    exercise_tag_summary.apply(sess, removed=old, added=new)
     return True
 
+def delete_exercise(sess: Session, exercise_id: int) -> bool:
+    """
+    Deletes an exercise and its tags. 409 if workouts or posts still reference it.
+    """
+    if not sess.query(Exercises).filter_by(ExerciseID=exercise_id).first():
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    old = _exercise_tag_ids(sess, exercise_id)
+    sess.query(exercise_muscle_groups).filter_by(ExerciseID=exercise_id).delete()
+    sess.query(exercise_tags).filter_by(ExerciseID=exercise_id).delete()
+    sess.query(Exercises).filter_by(ExerciseID=exercise_id).delete()
+    try:
+        sess.commit()
+    except IntegrityError:
+        sess.rollback()
+        raise HTTPException(status_code=409, detail="Exercise is still referenced by workouts or posts")
+    exercise_tag_index.remove(exercise_id)
+    exercise_tag_summary.apply(sess, removed=old)
+    return True
+
+def set_ingredient_nutrients(sess: Session, ingredient_id: int, nutrients: dict, per_grams: float = 100.0) -> dict:
+    """
+    Stores an ingredient's nutrients (columns of ingredient_nutrients, per `per_grams` grams)
+    and recomputes only the meals that use it.
+    """
+    if not sess.query(Ingredients).filter_by(IngredientID=ingredient_id).first():
+        raise HTTPException(status_code=404, detail="Ingredient not found")
+    unknown = set(nutrients) - set(NUTRIENTS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown nutrients: {sorted(unknown)}")
+    upsert_rows(sess, ingredient_nutrients, ["IngredientID"], [
+        {"IngredientID": ingredient_id, "per_grams": per_grams, **{n: nutrients.get(n) for n in NUTRIENTS}},
+    ])
+    sess.commit()
+    return {"IngredientID": ingredient_id, "meals_recomputed": meal_nutrition.set_ingredient(ingredient_id, nutrients, per_grams)}
+
+def set_meal_ingredients(sess: Session, meal_id: int, grams: dict[int, float]) -> dict:
+    """
+    Replaces a meal's ingredient list ({IngredientID: grams}) and returns its recomputed nutrition.\n
+    An empty list clears the recipe, which comes back as zero totals.
+    """
+    if not sess.query(Meals).filter_by(MealID=meal_id).first():
+        raise HTTPException(status_code=404, detail="Meal not found")
+    found = {i for (i,) in sess.query(Ingredients.IngredientID).filter(Ingredients.IngredientID.in_(list(grams)))}
+    if found != set(grams):
+        raise HTTPException(status_code=404, detail=f"Unknown ingredients: {sorted(set(grams) - found)}")
+    sess.query(meal_ingredients).filter_by(MealID=meal_id).delete()
+    sess.add_all([meal_ingredients(MealID=meal_id, IngredientID=i, serving_size=g) for i, g in grams.items()])
+    sess.commit()
+    meal_nutrition.ensure_loaded(sess).set_recipe(meal_id, grams)
+    if not grams:
+        return {"MealID": meal_id, **{n: 0.0 for n in NUTRIENTS}, "ingredients": 0, "ingredients_missing_nutrients": 0}
+    return meal_nutrition.get(meal_id)
+
+def meal_nutrition_facts(sess: Session, meal_id: int) -> dict:
+    try:
+        return meal_nutrition.ensure_loaded(sess).get(meal_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=exc.args[0])
+
+def faceted_exercise_search(sess: Session, selected: dict[str, list[str]], limit: int = 50, offset: int = 0) -> dict:
+    """
+    Exercises matching every facet in `selected` (tag names, any-of within a facet) and,
+    per facet, how many exercises each value would match given the other facets.
+    """
+    index = exercise_tag_index.ensure_loaded(sess)
+    try:
+        any_of = {facet: index.resolve(facet, names) for facet, names in selected.items() if names}
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
+    bits, counts = index.facet_search(any_of)
+    ids = bits_to_ids(bits)
+    return {
+        "total": len(ids),
+        "exercises": index.describe(sess, ids[offset:offset + limit]),
+        "facets": {
+            facet: {name: counts[facet].get(tag_id, 0) for tag_id, name in index.id_to_name[facet].items()}
+            for facet in index.facets
+        },
+    }
+
+def _exercise_tag_ids(sess: Session, exercise_id: int) -> dict[str, list[int]]:
+    tag = sess.query(exercise_tags).filter_by(ExerciseID=exercise_id).first()
+    if not tag:
+        return {}
+    muscles = sess.query(exercise_muscle_groups.MuscleGroupID).filter_by(ExerciseID=exercise_id)
+    return {
+        "difficulty": [tag.DifficultyID], "exercise_type": [tag.ExerciseTypeID],
+        "muscle_group": [mg_id for (mg_id,) in muscles],
+    }
+
+def exercise_tag_summary_counts(sess: Session) -> dict:
+    return exercise_tag_summary.get(sess)
+
 def get_exercise_tags(sess: Session, exercise_id: int) -> dict:
     """
     Returns the difficulty, exercise type, and muscle groups for a given exercise.
@@ -302,45 +355,31 @@ def get_all_tag_options(sess: Session) -> dict:
         "exercise_types": sess.query(ExerciseTypeTags).all(),
     }
 def populate_spice_levels(sess: Session):
-    for name in ["mild", "medium", "hot", "extra_hot"]:
-        if not sess.query(SpiceLevelTags).filter_by(name=name).first():
-            sess.add(SpiceLevelTags(name=name))
+    insert_missing(sess, SpiceLevelTags, SEED_DATA[SpiceLevelTags])
     sess.commit()
 
 def populate_cuisines(sess: Session):
-    for name in ["american", "italian", "mexican", "asian", "mediterranean", "indian", "middle_eastern", "other"]:
-        if not sess.query(CuisineTags).filter_by(name=name).first():
-            sess.add(CuisineTags(name=name))
+    insert_missing(sess, CuisineTags, SEED_DATA[CuisineTags])
     sess.commit()
 
 def populate_complexities(sess: Session):
-    for name in ["simple", "moderate", "complex"]:
-        if not sess.query(ComplexityTags).filter_by(name=name).first():
-            sess.add(ComplexityTags(name=name))
+    insert_missing(sess, ComplexityTags, SEED_DATA[ComplexityTags])
     sess.commit()
 
 def populate_goals(sess: Session):
-    for name in ["fat_loss", "muscle_gain", "maintenance"]:
-        if not sess.query(GoalTags).filter_by(name=name).first():
-            sess.add(GoalTags(name=name))
+    insert_missing(sess, GoalTags, SEED_DATA[GoalTags])
     sess.commit()
 
 def populate_prep_times(sess: Session):
-    for name in ["quick", "medium", "long"]:
-        if not sess.query(PrepTimeTags).filter_by(name=name).first():
-            sess.add(PrepTimeTags(name=name))
+    insert_missing(sess, PrepTimeTags, SEED_DATA[PrepTimeTags])
     sess.commit()
 
 def populate_cook_times(sess: Session):
-    for name in ["quick", "medium", "long"]:
-        if not sess.query(CookTimeTags).filter_by(name=name).first():
-            sess.add(CookTimeTags(name=name))
+    insert_missing(sess, CookTimeTags, SEED_DATA[CookTimeTags])
     sess.commit()
 
 def populate_dietary_tags(sess: Session):
-    for name in ["vegetarian", "vegan", "gluten_free", "dairy_free", "nut_free", "halal", "kosher", "low_carb", "high_protein"]:
-        if not sess.query(DietaryTags).filter_by(name=name).first():
-            sess.add(DietaryTags(name=name))
+    insert_missing(sess, DietaryTags, SEED_DATA[DietaryTags])
     sess.commit()
 
 def tag_meal(sess: Session, meal_id: int, spice_level_id: int, cuisine_id: int,
@@ -348,6 +387,7 @@ def tag_meal(sess: Session, meal_id: int, spice_level_id: int, cuisine_id: int,
              dietary_tag_ids: list[int] = []) -> bool:
     if not sess.query(Meals).filter_by(MealID=meal_id).first():
         raise HTTPException(status_code=404, detail="Meal not found")
+    old = _meal_tag_ids(sess, meal_id)
     sess.merge(meal_tags(
         MealID=meal_id, SpiceLevelID=spice_level_id, CuisineID=cuisine_id,
         ComplexityID=complexity_id, GoalID=goal_id,
@@ -357,8 +397,58 @@ def tag_meal(sess: Session, meal_id: int, spice_level_id: int, cuisine_id: int,
     for dietary_id in dietary_tag_ids:
         sess.add(meal_dietary_tags(MealID=meal_id, DietaryID=dietary_id))
     sess.commit()
+    new = {
+        "spice_level": [spice_level_id], "cuisine": [cuisine_id],
+        "complexity": [complexity_id], "goal": [goal_id],
+        "prep_time": [prep_time_id], "cook_time": [cook_time_id],
+        "dietary": dietary_tag_ids,
+    }
+    if meal_tag_index.loaded:
+        meal_tag_index.set(meal_id, new)
+    meal_tag_summary.apply(sess, removed=old, added=new)
     return True
 
+def _meal_tag_ids(sess: Session, meal_id: int) -> dict[str, list[int]]:
+    tag = sess.query(meal_tags).filter_by(MealID=meal_id).first()
+    if not tag:
+        return {}
+    dietary = sess.query(meal_dietary_tags.DietaryID).filter_by(MealID=meal_id)
+    return meal_tag_index.row_tags(tag, [d for (d,) in dietary])
+
+def meal_tag_summary_counts(sess: Session) -> dict:
+    return meal_tag_summary.get(sess)
+
+def delete_meal_tags(sess: Session, meal_id: int) -> bool:
+    tag = sess.query(meal_tags).filter_by(MealID=meal_id).first()
+    if not tag:
+        raise HTTPException(status_code=404, detail="No tags found for this meal.")
+    old = _meal_tag_ids(sess, meal_id)
+    sess.query(meal_dietary_tags).filter_by(MealID=meal_id).delete()
+    sess.delete(tag)
+    sess.commit()
+    meal_tag_index.remove(meal_id)
+    meal_tag_summary.apply(sess, removed=old)
+    return True
+
+def filter_meals_by_tags(sess: Session, any_of: dict[str, list[int]] | None = None,
+                         all_of: dict[str, list[int]] | None = None,
+                         none_of: dict[str, list[int]] | None = None,
+                         limit: int = 50, offset: int = 0) -> dict:
+    """
+    meals matching every facet given: any value of `any_of[facet]`, all of `all_of[facet]`,
+    none of `none_of[facet]`; evaluated on the in-memory bitmap index, names read for one page
+    """
+    index = meal_tag_index.ensure_loaded(sess)
+    bits = index.match(any_of, all_of, none_of)
+    ids = bits_to_ids(bits)
+    page = ids[offset:offset + limit]
+    names = dict(sess.query(Meals.MealID, Meals.name).filter(Meals.MealID.in_(page)).all()) if page else {}
+    return {
+        "total": len(ids),
+        "meals": [{"meal_id": i, "name": names.get(i)} for i in page],
+        "facet_counts": index.named_counts(bits),
+    }
+
 def get_meal_tags(sess: Session, meal_id: int) -> dict:
     tag = sess.query(meal_tags).filter_by(MealID=meal_id).first()
     if not tag:
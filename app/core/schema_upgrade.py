@@ -0,0 +1,94 @@
+""" in-place upgrades for databases created before a column or index was added to db.py\n
+- create_all() only creates missing tables, so an existing forge.db / Supabase db never gets new columns\n
+- upgrade_schema() compares db.py with the live schema, adds each missing column (ALTER TABLE ... ADD COLUMN)\n
+- and creates each missing index; a second run finds nothing to do\n
+- columns that need data once they exist (menu_meals.features) are backfilled in the same transaction\n
+- runs at startup (api, seed.bootstrap); python -m app.core.schema_upgrade runs it against DATABASE_URL"""
+
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import Column, Float, bindparam, inspect, literal, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.db import menu_meals
+from app.core.menu_features import derive_feature_bits
+from app.core.session import Base
+
+BACKFILL_CHUNK = 5_000
+
+
+def _backfill_menu_features(conn: Connection) -> None:
+    """menu_meals.features from the rules in menu_features, as ingest would have set it"""
+    table = menu_meals.__table__
+    cols = [c for c in table.columns if c.name != "features"]
+    last = None
+    while True:
+        q = select(*cols).order_by(table.c.MenuMealID).limit(BACKFILL_CHUNK)
+        if last is not None:
+            q = q.where(table.c.MenuMealID > last)
+        rows = conn.execute(q).all()
+        if not rows:
+            return
+        columns = {
+            c.name: np.array([r[i] for r in rows], dtype=float if isinstance(c.type, Float) else object)
+            for i, c in enumerate(cols)
+        }
+        bits = derive_feature_bits(columns)
+        conn.execute(
+            update(table).where(table.c.MenuMealID == bindparam("id")).values(features=bindparam("bits")),
+            [{"id": r.MenuMealID, "bits": int(b)} for r, b in zip(rows, bits)],
+        )
+        last = rows[-1].MenuMealID
+
+
+# (table, column) -> fills the column for rows that existed before it
+BACKFILLS: dict[tuple[str, str], Callable[[Connection], None]] = {
+    ("menu_meals", "features"): _backfill_menu_features,
+}
+
+
+def _add_column_sql(conn: Connection, table_name: str, column: Column) -> str:
+    prep = conn.dialect.identifier_preparer
+    sql = f"ALTER TABLE {prep.quote(table_name)} ADD COLUMN {prep.quote(column.name)} {column.type.compile(conn.dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        value = literal(default, column.type).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        sql += f" DEFAULT {value}"
+        if not column.nullable:
+            sql += " NOT NULL"
+    return sql
+
+
+def upgrade_schema(bind: Optional[Engine] = None) -> list[str]:
+    """add missing columns and indexes to tables that already exist; returns what was changed"""
+    if bind is None:
+        from app.core.session import engine as bind
+    changes = []
+    with bind.begin() as conn:
+        insp = inspect(conn)
+        existing = set(insp.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue            # create_all's job
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in have:
+                    continue
+                conn.exec_driver_sql(_add_column_sql(conn, table.name, column))
+                changes.append(f"column {table.name}.{column.name}")
+                if (table.name, column.name) in BACKFILLS:
+                    BACKFILLS[(table.name, column.name)](conn)
+            indexes = {i["name"] for i in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    changes.append(f"index {index.name}")
+    return changes
+
+
+if __name__ == "__main__":
+    for change in upgrade_schema() or ["schema is up to date"]:
+        print(change)
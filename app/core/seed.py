@@ -1,47 +1,47 @@
 
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timezone
 
-from app.core.db import Base
+from app.core.db import Base, seed_versions
 from app.core import repos
-
-DB_URL = os.getenv("DATABASE_URL", "sqlite:///forge.db")
-connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
-
-engine = create_engine(DB_URL, future=True, pool_pre_ping=True, connect_args=connect_args)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
-
-def seed_static(session):
-    # call all populators here
-    repos.populate_splits(session)
-    repos.populate_workouts(session)
-    repos.populate_exercises(session)
-    repos.populate_machines(session)
-    repos.populate_meals(session)
-    repos.populate_muscle_groups(session)
-    repos.populate_difficulties(session)
-    repos.populate_exercise_types(session)
-    repos.populate_spice_levels(session)
-    repos.populate_cuisines(session)
-    repos.populate_complexities(session)
-    repos.populate_goals(session)
-    repos.populate_prep_times(session)
-    repos.populate_cook_times(session)
-    repos.populate_dietary_tags(session)
+from app.core.schema_upgrade import upgrade_schema
+from app.core.seed_data import SEED_DATA, SEED_VERSION, seed_digest
+from app.core.session import DATABASE_URL as DB_URL, SessionLocal, engine
+
+def seed_static(session, force: bool = False) -> bool:
+    """
+    insert whatever is missing from SEED_DATA: one existence query and one bulk insert
+    per table, all in one transaction. Skipped entirely when the recorded seed version and
+    digest already match, unless force. Returns True if the seed ran.
+    """
+    digest = seed_digest()
+    applied = session.get(seed_versions, "static")
+    if not force and applied and applied.version == SEED_VERSION and applied.digest == digest:
+        return False
+    try:
+        for model, names in SEED_DATA.items():
+            repos.insert_missing(session, model, names)
+        session.merge(seed_versions(
+            name="static", version=SEED_VERSION, digest=digest, applied_at=datetime.now(timezone.utc),
+        ))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return True
 
 def bootstrap(drop_all: bool = False, seed: bool = True):
+    seeded = False
     if drop_all:
         Base.metadata.drop_all(bind=engine)
 
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
 
     if seed:
         with SessionLocal() as session:
-            # populate_* currently commit() inside each function so don't do it again here
-            seed_static(session)
+            seeded = seed_static(session)
 
-    print("✅ DB created" + (" + seeded" if seed else "") + f" at {DB_URL}")
+    print("✅ DB created" + (" + seeded" if seeded else "") + f" at {DB_URL}")
 
 if __name__ == "__main__":
     # set drop_all=True for a clean rebuild during dev
@@ -0,0 +1,59 @@
+""" declarative seed data: table -> names that must exist\n
+- tables are listed in insertion order\n
+- bump SEED_VERSION when editing; seed_static() also compares a digest of this data"""
+
+import hashlib
+import json
+
+from app.core.db import (
+    Splits, Workouts, Exercises, Machines, Meals,
+    MuscleGroupTags, DifficultyTags, ExerciseTypeTags,
+    SpiceLevelTags, CuisineTags, ComplexityTags, GoalTags,
+    PrepTimeTags, CookTimeTags, DietaryTags,
+)
+
+SEED_VERSION = 1
+
+SEED_DATA = {
+    Splits: ["back & bicep", "chest, shoulder, tricep", "calisthenics"],
+    Workouts: [
+        "back", "bicep", "chest", "triceps", "shoulders", "quads", "abs", "cardio",
+        "forearms", "obliques", "lower_back", "hamstrings", "glutes", "calves",
+        "hip_flexors", "full_body",
+    ],
+    Exercises: [
+        "pull up", "bicep curl", "bench press", "skull crushers", "tricep pushdown",
+        "shoulder press", "bulgarian split squat", "romanian deadlift", "shrugs",
+        "power clean", "incline press", "decline press", "face pull", "push ups",
+        "sit ups", "burpees", "sled push", "russian twists", "sled pulls", "box jumps",
+    ],
+    Machines: [
+        "dumbbell", "barbell", "body", "cable", "lat pulldown", "pec deck",
+        "preacher curls", "tricep extension", "lateral raise", "leg extension",
+        "leg curl", "ab crunch", "rows", "back extension", "dip machine", "kickback",
+        "calf extension", "hip adduction", "hip abduction",
+    ],
+    Meals: ["chicken & rice", "salmon and broccoli", "cheesy 5-layer burrito", "oatmeal"],
+    MuscleGroupTags: [
+        "chest", "back", "shoulders", "biceps", "triceps", "forearms", "abs",
+        "obliques", "lower_back", "quads", "hamstrings", "glutes", "calves",
+        "hip_flexors", "full_body",
+    ],
+    DifficultyTags: ["beginner", "intermediate", "advanced", "elite"],
+    ExerciseTypeTags: ["strength", "cardio", "hybrid"],
+    SpiceLevelTags: ["mild", "medium", "hot", "extra_hot"],
+    CuisineTags: ["american", "italian", "mexican", "asian", "mediterranean", "indian", "middle_eastern", "other"],
+    ComplexityTags: ["simple", "moderate", "complex"],
+    GoalTags: ["fat_loss", "muscle_gain", "maintenance"],
+    PrepTimeTags: ["quick", "medium", "long"],
+    CookTimeTags: ["quick", "medium", "long"],
+    DietaryTags: [
+        "vegetarian", "vegan", "gluten_free", "dairy_free", "nut_free", "halal",
+        "kosher", "low_carb", "high_protein",
+    ],
+}
+
+
+def seed_digest() -> str:
+    payload = json.dumps([[model.__tablename__, names] for model, names in SEED_DATA.items()])
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
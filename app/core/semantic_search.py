@@ -0,0 +1,397 @@
+""" local semantic search over menu_meals and Meals\n
+- text is embedded by a pluggable Embedder, the default hashes words and character trigrams (TF-IDF weighted)\n
+- embeddings are cached on disk keyed by a hash of (embedder, text), in app/core unless SEARCH_CACHE_PATH is set\n
+- vectors live in an in-process index, exact (brute-force numpy) or approximate (IVF)\n
+- nutrient phrases in the query ("under 500 calories") become hard filters on the results\n
+- homemade Meals are filtered on their ingredient totals (meal_nutrition); a meal without a recipe has no values\n
+- nothing leaves the process, no remote embedding or vector services"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Optional, Protocol, Sequence
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.db import Meals
+from app.core.meal_nutrients import NutrientTable
+from app.core.meal_nutrition import NUTRIENTS, meal_nutrition
+from app.core.menu_catalog import MenuCatalog, load_catalog
+from app.core.menu_features import decode_features
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.db")
+
+
+# -----------------------------
+# embedders
+# -----------------------------
+class Embedder(Protocol):
+    name: str       # changes whenever the vectors would, cache keys include it
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32 rows, L2-normalized"""
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str) -> list[tuple[str, float]]:
+    out = []
+    for w in _WORD.findall(text.lower()):
+        out.append((w, 1.0))
+        padded = f"<{w}>"
+        for i in range(len(padded) - 2):
+            out.append(("#" + padded[i:i + 3], 0.3))
+    return out
+
+
+class HashingEmbedder:
+    """
+    Feature-hashing bag of words + character trigrams.\n
+    fit() learns IDF weights per bucket from a corpus; unfitted it is plain TF.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.idf: Optional[np.ndarray] = None
+        self.name = f"hashing-{dim}"
+
+    def fit(self, texts: Sequence[str]) -> "HashingEmbedder":
+        df = np.zeros(self.dim)
+        for text in texts:
+            buckets = {self._bucket(tok)[0] for tok, _ in _tokens(text)}
+            df[list(buckets)] += 1
+        self.idf = np.log((1 + len(texts)) / (1 + df)) + 1.0
+        digest = hashlib.sha1(self.idf.astype(np.float32).tobytes()).hexdigest()[:12]
+        self.name = f"hashing-{self.dim}-idf-{digest}"
+        return self
+
+    def _bucket(self, token: str) -> tuple[int, float]:
+        h = zlib.crc32(token.encode("utf-8"))
+        return h % self.dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for r, text in enumerate(texts):
+            for tok, weight in _tokens(text):
+                b, sign = self._bucket(tok)
+                out[r, b] += sign * weight
+        if self.idf is not None:
+            out *= self.idf.astype(np.float32)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class EmbeddingCache:
+    """sqlite file of vectors keyed by sha256(embedder name + text)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(embedder_name: str, text: str) -> str:
+        return hashlib.sha256(f"{embedder_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for k, blob in self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk):
+                    found[k] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(k, v.astype(np.float32).tobytes()) for k, v in items.items()],
+            )
+            self._conn.commit()
+
+
+class CachedEmbedder:
+    """wraps an Embedder so only texts missing from the cache are embedded"""
+
+    def __init__(self, inner: Embedder, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+
+    @property
+    def name(self) -> str:
+        return self.inner.name
+
+    @property
+    def dim(self) -> int:
+        return self.inner.dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [EmbeddingCache.key(self.inner.name, t) for t in texts]
+        hits = self.cache.get_many(keys)
+        missing = [i for i, k in enumerate(keys) if k not in hits]
+        if missing:
+            fresh = self.inner.embed([texts[i] for i in missing])
+            new = {keys[i]: fresh[j] for j, i in enumerate(missing)}
+            self.cache.put_many(new)
+            hits.update(new)
+        return np.vstack([hits[k] for k in keys]) if keys else np.zeros((0, self.dim), dtype=np.float32)
+
+
+def get_embedder() -> Embedder:
+    provider = os.getenv("SEARCH_EMBEDDER", "hashing").lower()
+    if provider == "hashing":
+        return HashingEmbedder(int(os.getenv("SEARCH_EMBEDDING_DIM", "512")))
+    raise ValueError(f"Unsupported SEARCH_EMBEDDER: {provider}")
+
+
+# -----------------------------
+# vector indexes
+# -----------------------------
+class VectorIndex(Protocol):
+    def search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """(positions, scores) of the k best rows by inner product, best first"""
+
+
+def _best(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class BruteForceIndex:
+    """exact search, one matrix-vector product per query"""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def search(self, query, k, allowed=None):
+        scores = self.vectors @ query
+        if allowed is not None:
+            scores = np.where(allowed, scores, -np.inf)
+        top = _best(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return top, scores[top]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate search.\n
+    Spherical k-means splits the vectors into `nlist` cells; a query only scores the rows in
+    its `nprobe` closest cells. When filters leave fewer than k rows in the probed cells the
+    remaining allowed rows are scored exactly, so filtered queries never come back short.
+    """
+
+    def __init__(self, vectors: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+                 iterations: int = 10, seed: int = 0):
+        n = len(vectors)
+        self.vectors = vectors
+        self.nlist = max(1, min(n, nlist or int(math.sqrt(n))))
+        self.nprobe = min(nprobe, self.nlist)
+
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, self.nlist, replace=False)] if n else np.zeros((1, vectors.shape[1]))
+        assign = np.zeros(n, dtype=np.int64)
+        for _ in range(iterations):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        self.centroids = centroids
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+
+    def search(self, query, k, allowed=None):
+        cells = _best(self.centroids @ query, self.nprobe)
+        cand = np.concatenate([self.lists[c] for c in cells]) if len(cells) else np.zeros(0, dtype=np.int64)
+        if allowed is not None:
+            cand = cand[allowed[cand]]
+            if len(cand) < k:
+                cand = np.flatnonzero(allowed)
+        scores = self.vectors[cand] @ query
+        top = _best(scores, k)
+        return cand[top], scores[top]
+
+
+def build_index(vectors: np.ndarray, mode: str) -> VectorIndex:
+    if mode == "exact":
+        return BruteForceIndex(vectors)
+    if mode == "ivf":
+        return IVFIndex(vectors)
+    raise ValueError(f"Unknown index mode '{mode}', expected exact or ivf")
+
+
+# -----------------------------
+# query parsing
+# -----------------------------
+NUTRIENT_WORDS = {
+    "calories": "energy_kcal", "calorie": "energy_kcal", "kcal": "energy_kcal", "cal": "energy_kcal",
+    "protein": "protein_g", "carbs": "carbohydrates_g", "carb": "carbohydrates_g",
+    "fat": "total_fat_g", "sugar": "sugar_g", "sodium": "sodium_mg", "fiber": "fiber_g",
+}
+_LESS = r"under|below|less than|fewer than|at most|max|<=?"
+_MORE = r"over|above|more than|at least|min|>=?"
+_FILTER = re.compile(
+    rf"(?<!\w)(?P<op>{_LESS}|{_MORE})\s*(?P<num>\d+(?:\.\d+)?)\s*(?:g|mg)?\s*(?:of\s+)?(?P<what>{'|'.join(NUTRIENT_WORDS)})\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class ParsedQuery:
+    text: str
+    filters: list[tuple[str, str, float]] = field(default_factory=list)     # (column, "<=" | ">=", value)
+
+
+def parse_query(query: str) -> ParsedQuery:
+    """split 'spicy chicken under 500 calories' into text and nutrient filters"""
+    filters = []
+    for m in _FILTER.finditer(query):
+        op = "<=" if re.fullmatch(_LESS, m.group("op").lower()) else ">="
+        filters.append((NUTRIENT_WORDS[m.group("what").lower()], op, float(m.group("num"))))
+    text = re.sub(r"\s+", " ", _FILTER.sub(" ", query)).strip()
+    return ParsedQuery(text or query, filters)
+
+
+# -----------------------------
+# search engine
+# -----------------------------
+FILTER_COLS = ["energy_kcal", "protein_g", "carbohydrates_g", "total_fat_g", "sugar_g", "sodium_mg", "fiber_g"]
+
+
+@dataclass(frozen=True)
+class SearchDoc:
+    kind: str       # "menu" | "meal"
+    id: int
+    name: str
+    text: str
+
+
+def menu_docs(catalog: MenuCatalog) -> list[SearchDoc]:
+    docs = []
+    for r in range(len(catalog)):
+        product = catalog.text("product", r)
+        features = " ".join(f.replace("_", " ") for f in decode_features(int(catalog.features[r])))
+        text = f"{product} {catalog.text('category', r)} {catalog.text('restaurant', r)} {features}"
+        docs.append(SearchDoc("menu", int(catalog.ids[r]), product, text))
+    return docs
+
+
+def meal_docs(sess: Session) -> list[SearchDoc]:
+    return [SearchDoc("meal", row.MealID, row.name, row.name) for row in sess.query(Meals).order_by(Meals.MealID)]
+
+
+class SemanticSearch:
+    def __init__(self, docs: list[SearchDoc], nutrients: np.ndarray, embedder: Embedder,
+                 cache: Optional[EmbeddingCache] = None, default_mode: str = "exact"):
+        """`nutrients` is (len(docs), len(FILTER_COLS)), NaN where a doc has no value"""
+        if isinstance(embedder, HashingEmbedder) and embedder.idf is None:
+            embedder.fit([d.text for d in docs])
+        self.embedder = CachedEmbedder(embedder, cache) if cache else embedder
+        self.docs = docs
+        self.nutrients = nutrients
+        self.vectors = self.embedder.embed([d.text for d in docs])
+        self.default_mode = default_mode
+        self._indexes: dict[str, VectorIndex] = {}
+
+    def index(self, mode: str) -> VectorIndex:
+        if mode not in self._indexes:
+            self._indexes[mode] = build_index(self.vectors, mode)
+        return self._indexes[mode]
+
+    def allowed(self, filters: list[tuple[str, str, float]]) -> Optional[np.ndarray]:
+        if not filters:
+            return None
+        mask = np.ones(len(self.docs), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for column, op, value in filters:
+                v = self.nutrients[:, FILTER_COLS.index(column)]
+                mask &= (v <= value) if op == "<=" else (v >= value)
+        return mask
+
+    def search(self, query: str, k: int = 10, mode: Optional[str] = None) -> dict:
+        parsed = parse_query(query)
+        q = self.embedder.embed([parsed.text])[0]
+        pos, scores = self.index(mode or self.default_mode).search(q, k, self.allowed(parsed.filters))
+        results = []
+        for p, s in zip(pos, scores):
+            doc = self.docs[p]
+            item = {"kind": doc.kind, "id": doc.id, "name": doc.name, "score": round(float(s), 4)}
+            item.update({c: (None if np.isnan(v) else float(v)) for c, v in zip(FILTER_COLS, self.nutrients[p])})
+            results.append(item)
+        return {"query": parsed.text, "filters": [list(f) for f in parsed.filters], "results": results}
+
+
+def build_search(sess: Session, embedder: Optional[Embedder] = None,
+                 cache: Optional[EmbeddingCache] = None, mode: Optional[str] = None,
+                 meals: Optional[NutrientTable] = None) -> SemanticSearch:
+    """`meals` holds homemade meal totals, default meal_nutrition's (loaded on first use)"""
+    catalog = load_catalog()
+    menu = menu_docs(catalog)
+    docs = menu + meal_docs(sess)
+    embedder = embedder or get_embedder()
+    if isinstance(embedder, HashingEmbedder) and embedder.idf is None:
+        # IDF from the catalog only, so new Meals don't change every cached vector
+        embedder.fit([d.text for d in menu])
+    nutrients = np.full((len(docs), len(FILTER_COLS)), np.nan)
+    for j, c in enumerate(FILTER_COLS):
+        nutrients[:len(catalog), j] = catalog.column(c)
+    meals = meals if meals is not None else meal_nutrition.ensure_loaded(sess).table()
+    cols = [NUTRIENTS.index(c) for c in FILTER_COLS]
+    have = set(meals.ids.tolist())
+    rows = [p for p in range(len(catalog), len(docs)) if docs[p].id in have]
+    if rows:
+        nutrients[rows] = meals.matrix[np.ix_(meals.rows(docs[p].id for p in rows), cols)]
+    return SemanticSearch(
+        docs,
+        nutrients,
+        embedder,
+        cache,
+        default_mode=mode or os.getenv("SEARCH_INDEX", "exact"),
+    )
+
+
+_engine: Optional[SemanticSearch] = None
+_engine_key: Optional[tuple] = None
+_engine_lock = threading.Lock()
+_caches: dict[str, EmbeddingCache] = {}
+
+
+def get_search_engine(sess: Session) -> SemanticSearch:
+    """
+    process-wide engine, rebuilt when the Meals table, a meal's nutrition or the menu snapshot changes.\n
+    Rebuilds are cheap after the first one: unchanged texts come from the embedding cache.
+    """
+    global _engine, _engine_key
+    meals = meal_nutrition.ensure_loaded(sess).table()      # a new object after every recipe / ingredient change
+    key = (*sess.query(func.count(Meals.MealID), func.max(Meals.MealID)).one(), meals, load_catalog())
+    with _engine_lock:
+        if _engine is None or key != _engine_key:
+            cache_path = os.getenv("SEARCH_CACHE_PATH", CACHE_PATH)
+            if cache_path not in _caches:
+                _caches[cache_path] = EmbeddingCache(cache_path)
+            _engine = build_search(sess, cache=_caches[cache_path], meals=meals)
+            _engine_key = key
+        return _engine
@@ -1,6 +1,24 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+""" the one database engine and session factory every module uses\n
+- make_engine() reads the pool settings below from the environment, defaults in brackets\n
+- DB_POOL_SIZE [5], DB_MAX_OVERFLOW [10], DB_POOL_TIMEOUT [30 s], DB_POOL_RECYCLE [1800 s, -1 = never]\n
+- DB_POOL_PRE_PING [true], DB_STATEMENT_TIMEOUT_MS [0 = none]\n
+- the statement timeout is statement_timeout on postgres, a progress handler that interrupts the statement on sqlite\n
+- pool_stats() is a live view of the pool: size, checked out, overflow, time spent waiting for a connection\n
+- sqlite runs in performance mode, DB_SQLITE_PERFORMANCE [true]: SQLITE_PRAGMAS are set on every new connection\n
+- each pragma can be overridden as DB_SQLITE_<PRAGMA>, e.g. DB_SQLITE_SYNCHRONOUS=FULL or DB_SQLITE_MMAP_SIZE=0"""
+
+from __future__ import annotations
+
 import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 try:
     from dotenv import load_dotenv
@@ -13,7 +31,186 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     DATABASE_URL = "sqlite:///./forge.db"
 
-engine = create_engine(DATABASE_URL)
+# performance mode, pragma -> default; readers no longer wait on writers under WAL
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",        # fsync at checkpoints only, safe under WAL
+    "busy_timeout": 5000,           # ms a writer waits for the lock instead of failing
+    "mmap_size": 268435456,         # 256 MiB of the file read through mmap
+    "cache_size": -65536,           # negative = KiB, 64 MiB page cache per connection
+    "temp_store": "MEMORY",
+}
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None else value.lower() in {"1", "true", "yes"}
+
+
+def sqlite_pragmas(**overrides) -> dict:
+    """SQLITE_PRAGMAS with DB_SQLITE_<PRAGMA> env values and then overrides applied; ValueError on a bad value"""
+    pragmas = {}
+    for name, default in SQLITE_PRAGMAS.items():
+        value = overrides.get(name, os.getenv(f"DB_SQLITE_{name.upper()}", default))
+        if name in _PRAGMA_CHOICES:
+            value = str(value).upper()
+            if value not in _PRAGMA_CHOICES[name]:
+                raise ValueError(f"Invalid {name} '{value}', expected one of {sorted(_PRAGMA_CHOICES[name])}")
+        else:
+            value = int(value)
+        pragmas[name] = value
+    return pragmas
+
+
+def _apply_sqlite_pragmas(engine: Engine, pragmas: dict, in_memory: bool) -> None:
+    if in_memory:
+        pragmas = {k: v for k, v in pragmas.items() if k != "journal_mode"}     # memory dbs have no WAL
+
+    @event.listens_for(engine, "connect")
+    def _set(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that counts how long checkouts wait and how many time out"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def _sqlite_statement_timeout(engine: Engine, timeout_ms: int) -> None:
+    """sqlite has no statement_timeout: a progress handler aborts a statement past its deadline"""
+    limit = timeout_ms / 1000.0
+
+    @event.listens_for(engine, "connect")
+    def _install(dbapi_conn, _record):
+        deadline = [None]
+        dbapi_conn.set_progress_handler(
+            lambda: deadline[0] is not None and time.monotonic() > deadline[0], 10_000,
+        )
+        _record.info["deadline"] = deadline
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, *_):
+        deadline = conn.connection.info.get("deadline")
+        if deadline is not None:
+            deadline[0] = time.monotonic() + limit
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, *_):
+        deadline = conn.connection.info.get("deadline")
+        if deadline is not None:
+            deadline[0] = None
+
+
+def engine_settings(**overrides) -> dict:
+    """the DB_* settings, keyword overrides take precedence"""
+    settings = {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "statement_timeout_ms": _env_int("DB_STATEMENT_TIMEOUT_MS", 0),
+        "sqlite_performance": _env_bool("DB_SQLITE_PERFORMANCE", True),
+        "sqlite_pragmas": None,
+    }
+    settings.update(overrides)
+    return settings
+
+
+def make_engine(url: Optional[str] = None, **overrides) -> Engine:
+    """
+    engine for url (DATABASE_URL by default) with engine_settings(); keyword overrides
+    take precedence (pool_size=, max_overflow=, pool_timeout=, pool_recycle=, pool_pre_ping=,
+    statement_timeout_ms=, sqlite_performance=, sqlite_pragmas=). In-memory sqlite keeps
+    SQLAlchemy's own single-connection pool.
+    """
+    url = make_url(url or DATABASE_URL)
+    settings = engine_settings(**overrides)
+    timeout_ms = settings.pop("statement_timeout_ms")
+    performance = settings.pop("sqlite_performance")
+    pragma_overrides = settings.pop("sqlite_pragmas") or {}
+
+    sqlite = url.get_backend_name() == "sqlite"
+    connect_args = {}
+    if sqlite:
+        connect_args["check_same_thread"] = False
+    elif timeout_ms and url.get_backend_name() == "postgresql":
+        connect_args["options"] = f"-c statement_timeout={int(timeout_ms)}"
+
+    in_memory = sqlite and url.database in (None, "", ":memory:")
+    if in_memory:
+        engine = create_engine(url, connect_args=connect_args, pool_pre_ping=settings["pool_pre_ping"])
+    else:
+        engine = create_engine(url, connect_args=connect_args, poolclass=TimedQueuePool, **settings)
+    if sqlite and performance:
+        _apply_sqlite_pragmas(engine, sqlite_pragmas(**pragma_overrides), in_memory)
+    if sqlite and timeout_ms:
+        _sqlite_statement_timeout(engine, timeout_ms)
+    return engine
+
+
+def pool_stats(bind: Optional[Engine] = None) -> dict:
+    """live counters for bind's pool (the shared engine by default)"""
+    pool = (bind or engine).pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "wait_ms_total": round(pool.wait_total * 1000, 3),
+                "wait_ms_avg": round(pool.wait_total * 1000 / pool.checkouts, 3) if pool.checkouts else 0.0,
+                "wait_ms_max": round(pool.wait_max * 1000, 3),
+            })
+    return stats
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
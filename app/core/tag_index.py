@@ -0,0 +1,364 @@
+""" in-memory bitmap indexes over tag assignments\n
+- one bitset per (facet, tag value): bit n is set when item n carries that value\n
+- bitsets are python ints, so AND/OR/NOT and popcount run in C over whole words\n
+- filters are OR within a facet and AND across facets; counts come from one popcount per value\n
+- load() collects the ids of each value first and packs every bitset once, set() is for single items\n
+- the index is per process and kept current by the repos functions that write tags"""
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterable, Mapping, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.db import (
+    Exercises,
+    SpiceLevelTags, CuisineTags, ComplexityTags, GoalTags,
+    PrepTimeTags, CookTimeTags, DietaryTags,
+    MuscleGroupTags, DifficultyTags, ExerciseTypeTags,
+    meal_tags, meal_dietary_tags, exercise_tags, exercise_muscle_groups,
+)
+
+
+def bits_to_ids(bits: int) -> list[int]:
+    """positions of the set bits, ascending"""
+    if bits <= 0:
+        return []
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
+
+
+def ids_to_bits(ids: Iterable[int]) -> int:
+    """bitset with a bit set for every id, packed in one pass"""
+    ids = np.fromiter(ids, dtype=np.int64)
+    if not len(ids):
+        return 0
+    flags = np.zeros(int(ids.max()) + 1, dtype=bool)
+    flags[ids] = True
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+
+class BitmapIndex:
+    def __init__(self, facets: Iterable[str]):
+        self.facets = list(facets)
+        self.bitmaps: dict[str, dict[int, int]] = {f: {} for f in self.facets}
+        self.assigned: dict[int, dict[str, tuple[int, ...]]] = {}
+        self.universe = 0       # every indexed item
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.assigned)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self.assigned
+
+    def set(self, item_id: int, tags: Mapping[str, Iterable[int]]) -> None:
+        """replace every tag of `item_id`; facets missing from `tags` end up empty"""
+        with self.lock:
+            self.remove(item_id)
+            bit = 1 << item_id
+            stored = {}
+            for facet in self.facets:
+                values = tuple(dict.fromkeys(tags.get(facet, ())))
+                for v in values:
+                    self.bitmaps[facet][v] = self.bitmaps[facet].get(v, 0) | bit
+                stored[facet] = values
+            self.assigned[item_id] = stored
+            self.universe |= bit
+
+    def set_many(self, items: Mapping[int, Mapping[str, Iterable[int]]]) -> None:
+        """set() for many items at once; each bitset is packed once instead of or-ed per item"""
+        with self.lock:
+            for item_id in items:
+                self.remove(item_id)
+            ids: dict[str, dict[int, list[int]]] = {f: {} for f in self.facets}
+            for item_id, tags in items.items():
+                stored = {}
+                for facet in self.facets:
+                    values = tuple(dict.fromkeys(tags.get(facet, ())))
+                    for v in values:
+                        ids[facet].setdefault(v, []).append(item_id)
+                    stored[facet] = values
+                self.assigned[item_id] = stored
+            for facet, by_value in ids.items():
+                for v, members in by_value.items():
+                    self.bitmaps[facet][v] = self.bitmaps[facet].get(v, 0) | ids_to_bits(members)
+            self.universe |= ids_to_bits(items)
+
+    def remove(self, item_id: int) -> bool:
+        with self.lock:
+            stored = self.assigned.pop(item_id, None)
+            if stored is None:
+                return False
+            clear = ~(1 << item_id)
+            for facet, values in stored.items():
+                for v in values:
+                    self.bitmaps[facet][v] &= clear
+            self.universe &= clear
+            return True
+
+    def tags_of(self, item_id: int) -> Optional[dict[str, tuple[int, ...]]]:
+        return self.assigned.get(item_id)
+
+    def any_of(self, facet: str, values: Iterable[int]) -> int:
+        out = 0
+        for v in values:
+            out |= self.bitmaps[facet].get(v, 0)
+        return out
+
+    def all_of(self, facet: str, values: Iterable[int]) -> int:
+        out = self.universe
+        for v in values:
+            out &= self.bitmaps[facet].get(v, 0)
+        return out
+
+    def match(
+        self,
+        any_of: Optional[Mapping[str, Iterable[int]]] = None,
+        all_of: Optional[Mapping[str, Iterable[int]]] = None,
+        none_of: Optional[Mapping[str, Iterable[int]]] = None,
+    ) -> int:
+        """
+        bitset of items that, for every facet given, have at least one `any_of` value,
+        every `all_of` value and no `none_of` value
+        """
+        with self.lock:
+            bits = self.universe
+            for facet, values in (any_of or {}).items():
+                values = list(values)
+                if values:
+                    bits &= self.any_of(facet, values)
+            for facet, values in (all_of or {}).items():
+                bits &= self.all_of(facet, values)
+            for facet, values in (none_of or {}).items():
+                bits &= ~self.any_of(facet, values)
+            return bits
+
+    def facet_search(self, any_of: Mapping[str, Iterable[int]]) -> tuple[int, dict[str, dict[int, int]]]:
+        """
+        items matching `any_of` (OR within a facet, AND across facets) plus, for every
+        facet, the count each of its values would have with all the *other* facets'
+        selections applied, i.e. what selecting that value next would leave
+        """
+        with self.lock:
+            masks = []
+            for facet in self.facets:
+                values = list(any_of.get(facet, ()))
+                masks.append(self.any_of(facet, values) if values else self.universe)
+            # others[i] = AND of every mask except masks[i], from prefix and suffix ANDs
+            prefix = [self.universe]
+            for m in masks[:-1]:
+                prefix.append(prefix[-1] & m)
+            others, suffix = [0] * len(masks), self.universe
+            for i in range(len(masks) - 1, -1, -1):
+                others[i] = prefix[i] & suffix
+                suffix &= masks[i]
+            counts = {
+                facet: {v: (b & others[i]).bit_count() for v, b in self.bitmaps[facet].items()}
+                for i, facet in enumerate(self.facets)
+            }
+            return suffix, counts
+
+    def facet_counts(self, bits: Optional[int] = None) -> dict[str, dict[int, int]]:
+        """per facet, value -> number of items in `bits` (default: all) carrying it"""
+        with self.lock:
+            bits = self.universe if bits is None else bits
+            return {
+                facet: {v: c for v, b in values.items() if (c := (b & bits).bit_count())}
+                for facet, values in self.bitmaps.items()
+            }
+
+
+class NamedTagIndex(BitmapIndex, ABC):
+    """BitmapIndex plus tag name <-> id lookups for each facet, filled by load()"""
+
+    def __init__(self, facets: Iterable[str]):
+        super().__init__(facets)
+        self.loaded = False
+        self.name_to_id: dict[str, dict[str, int]] = {f: {} for f in self.facets}
+        self.id_to_name: dict[str, dict[int, str]] = {f: {} for f in self.facets}
+
+    @abstractmethod
+    def load(self, sess: Session) -> "NamedTagIndex":
+        """(re)build from the database; readers keep the old state until the new one is complete"""
+
+    def _swap(self, fresh: "NamedTagIndex") -> None:
+        """take over a fully built index's state in one step, under this index's own lock"""
+        with self.lock:
+            for name, value in vars(fresh).items():
+                if name != "lock":
+                    setattr(self, name, value)
+
+    def ensure_loaded(self, sess: Session) -> "NamedTagIndex":
+        if not self.loaded:
+            self.load(sess)
+        return self
+
+    def _load_names(self, sess: Session, facet: str, model, id_col: str) -> None:
+        for row in sess.query(model).all():
+            self.name_to_id[facet][row.name] = getattr(row, id_col)
+            self.id_to_name[facet][getattr(row, id_col)] = row.name
+
+    def resolve(self, facet: str, names: Iterable[str]) -> list[int]:
+        """tag names -> ids, KeyError on an unknown name"""
+        ids = []
+        for name in names:
+            if name not in self.name_to_id[facet]:
+                raise KeyError(f"Unknown tag value: '{name}'")
+            ids.append(self.name_to_id[facet][name])
+        return ids
+
+    def names(self, facet: str, ids: Iterable[int]) -> list[str]:
+        return [self.id_to_name[facet].get(i, str(i)) for i in ids]
+
+    def named_counts(self, bits: Optional[int] = None) -> dict[str, dict[str, int]]:
+        return {
+            facet: {self.id_to_name[facet].get(v, str(v)): c for v, c in counts.items()}
+            for facet, counts in self.facet_counts(bits).items()
+        }
+
+
+# -----------------------------
+# meal tags
+# -----------------------------
+MEAL_FACETS = {
+    # facet: (tag table, its id column, meal_tags column)
+    "spice_level": (SpiceLevelTags, "SpiceLevelID", "SpiceLevelID"),
+    "cuisine":     (CuisineTags, "CuisineID", "CuisineID"),
+    "complexity":  (ComplexityTags, "ComplexityID", "ComplexityID"),
+    "goal":        (GoalTags, "GoalID", "GoalID"),
+    "prep_time":   (PrepTimeTags, "PrepTimeID", "PrepTimeID"),
+    "cook_time":   (CookTimeTags, "CookTimeID", "CookTimeID"),
+    "dietary":     (DietaryTags, "DietaryID", None),
+}
+
+
+class MealTagIndex(NamedTagIndex):
+    """
+    index over meal_tags + meal_dietary_tags, so a filter request resolves names and
+    evaluates without touching the database
+    """
+
+    def __init__(self):
+        super().__init__(MEAL_FACETS)
+
+    def load(self, sess: Session) -> "MealTagIndex":
+        fresh = MealTagIndex()
+        for facet, (model, id_col, _) in MEAL_FACETS.items():
+            fresh._load_names(sess, facet, model, id_col)
+
+        dietary: dict[int, list[int]] = {}
+        for meal_id, dietary_id in sess.query(meal_dietary_tags.MealID, meal_dietary_tags.DietaryID):
+            dietary.setdefault(meal_id, []).append(dietary_id)
+        fresh.set_many({row.MealID: self.row_tags(row, dietary.get(row.MealID, [])) for row in sess.query(meal_tags)})
+        fresh.loaded = True
+        self._swap(fresh)
+        return self
+
+    @staticmethod
+    def row_tags(row, dietary_ids: Iterable[int]) -> dict[str, list[int]]:
+        tags = {facet: [getattr(row, col)] for facet, (_, _, col) in MEAL_FACETS.items() if col}
+        tags["dietary"] = list(dietary_ids)
+        return tags
+
+
+# -----------------------------
+# exercise tags
+# -----------------------------
+EXERCISE_FACETS = {
+    "muscle_group":  (MuscleGroupTags, "MuscleGroupID"),
+    "difficulty":    (DifficultyTags, "DifficultyID"),
+    "exercise_type": (ExerciseTypeTags, "ExerciseTypeID"),
+}
+
+
+class ExerciseTagIndex(NamedTagIndex):
+    """
+    index over exercise_tags + exercise_muscle_groups that also keeps each tagged
+    exercise's name and description, so listings are answered from memory
+    """
+
+    def __init__(self):
+        super().__init__(EXERCISE_FACETS)
+        self.info: dict[int, tuple[str, Optional[str]]] = {}
+
+    def load(self, sess: Session) -> "ExerciseTagIndex":
+        fresh = ExerciseTagIndex()
+        for facet, (model, id_col) in EXERCISE_FACETS.items():
+            fresh._load_names(sess, facet, model, id_col)
+
+        muscles: dict[int, list[int]] = {}
+        for ex_id, mg_id in sess.query(exercise_muscle_groups.ExerciseID, exercise_muscle_groups.MuscleGroupID):
+            muscles.setdefault(ex_id, []).append(mg_id)
+        rows = (
+            sess.query(exercise_tags, Exercises.name, Exercises.description)
+            .join(Exercises, Exercises.ExerciseID == exercise_tags.ExerciseID)
+        )
+        tags, info = {}, {}
+        for tag, name, description in rows:
+            tags[tag.ExerciseID] = {
+                "muscle_group": muscles.get(tag.ExerciseID, []),
+                "difficulty": [tag.DifficultyID],
+                "exercise_type": [tag.ExerciseTypeID],
+            }
+            info[tag.ExerciseID] = (name, description)
+        fresh.set_many(tags)
+        fresh.info.update(info)
+        fresh.loaded = True
+        self._swap(fresh)
+        return self
+
+    def set(self, item_id: int, tags: Mapping[str, Iterable[int]],
+            info: Optional[tuple[str, Optional[str]]] = None) -> None:
+        with self.lock:
+            super().set(item_id, tags)
+            if info is not None:
+                self.info[item_id] = info
+
+    def remove(self, item_id: int) -> bool:
+        with self.lock:
+            self.info.pop(item_id, None)
+            return super().remove(item_id)
+
+    def describe(self, sess: Session, ids: list[int]) -> list[dict]:
+        """
+        exercise dicts with tag names, in `ids` order; unknown names are read in one query
+        (outside the lock), ids untagged since they were matched are left out
+        """
+        with self.lock:
+            missing = [i for i in ids if i not in self.info]
+        found = {}
+        if missing:
+            found = {
+                ex_id: (name, description) for ex_id, name, description in
+                sess.query(Exercises.ExerciseID, Exercises.name, Exercises.description)
+                .filter(Exercises.ExerciseID.in_(missing))
+            }
+        out = []
+        with self.lock:
+            for i, info in found.items():
+                if i in self.assigned:
+                    self.info.setdefault(i, info)
+            for i in ids:
+                tags = self.assigned.get(i)
+                if tags is None:
+                    continue
+                name, description = self.info.get(i, ("", None))
+                out.append({
+                    "id": i,
+                    "name": name,
+                    "description": description or "",
+                    "tags": {
+                        "muscle_groups": self.names("muscle_group", tags["muscle_group"]),
+                        "difficulty": self.names("difficulty", tags["difficulty"])[0],
+                        "exercise_type": self.names("exercise_type", tags["exercise_type"])[0],
+                    },
+                })
+        return out
+
+
+meal_tag_index = MealTagIndex()
+exercise_tag_index = ExerciseTagIndex()
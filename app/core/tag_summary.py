@@ -0,0 +1,103 @@
+""" cached tag summaries (how many items carry each tag value)\n
+- counts come from one UNION ALL of GROUP BY queries joined to the tag tables, so rows never reach python\n
+- the result is cached per engine and patched with +/- deltas by the repos functions that write tags\n
+- writes from other processes are not seen until invalidate() or a restart"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.core.db import (
+    Meals, Exercises,
+    SpiceLevelTags, CuisineTags, ComplexityTags, GoalTags,
+    PrepTimeTags, CookTimeTags, DietaryTags,
+    MuscleGroupTags, DifficultyTags, ExerciseTypeTags,
+    meal_tags, meal_dietary_tags, exercise_tags, exercise_muscle_groups,
+)
+
+
+class TagSummary:
+    def __init__(self, item_id, facets: Mapping[str, tuple], total_key: str):
+        """
+        item_id: primary key column of the tagged items (for the total)
+        facets: facet -> (output key, tag table, tag id column name, assignment table)
+        """
+        self.item_id = item_id
+        self.facets = dict(facets)
+        self.total_key = total_key
+        self.lock = threading.Lock()
+        self._cache: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def _compute(self, sess: Session) -> dict:
+        parts, names = [], {}
+        for key, (_, model, id_col, assoc) in self.facets.items():
+            tag_id = getattr(model, id_col)
+            parts.append(
+                select(literal(key).label("facet"), model.name, func.count().label("n"))
+                .select_from(assoc)
+                .join(model, getattr(assoc, id_col) == tag_id)
+                .group_by(model.name)
+            )
+            names[key] = dict(sess.query(tag_id, model.name).all())
+        counts = {key: {} for key in self.facets}
+        for facet, name, n in sess.execute(union_all(*parts)):
+            counts[facet][name] = n
+        return {"counts": counts, "names": names}
+
+    def get(self, sess: Session) -> dict:
+        bind = sess.get_bind()
+        with self.lock:
+            cached = self._cache.get(bind)
+            if cached is None:
+                cached = self._cache[bind] = self._compute(sess)
+            counts = {self.facets[key][0]: dict(values) for key, values in cached["counts"].items()}
+        total = sess.query(func.count(self.item_id)).scalar()
+        return {self.total_key: total, **counts}
+
+    def apply(self, sess: Session, removed: Optional[Mapping[str, Iterable[int]]] = None,
+              added: Optional[Mapping[str, Iterable[int]]] = None) -> None:
+        """patch a cached summary after a committed write; no-op when nothing is cached"""
+        with self.lock:
+            cached = self._cache.get(sess.get_bind())
+            if cached is None:
+                return
+            for delta, changes in ((-1, removed or {}), (1, added or {})):
+                for key, ids in changes.items():
+                    counts = cached["counts"][key]
+                    for tag_id in ids:
+                        name = cached["names"][key].get(tag_id)
+                        if name is None:        # tag added since the cache was built
+                            self._cache.pop(sess.get_bind(), None)
+                            return
+                        counts[name] = counts.get(name, 0) + delta
+                        if counts[name] <= 0:
+                            del counts[name]
+
+    def invalidate(self, sess: Optional[Session] = None) -> None:
+        with self.lock:
+            if sess is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(sess.get_bind(), None)
+
+
+meal_tag_summary = TagSummary(Meals.MealID, {
+    "spice_level": ("by_spice", SpiceLevelTags, "SpiceLevelID", meal_tags),
+    "cuisine":     ("by_cuisine", CuisineTags, "CuisineID", meal_tags),
+    "complexity":  ("by_complexity", ComplexityTags, "ComplexityID", meal_tags),
+    "goal":        ("by_goal", GoalTags, "GoalID", meal_tags),
+    "prep_time":   ("by_prep_time", PrepTimeTags, "PrepTimeID", meal_tags),
+    "cook_time":   ("by_cook_time", CookTimeTags, "CookTimeID", meal_tags),
+    "dietary":     ("by_dietary", DietaryTags, "DietaryID", meal_dietary_tags),
+}, total_key="total_meals")
+
+exercise_tag_summary = TagSummary(Exercises.ExerciseID, {
+    "muscle_group":  ("by_muscle_group", MuscleGroupTags, "MuscleGroupID", exercise_muscle_groups),
+    "difficulty":    ("by_difficulty", DifficultyTags, "DifficultyID", exercise_tags),
+    "exercise_type": ("by_exercise_type", ExerciseTypeTags, "ExerciseTypeID", exercise_tags),
+}, total_key="total_exercises")
@@ -1,20 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException, Header
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 import logging
+from datetime import date, timedelta
 
 from typing import Optional, List, Dict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
-from app.core.session import get_db
-from app.core.seed import engine
+from app.core.session import engine, get_db, pool_stats
+from app.core.async_session import AnySession, close_async_engine, get_async_db
 
 from app.core.db import Workouts, workout_exercises, Exercises, Machines
 from app.core.db import Accounts
-from app.core import repos, session
+from app.core import async_repos, repos, session
+from app.core.menu_features import FEATURES
+from app.core import menu_swaps, menu_pareto, semantic_search, bulk_tags, meal_nutrients, macro_goals
+from app.core.autocomplete import KINDS as AUTOCOMPLETE_KINDS, autocomplete
+from app.core.macro_history import PERIODS as MACRO_PERIODS, load_history
+from app.core.macro_store import MacroLogStore, close_macro_store, get_macro_store
+from app.core.meal_nutrition import meal_nutrition
+from app.core.macro_tracker import GoalDirection
 from app.core.notifications import NotificationService, get_notification_service
-from app.core.seed import SessionLocal
+from app.core.schema_upgrade import upgrade_schema
 from app.fast_api import account_management as am
+from app.fast_api import meal_tags
 from app.core.auth_tokens import (
     create_access_token,
     decode_access_token,
@@ -24,7 +34,14 @@ from app.core.auth_tokens import (
     utcnow,
 )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # write-behind: persist macro entries still waiting for the flusher
+    close_macro_store()
+    await close_async_engine()
+
+app = FastAPI(lifespan=lifespan)
 logger = logging.getLogger(__name__)
 
 app.add_middleware(
@@ -35,8 +52,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.include_router(meal_tags.router)    # /meals/tags/..., /meals/filter
 
 session.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)      # columns / indexes added to db.py since the tables were created
 
 def get_current_account(
     authorization: str = Header(None),
@@ -51,6 +70,20 @@ def get_current_account(
 
     return repos.lookup_account_by_token(db, authorization)
 
+async def get_current_account_async(
+    authorization: str = Header(None),
+    db: AnySession = Depends(get_async_db),
+) -> Accounts:
+    """get_current_account for async endpoints, no worker thread per request"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing Authorization header")
+
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Invalid Authorization header")
+
+    return await async_repos.lookup_account_by_token(db, authorization)
+
 class ResetPasswordRequest(BaseModel):
     new_password: str
     user_email: str
@@ -96,6 +129,48 @@ class MachineLookupOut(BaseModel):
     machine_id: int
     name: str
 
+class MacroAmountRequest(BaseModel):
+    tracker_id: str
+    amount: float = Field(gt=0)
+
+class MacroItemIn(BaseModel):
+    menu_meal_id: Optional[int] = None
+    meal_id: Optional[int] = None
+    servings: float = Field(1.0, gt=0)
+
+    @model_validator(mode="after")
+    def _one_item(self):
+        if (self.menu_meal_id is None) == (self.meal_id is None):
+            raise ValueError("Give exactly one of menu_meal_id or meal_id")
+        return self
+
+class MacroItemsRequest(BaseModel):
+    items: List[MacroItemIn] = Field(min_length=1)
+
+class IngredientNutrientsRequest(BaseModel):
+    per_grams: float = Field(100.0, gt=0)
+    nutrients: Dict[str, Optional[float]]
+
+class MealIngredientIn(BaseModel):
+    ingredient_id: int
+    grams: float = Field(ge=0)
+
+class MealIngredientsRequest(BaseModel):
+    ingredients: List[MealIngredientIn]
+
+class MacroGoalRequest(BaseModel):
+    goal: float = Field(ge=0)
+    direction: Optional[GoalDirection] = None
+
+class ExerciseTagIn(BaseModel):
+    exercise_id: int
+    difficulty_id: int
+    exercise_type_id: int
+    muscle_group_ids: List[int] = []
+
+class BulkExerciseTagRequest(BaseModel):
+    items: List[ExerciseTagIn] = Field(max_length=50_000)
+
 class LoginRequest(BaseModel):
     email: str
     password: str
@@ -160,6 +235,11 @@ def _send_account_update_notification(
         )
         return False
 
+@app.get("/health/db")
+def db_health():
+    """connection pool counters, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW"""
+    return pool_stats()
+
 @app.post("/auth/create_account", response_model=TokenResponse)
 def create_account(payload: CreateAccountRequest, db: Session = Depends(get_db)):
     try:
@@ -190,6 +270,7 @@ def create_account(payload: CreateAccountRequest, db: Session = Depends(get_db))
 
     db.add(new_account)
     db.commit()
+    autocomplete.add("usernames", new_account.UserID, new_account.username)
 
     return TokenResponse(access_token=access, refresh_token=refresh, expires_in=2 * 60)
 
@@ -233,6 +314,7 @@ def update_account_profile(
         raise HTTPException(status_code=409, detail="Username already in use")
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
+    autocomplete.add("usernames", updated.UserID, updated.username)
 
     notification_sent = _send_account_update_notification(
         notifier,
@@ -314,7 +396,7 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
 
 
 @app.get("/auth/me", response_model=AccountMeResponse)
-def auth_me(me: Accounts = Depends(get_current_account)):
+async def auth_me(me: Accounts = Depends(get_current_account_async)):
     return AccountMeResponse(
         profile_id=me.UserID,
         email=me.email,
@@ -366,7 +448,7 @@ def logout(me: Accounts = Depends(get_current_account), db: Session = Depends(ge
 
 
 @app.post("/auth/reset_password")
-async def resetPasswordEndpoint(
+def resetPasswordEndpoint(
     request: ResetPasswordRequest, session: Session = Depends(get_db)
 ):
     user = am.get_user_by_email(session, Accounts, request.user_email)
@@ -402,6 +484,7 @@ def delete_account(user_id: int, db: Session = Depends(get_db)):
         deleted = repos.delete_account_by_id(db, user_id)
         if deleted:
             db.commit()
+            autocomplete.remove("usernames", user_id)
             return {"deleted": True, "user_id": user_id}
 
         raise HTTPException(status_code=404, detail="Account not found")
@@ -432,10 +515,12 @@ def create_or_save_workout(
     workout_id = workout.WorkoutID
 
     # 2) overwrite existing saved sets for this profile/workout
-    db.query(workout_exercises).filter(
+    saved = db.query(workout_exercises).filter(
         workout_exercises.ProfileID == payload.profile_id,
         workout_exercises.WorkoutID == workout_id
-    ).delete(synchronize_session=False)
+    )
+    replaced = saved.with_entities(workout_exercises.ExerciseID, workout_exercises.MachineID).all()
+    saved.delete(synchronize_session=False)
     db.commit()
 
     # 3) Insert sets (one row per set)
@@ -456,6 +541,12 @@ def create_or_save_workout(
 
     db.commit()
 
+    # keep autocomplete popularity in step with workout_exercises
+    autocomplete.bump("exercises", [r.ExerciseID for r in replaced], by=-1)
+    autocomplete.bump("machines", [r.MachineID for r in replaced], by=-1)
+    autocomplete.bump("exercises", [ex.exercise_id for ex in payload.exercises])
+    autocomplete.bump("machines", [ex.machine_id for ex in payload.exercises])
+
     _send_profile_update_notification(
         notifier,
         db=db,
@@ -479,6 +570,36 @@ def get_exercises(db: Session = Depends(get_db)):
     ]
 
 
+@app.post("/exercises/tags/bulk")
+def bulk_tag_exercises(payload: BulkExerciseTagRequest, db: Session = Depends(get_db)):
+    return bulk_tags.bulk_tag_exercises(db, [item.model_dump() for item in payload.items])
+
+
+@app.get("/exercises/search")
+def search_exercises(
+    muscle_group: List[str] = Query([], description="Any of these muscle groups, e.g. ?muscle_group=quads&muscle_group=glutes"),
+    difficulty: List[str] = Query([], description="Any of these difficulties"),
+    exercise_type: List[str] = Query([], description="Any of strength / cardio / hybrid"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    selected = {"muscle_group": muscle_group, "difficulty": difficulty, "exercise_type": exercise_type}
+    return repos.faceted_exercise_search(db, selected, limit, offset)
+
+
+@app.get("/autocomplete/{kind}")
+def autocomplete_names(
+    kind: str,
+    q: str = Query(..., min_length=1, description="What has been typed so far"),
+    k: int = Query(10, ge=1, le=25),
+    db: Session = Depends(get_db),
+):
+    if kind not in AUTOCOMPLETE_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown autocomplete kind, expected one of {list(AUTOCOMPLETE_KINDS)}")
+    return autocomplete.ensure_loaded(db).complete(kind, q, k)
+
+
 @app.get("/machines", response_model=List[MachineLookupOut])
 def get_machines(db: Session = Depends(get_db)):
     rows = db.query(Machines).order_by(Machines.MachineID.asc()).all()
@@ -489,26 +610,9 @@ def get_machines(db: Session = Depends(get_db)):
 
 
 @app.get("/workouts/{profile_id}", response_model=List[WorkoutOut])
-def get_workouts_for_profile(profile_id: int, db: Session = Depends(get_db)):
+async def get_workouts_for_profile(profile_id: int, db: AnySession = Depends(get_async_db)):
     # Fetch all rows for this profile, with workout + exercise names
-    rows = (
-        db.query(
-            workout_exercises.WorkoutID,
-            Workouts.name,
-            workout_exercises.ExerciseID,
-            Exercises.name,
-            workout_exercises.MachineID,
-            workout_exercises.sets,
-            workout_exercises.reps,
-            workout_exercises.weight,
-            workout_exercises.notes,
-        )
-        .join(Workouts, Workouts.WorkoutID == workout_exercises.WorkoutID)
-        .join(Exercises, Exercises.ExerciseID == workout_exercises.ExerciseID)
-        .filter(workout_exercises.ProfileID == profile_id)
-        .order_by(workout_exercises.WorkoutID, workout_exercises.ExerciseID)
-        .all()
-    )
+    rows = await async_repos.workout_rows(db, profile_id)
     # Group into workouts
     grouped: Dict[int, WorkoutOut] = {}
     for r in rows:
@@ -565,13 +669,195 @@ def delete_workout_log(
 
 
 @app.get("/meals/menu/{restaurant}")
-def get_menumeals_restaurant(restaurant: str, db: Session = Depends(get_db)):
-    return repos.lookup_menumeal_by_restaurant(db, restaurant)
+async def get_menumeals_restaurant(restaurant: str, db: AnySession = Depends(get_async_db)):
+    return await async_repos.lookup_menumeal_by_restaurant(db, restaurant)
 
 
 @app.get("/meals/protein/{protein}")
-def get_menumeals_protein(protein: str, db: Session = Depends(get_db)):
-    return repos.lookup_menumeal_by_protein(db, protein)
+async def get_menumeals_protein(protein: str, db: AnySession = Depends(get_async_db)):
+    return await async_repos.lookup_menumeal_by_protein(db, protein)
+
+
+@app.get("/meals/menu/swaps/{axis}")
+def get_all_menumeal_swaps(axis: str, k: int = Query(5, ge=1, le=50)):
+    try:
+        return menu_swaps.precomputed_swaps(axis, k)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/meals/menu/{menu_meal_id}/swaps")
+def get_menumeal_swaps(
+    menu_meal_id: int,
+    axis: str = "energy_kcal",
+    k: int = Query(5, ge=1, le=50),
+    same_category: bool = False,
+):
+    try:
+        return menu_swaps.suggest_swaps(menu_meal_id, axis, k, same_category)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Menu meal not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/meals/pareto")
+def get_menumeal_pareto(
+    restaurant: Optional[str] = None,
+    axes: Optional[str] = Query(None, description="e.g. protein_g:max,energy_kcal:min,sodium_mg:min"),
+):
+    try:
+        return menu_pareto.pareto_options(restaurant, menu_pareto.parse_axes(axes) if axes else None)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/search/meals")
+def search_meals(
+    q: str = Query(..., min_length=1, description='e.g. "spicy chicken under 500 calories"'),
+    k: int = Query(10, ge=1, le=100),
+    mode: Optional[str] = Query(None, description="exact or ivf, defaults to SEARCH_INDEX"),
+    db: Session = Depends(get_db),
+):
+    try:
+        return semantic_search.get_search_engine(db).search(q, k, mode)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/meals/features", response_model=List[str])
+def list_menumeal_features():
+    return FEATURES
+
+
+@app.get("/meals/{meal_id}/nutrition")
+def get_meal_nutrition(meal_id: int, db: Session = Depends(get_db)):
+    return repos.meal_nutrition_facts(db, meal_id)
+
+
+@app.put("/meals/{meal_id}/ingredients")
+def put_meal_ingredients(meal_id: int, payload: MealIngredientsRequest, db: Session = Depends(get_db)):
+    return repos.set_meal_ingredients(db, meal_id, {it.ingredient_id: it.grams for it in payload.ingredients})
+
+
+@app.put("/ingredients/{ingredient_id}/nutrients")
+def put_ingredient_nutrients(ingredient_id: int, payload: IngredientNutrientsRequest, db: Session = Depends(get_db)):
+    return repos.set_ingredient_nutrients(db, ingredient_id, payload.nutrients, payload.per_grams)
+
+
+@app.get("/meals/features/search")
+def get_menumeals_features(
+    feature: List[str] = Query(..., description="Every listed feature must hold, e.g. ?feature=chicken&feature=high_protein"),
+    restaurant: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    return repos.lookup_menumeal_by_features(db, feature, restaurant)
+
+
+
+def _macro_call(fn, *args):
+    try:
+        return fn(*args).summary()
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=exc.args[0])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/macros/{profile_id}")
+def get_macro_log(profile_id: int, store: MacroLogStore = Depends(get_macro_store)):
+    return _macro_call(store.get_log, profile_id)
+
+
+@app.get("/macros/{profile_id}/history")
+def get_macro_history(
+    profile_id: int,
+    days: int = Query(30, ge=1, le=3660),
+    end: Optional[date] = None,
+    rolling: int = Query(7, ge=1, le=365),
+    period: str = Query("week", description=f"one of {list(MACRO_PERIODS)}"),
+    series: bool = Query(True, description="include per-day and per-period series"),
+    db: Session = Depends(get_db),
+    store: MacroLogStore = Depends(get_macro_store),
+):
+    if period not in MACRO_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {list(MACRO_PERIODS)}")
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    history = load_history(db, profile_id, start, end, pending=store.cached_logs(profile_id))
+    return history.summary(rolling=rolling, period=period, series=series)
+
+
+@app.get("/macros/{profile_id}/targets")
+def get_macro_targets(profile_id: int, db: Session = Depends(get_db)):
+    """personalized daily targets from the profile (what a new day starts with)"""
+    targets = macro_goals.stored_goals(db, profile_id)
+    if targets is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return targets
+
+
+@app.post("/macros/{profile_id}/log")
+def log_macro(profile_id: int, payload: MacroAmountRequest, store: MacroLogStore = Depends(get_macro_store)):
+    return _macro_call(store.log, profile_id, payload.tracker_id, payload.amount)
+
+
+@app.post("/macros/{profile_id}/log-items")
+def log_macro_items(
+    profile_id: int,
+    payload: MacroItemsRequest,
+    db: Session = Depends(get_db),
+    store: MacroLogStore = Depends(get_macro_store),
+):
+    """log whole menu items / meals: every item is resolved first, then all trackers are added at once"""
+    if any(it.meal_id is not None for it in payload.items):
+        meal_nutrition.ensure_loaded(db)
+    try:
+        amounts = meal_nutrients.batch_totals(
+            [(it.menu_meal_id, it.servings) for it in payload.items if it.menu_meal_id is not None],
+            [(it.meal_id, it.servings) for it in payload.items if it.meal_id is not None],
+        )
+        log, skipped = store.log_many(profile_id, amounts)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=exc.args[0])
+    return {**log.summary(), "added": {t: round(v, 2) for t, v in amounts.items()}, "skipped_no_goal": skipped}
+
+
+@app.post("/macros/{profile_id}/undo")
+def undo_macro_entry(profile_id: int, store: MacroLogStore = Depends(get_macro_store)):
+    return _macro_call(store.undo, profile_id)
+
+
+@app.get("/macros/{profile_id}/events")
+def get_macro_events(profile_id: int, day: Optional[date] = None, store: MacroLogStore = Depends(get_macro_store)):
+    return store.audit_trail(profile_id, day)
+
+
+@app.post("/macros/{profile_id}/remove")
+def remove_macro(profile_id: int, payload: MacroAmountRequest, store: MacroLogStore = Depends(get_macro_store)):
+    return _macro_call(store.remove, profile_id, payload.tracker_id, payload.amount)
+
+
+@app.put("/macros/{profile_id}/goals/{tracker_id}")
+def set_macro_goal(
+    profile_id: int,
+    tracker_id: str,
+    payload: MacroGoalRequest,
+    store: MacroLogStore = Depends(get_macro_store),
+):
+    return _macro_call(store.set_goal, profile_id, tracker_id, payload.goal, payload.direction)
+
+
+@app.delete("/macros/{profile_id}/goals/{tracker_id}")
+def clear_macro_goal(profile_id: int, tracker_id: str, store: MacroLogStore = Depends(get_macro_store)):
+    return _macro_call(store.clear_goal, profile_id, tracker_id)
+
+
+@app.post("/macros/{profile_id}/reset")
+def reset_macros(profile_id: int, store: MacroLogStore = Depends(get_macro_store)):
+    return _macro_call(store.reset_all, profile_id)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from enum import Enum
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 from app.core.db import (
     Meals,
@@ -10,15 +10,9 @@ from app.core.db import (
     GoalTags, PrepTimeTags, CookTimeTags, DietaryTags,
     meal_tags, meal_dietary_tags,
 )
-from app.core import repos
-from app.core.database import SessionLocal
-
-def get_session():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.core import repos, bulk_tags
+from app.core.tag_index import meal_tag_index
+from app.core.session import get_db as get_session
 
 # Enums
 
@@ -66,16 +60,9 @@ class MealTagRequest(BaseModel):
     goal_id:         int
     prep_time_id:    int
     cook_time_id:    int
-
-    class MealTagRequest(BaseModel):
-        meal_id: int
-        spice_level_id: int
-        cuisine_id: int
-        complexity_id: int
-        goal_id: int
-        prep_time_id: int
-        cook_time_id: int
-        dietary_tag_ids: List[int] = []
+    dietary_tag_ids: List[int] = []
+class BulkMealTagRequest(BaseModel):
+    items: List[MealTagRequest] = Field(max_length=50_000)
 class MealTagResponse(BaseModel):
     meal_id:      int
     spice_level:  str
@@ -112,24 +99,7 @@ def list_dietary_tags():
     return [e.value for e in DietaryTag]
 @router.get("/tags/summary")
 def tag_summary(sess: Session = Depends(get_session)):
-    all_tags = sess.query(meal_tags).all()
-    all_dietary = sess.query(meal_dietary_tags).all()
-    def _count(rows, attr):
-        counts: dict[str, int] = {}
-        for row in rows:
-            val = str(getattr(row, attr))
-            counts[val] = counts.get(val, 0) + 1
-        return counts
-    return {
-        "total_meals":   sess.query(Meals).count(),
-        "by_spice":      _count(all_tags, "SpiceLevelID"),
-        "by_cuisine":    _count(all_tags, "CuisineID"),
-        "by_complexity": _count(all_tags, "ComplexityID"),
-        "by_goal":       _count(all_tags, "GoalID"),
-        "by_prep_time":  _count(all_tags, "PrepTimeID"),
-        "by_cook_time":  _count(all_tags, "CookTimeID"),
-        "by_dietary":    _count(all_dietary, "DietaryID"),
-    }
+    return repos.meal_tag_summary_counts(sess)
 @router.post("/tags", status_code=201)
 def tag_meal(payload: MealTagRequest, sess: Session = Depends(get_session)):
     repos.tag_meal(
@@ -144,49 +114,48 @@ def tag_meal(payload: MealTagRequest, sess: Session = Depends(get_session)):
         dietary_tag_ids=payload.dietary_tag_ids,
     )
     return {"detail": "Meal tagged successfully."}
+@router.post("/tags/bulk")
+def bulk_tag_meals(payload: BulkMealTagRequest, sess: Session = Depends(get_session)):
+    return bulk_tags.bulk_tag_meals(sess, [item.model_dump() for item in payload.items])
 @router.get("/tags/{meal_id}")
 def get_meal_tags(meal_id: int, sess: Session = Depends(get_session)):
     return repos.get_meal_tags(sess, meal_id)
 @router.delete("/tags/{meal_id}", status_code=204)
 def delete_meal_tags(meal_id: int, sess: Session = Depends(get_session)):
-    tag = sess.query(meal_tags).filter_by(MealID=meal_id).first()
-    if not tag:
-        raise HTTPException(status_code=404, detail="No tags found for this meal.")
-    sess.query(meal_dietary_tags).filter_by(MealID=meal_id).delete()
-    sess.delete(tag)
-    sess.commit()
+    repos.delete_meal_tags(sess, meal_id)
 @router.get("/filter")
 def filter_meals(
-    spice_level:  Optional[SpiceLevel]  = Query(None, description="Filter by spice level"),
-    cuisine:      Optional[Cuisine]     = Query(None, description="Filter by cuisine"),
-    complexity:   Optional[Complexity]  = Query(None, description="Filter by complexity"),
-    goal:         Optional[Goal]        = Query(None, description="Filter by fat_loss / muscle_gain / maintenance"),
-    prep_time:    Optional[TimeLabel]   = Query(None, description="Filter by prep time"),
-    cook_time:    Optional[TimeLabel]   = Query(None, description="Filter by cook time"),
-    dietary_tag:  Optional[DietaryTag]  = Query(None, description="Filter by a single dietary tag"),
-    sess:         Session               = Depends(get_session),
+    spice_level:     List[SpiceLevel]  = Query([], description="Any of these spice levels"),
+    cuisine:         List[Cuisine]     = Query([], description="Any of these cuisines"),
+    complexity:      List[Complexity]  = Query([], description="Any of these complexities"),
+    goal:            List[Goal]        = Query([], description="Any of fat_loss / muscle_gain / maintenance"),
+    prep_time:       List[TimeLabel]   = Query([], description="Any of these prep times"),
+    cook_time:       List[TimeLabel]   = Query([], description="Any of these cook times"),
+    dietary_tag:     List[DietaryTag]  = Query([], description="Dietary tags, see dietary_match"),
+    dietary_match:   Literal["all", "any"] = Query("all", description="Require all or any of dietary_tag"),
+    exclude_dietary: List[DietaryTag]  = Query([], description="Drop meals carrying any of these"),
+    limit:           int               = Query(50, ge=1, le=500),
+    offset:          int               = Query(0, ge=0),
+    sess:            Session           = Depends(get_session),
 ):
-    def _id(model, name: str | None):
-        if name is None:
-            return None
-        row = sess.query(model).filter_by(name=name).first()
-        if not row:
-            raise HTTPException(status_code=400, detail=f"Unknown tag value: '{name}'")
-        return row
-    spice_row    = _id(SpiceLevelTags, spice_level.value  if spice_level  else None)
-    cuisine_row  = _id(CuisineTags,    cuisine.value      if cuisine      else None)
-    complex_row  = _id(ComplexityTags, complexity.value   if complexity   else None)
-    goal_row     = _id(GoalTags,       goal.value         if goal         else None)
-    prep_row     = _id(PrepTimeTags,   prep_time.value    if prep_time    else None)
-    cook_row     = _id(CookTimeTags,   cook_time.value    if cook_time    else None)
-    dietary_row  = _id(DietaryTags,    dietary_tag.value  if dietary_tag  else None)
+    index = meal_tag_index.ensure_loaded(sess)
+    facets = {
+        "spice_level": spice_level, "cuisine": cuisine, "complexity": complexity,
+        "goal": goal, "prep_time": prep_time, "cook_time": cook_time,
+    }
+    try:
+        any_of = {f: index.resolve(f, [v.value for v in vals]) for f, vals in facets.items() if vals}
+        dietary = index.resolve("dietary", [v.value for v in dietary_tag])
+        excluded = index.resolve("dietary", [v.value for v in exclude_dietary])
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
+    if dietary_match == "any" and dietary:
+        any_of["dietary"] = dietary
     return repos.filter_meals_by_tags(
         sess,
-        spice_level_id = spice_row.SpiceLevelID  if spice_row   else None,
-        cuisine_id     = cuisine_row.CuisineID   if cuisine_row  else None,
-        complexity_id  = complex_row.ComplexityID if complex_row else None,
-        goal_id        = goal_row.GoalID          if goal_row    else None,
-        prep_time_id   = prep_row.PrepTimeID      if prep_row    else None,
-        cook_time_id   = cook_row.CookTimeID      if cook_row    else None,
-        dietary_tag_id = dietary_row.DietaryID    if dietary_row else None,
-    )
\ No newline at end of file
+        any_of=any_of,
+        all_of={"dietary": dietary} if dietary_match == "all" else None,
+        none_of={"dietary": excluded},
+        limit=limit,
+        offset=offset,
+    )
@@ -1,8 +1,19 @@
-from fastapi import FastAPI, HTTPException, Query
+from contextlib import asynccontextmanager
+import logging
+
+from fastapi import Depends, FastAPI, HTTPException, Query
 from pydantic import BaseModel, field_validator
+from sqlalchemy.orm import Session
 from enum import Enum
 from typing import Optional
-from uuid import uuid4, UUID
+
+from app.core import repos
+from app.core.autocomplete import autocomplete
+from app.core.db import Exercises
+from app.core.session import SessionLocal, get_db
+from app.core.tag_index import ExerciseTagIndex, bits_to_ids, exercise_tag_index
+
+logger = logging.getLogger(__name__)
 
 class MuscleGroup(str, Enum):
     CHEST = "chest"
@@ -44,7 +55,7 @@ class TagSet(BaseModel):
 
 
 class Exercise(BaseModel):
-    id: UUID
+    id: int
     name: str
     description: str
     tags: TagSet
@@ -60,53 +71,78 @@ class ExerciseUpdate(BaseModel):
     description: Optional[str] = None
     tags: Optional[TagSet] = None
 
-db: dict[UUID, Exercise] = {}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the tag index up front so the first requests after a restart are served warm
+    try:
+        with SessionLocal() as sess:
+            exercise_tag_index.load(sess)
+    except Exception:
+        logger.exception("Could not preload the exercise tag index, it will load on first use")
+    yield
+
 app = FastAPI(
     title="Exercise Tag System",
     description="Manage exercises tagged by muscle group, difficulty, and type.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 @app.post("/exercises", response_model=Exercise, status_code=201, tags=["Exercises"])
-def create_exercise(payload: ExerciseCreate):
-    exercise_id = uuid4()
-    exercise = Exercise(id=exercise_id, **payload.model_dump())
-    db[exercise_id] = exercise
-    return exercise
+def create_exercise(payload: ExerciseCreate, db: Session = Depends(get_db)):
+    index = _index(db)
+    tag_ids = _tag_ids(index, payload.tags)
+    exercise = Exercises(name=payload.name, description=payload.description)
+    db.add(exercise)
+    db.flush()
+    repos.tag_exercise(db, exercise.ExerciseID, **tag_ids)
+    autocomplete.add("exercises", exercise.ExerciseID, exercise.name)
+    return index.describe(db, [exercise.ExerciseID])[0]
 @app.get("/exercises", response_model=list[Exercise], tags=["Exercises"])
 def list_exercises(
     muscle_group: Optional[MuscleGroup] = Query(None, description="Filter by muscle group"),
     difficulty: Optional[Difficulty] = Query(None, description="Filter by difficulty"),
     exercise_type: Optional[ExerciseType] = Query(None, description="Filter by strength/cardio/hybrid"),
+    db: Session = Depends(get_db),
 ):
-    results = list(db.values())
-    if muscle_group:
-        results = [e for e in results if muscle_group in e.tags.muscle_groups]
-    if difficulty:
-        results = [e for e in results if e.tags.difficulty == difficulty]
-    if exercise_type:
-        results = [e for e in results if e.tags.exercise_type == exercise_type]
-    return results
+    index = _index(db)
+    wanted = {"muscle_group": muscle_group, "difficulty": difficulty, "exercise_type": exercise_type}
+    any_of = {}
+    for facet, value in wanted.items():
+        if value is not None:
+            tag_id = index.name_to_id[facet].get(value.value)
+            if tag_id is None:
+                return []
+            any_of[facet] = [tag_id]
+    return index.describe(db, bits_to_ids(index.match(any_of)))
 @app.get("/exercises/{exercise_id}", response_model=Exercise, tags=["Exercises"])
-def get_exercise(exercise_id: UUID):
-    _require(exercise_id)
-    return db[exercise_id]
+def get_exercise(exercise_id: int, db: Session = Depends(get_db)):
+    index = _require(db, exercise_id)
+    return index.describe(db, [exercise_id])[0]
 @app.patch("/exercises/{exercise_id}", response_model=Exercise, tags=["Exercises"])
-def update_exercise(exercise_id: UUID, payload: ExerciseUpdate):
-    _require(exercise_id)
-    existing = db[exercise_id]
-    updated_data = existing.model_dump()
+def update_exercise(exercise_id: int, payload: ExerciseUpdate, db: Session = Depends(get_db)):
+    index = _require(db, exercise_id)
+    exercise = db.get(Exercises, exercise_id)
     if payload.name is not None:
-        updated_data["name"] = payload.name
+        exercise.name = payload.name
     if payload.description is not None:
-        updated_data["description"] = payload.description
+        exercise.description = payload.description
     if payload.tags is not None:
-        updated_data["tags"] = payload.tags.model_dump()
-    db[exercise_id] = Exercise(**updated_data)
-    return db[exercise_id]
+        tag_ids = _tag_ids(index, payload.tags)
+    else:
+        current = index.tags_of(exercise_id)
+        tag_ids = {
+            "difficulty_id": current["difficulty"][0],
+            "exercise_type_id": current["exercise_type"][0],
+            "muscle_group_ids": list(current["muscle_group"]),
+        }
+    repos.tag_exercise(db, exercise_id, **tag_ids)
+    autocomplete.add("exercises", exercise_id, exercise.name)
+    return index.describe(db, [exercise_id])[0]
 @app.delete("/exercises/{exercise_id}", status_code=204, tags=["Exercises"])
-def delete_exercise(exercise_id: UUID):
-    _require(exercise_id)
-    del db[exercise_id]
+def delete_exercise(exercise_id: int, db: Session = Depends(get_db)):
+    _require(db, exercise_id)
+    repos.delete_exercise(db, exercise_id)
+    autocomplete.remove("exercises", exercise_id)
 @app.get("/tags/muscle-groups", response_model=list[str], tags=["Tags"])
 def list_muscle_groups():
     return [m.value for m in MuscleGroup]
@@ -117,21 +153,21 @@ def list_difficulties():
 def list_exercise_types():
     return [t.value for t in ExerciseType]
 @app.get("/tags/summary", tags=["Tags"])
-def tag_summary():
-    muscle_counts: dict[str, int] = {m.value: 0 for m in MuscleGroup}
-    difficulty_counts: dict[str, int] = {d.value: 0 for d in Difficulty}
-    type_counts: dict[str, int] = {t.value: 0 for t in ExerciseType}
-    for ex in db.values():
-        for mg in ex.tags.muscle_groups:
-            muscle_counts[mg.value] += 1
-        difficulty_counts[ex.tags.difficulty.value] += 1
-        type_counts[ex.tags.exercise_type.value] += 1
-    return {
-        "total_exercises": len(db),
-        "by_muscle_group": {k: v for k, v in muscle_counts.items() if v > 0},
-        "by_difficulty": {k: v for k, v in difficulty_counts.items() if v > 0},
-        "by_exercise_type": {k: v for k, v in type_counts.items() if v > 0},
-    }
-def _require(exercise_id: UUID):
-    if exercise_id not in db:
+def tag_summary(db: Session = Depends(get_db)):
+    return repos.exercise_tag_summary_counts(db)
+def _index(db: Session) -> ExerciseTagIndex:
+    return exercise_tag_index.ensure_loaded(db)
+def _tag_ids(index: ExerciseTagIndex, tags: TagSet) -> dict:
+    try:
+        return {
+            "difficulty_id": index.resolve("difficulty", [tags.difficulty.value])[0],
+            "exercise_type_id": index.resolve("exercise_type", [tags.exercise_type.value])[0],
+            "muscle_group_ids": index.resolve("muscle_group", [m.value for m in tags.muscle_groups]),
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"{e.args[0]} (are the tag tables seeded?)")
+def _require(db: Session, exercise_id: int) -> ExerciseTagIndex:
+    index = _index(db)
+    if exercise_id not in index:
         raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} not found.")
+    return index
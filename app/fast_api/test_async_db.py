@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core import async_session
+from app.core.async_session import ThreadedSession, async_available, get_async_db, make_async_engine
+from app.core.auth_tokens import create_access_token
+from app.core.db import Accounts, Base, Exercises, Machines, Workouts, workout_exercises
+from app.core.session import make_engine
+from app.fast_api.api import app
+
+
+def _seed(factory):
+    with factory() as session:
+        session.add(Accounts(UserID=1, email="a@example.com", username="a", password_hash="x"))
+        session.add_all([Exercises(ExerciseID=1, name="squat"), Exercises(ExerciseID=2, name="row")])
+        session.add(Machines(MachineID=1, name="barbell"))
+        session.add_all([Workouts(WorkoutID=1, name="legs"), Workouts(WorkoutID=2, name="back")])
+        session.add_all([
+            workout_exercises(WorkoutID=1, ExerciseID=1, MachineID=1, ProfileID=1, sets=5, reps=5, weight=225),
+            workout_exercises(WorkoutID=2, ExerciseID=2, MachineID=1, ProfileID=1, sets=3, reps=10),
+            workout_exercises(WorkoutID=2, ExerciseID=1, MachineID=1, ProfileID=2, sets=1, reps=1),
+        ])
+        session.commit()
+
+
+@pytest.fixture
+def threaded_db(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'async.db'}", pool_size=2, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    _seed(factory)
+
+    async def override():
+        yield ThreadedSession(factory)
+
+    app.dependency_overrides[get_async_db] = override
+    yield
+    app.dependency_overrides.pop(get_async_db, None)
+    engine.dispose()
+
+
+async def _gather(paths, headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.get(p, headers=headers) for p in paths))
+
+
+def test_async_read_endpoints(threaded_db):
+    token = create_access_token(user_id=1)
+    workouts, me, menu, protein = asyncio.run(_gather(
+        ["/workouts/1", "/auth/me", "/meals/menu/nowhere", "/meals/protein/not-a-protein"],
+        headers={"Authorization": f"Bearer {token}"},
+    ))
+    assert [(w["workout_name"], [e["exercise_name"] for e in w["exercises"]]) for w in workouts.json()] == [
+        ("legs", ["squat"]), ("back", ["row"]),
+    ]
+    assert me.json()["username"] == "a"
+    assert menu.json() == [] and protein.json() == []
+
+    bad, = asyncio.run(_gather(["/auth/me"], headers={"Authorization": "Bearer nope"}))
+    assert bad.status_code == 401
+
+
+def test_many_concurrent_reads(threaded_db):
+    responses = asyncio.run(_gather(["/workouts/1"] * 300))
+    assert {r.status_code for r in responses} == {200}
+    assert all(len(r.json()) == 2 for r in responses)
+
+
+def test_fallback_when_async_is_off(monkeypatch):
+    monkeypatch.setenv("DB_ASYNC", "false")
+    monkeypatch.setattr(async_session, "_factory", None)
+    monkeypatch.setattr(async_session, "_engine", None)
+
+    async def first():
+        gen = get_async_db()
+        db = await gen.__anext__()
+        await gen.aclose()
+        return db
+
+    assert isinstance(asyncio.run(first()), ThreadedSession)
+    if not async_available():
+        monkeypatch.setenv("DB_ASYNC", "true")
+        with pytest.raises(RuntimeError, match="no async driver"):
+            async_session.async_enabled()
+
+
+@pytest.mark.skipif(not async_available("sqlite://"), reason="aiosqlite / greenlet not installed")
+def test_async_engine_reads(tmp_path):
+    url = f"sqlite:///{tmp_path / 'aio.db'}"
+    sync = make_engine(url)
+    Base.metadata.create_all(bind=sync)
+    _seed(sessionmaker(bind=sync))
+    sync.dispose()
+
+    async def run():
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        from app.core import async_repos
+
+        engine = make_async_engine(url)
+        try:
+            async with async_sessionmaker(engine)() as db:
+                return await async_repos.workout_rows(db, 1), (await async_repos.lookup_account_by_token(
+                    db, f"Bearer {create_access_token(user_id=1)}")).username
+        finally:
+            await engine.dispose()
+
+    rows, username = asyncio.run(run())
+    assert [r[1] for r in rows] == ["legs", "back"] and username == "a"
@@ -0,0 +1,77 @@
+import random
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.autocomplete import PrefixIndex, autocomplete
+from app.core.db import Base, Accounts, workout_exercises
+from app.core.seed import seed_static
+from app.fast_api.api import app, get_db
+
+
+def test_prefix_index_matches_brute_force_after_edits():
+    rng = random.Random(2)
+    index, names, pops = PrefixIndex(), {}, {}
+    rows = []
+    for i in range(300):
+        names[i] = " ".join(rng.choice(["bench", "band", "bar", "cable", "curl", "row"]) for _ in range(2))
+        pops[i] = rng.randint(0, 5)
+        rows.append((i, names[i], pops[i]))
+    index.extend(rows)
+    for i in range(0, 300, 7):
+        index.bump({i: 3})
+        pops[i] += 3
+    for i in range(1, 300, 11):
+        index.bump({i: -2})
+        pops[i] = max(0, pops[i] - 2)
+    for i in range(2, 300, 13):
+        index.remove(i)
+        del names[i]
+    index.add(1000, "barbell row", 9)
+    names[1000], pops[1000] = "barbell row", 9
+
+    for prefix in ["b", "ba", "bar", "r", "cu", "cable c", "row b"]:
+        expected = sorted(
+            (i for i, n in names.items() if any(w.startswith(prefix) for w in [n[j:] for j in range(len(n)) if j == 0 or n[j - 1] == " "])),
+            key=lambda i: (-pops[i], names[i], i),
+        )[:10]
+        assert [r["id"] for r in index.complete(prefix, 10)] == expected
+
+
+def test_autocomplete_endpoint_ranks_by_usage():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    seed_static(session)
+    session.add(Accounts(email="a@x.com", username="benny", password_hash="x"))
+    session.add_all([
+        workout_exercises(WorkoutID=1, ExerciseID=5, MachineID=2, ProfileID=1, sets=3),   # tricep pushdown
+        workout_exercises(WorkoutID=2, ExerciseID=5, MachineID=2, ProfileID=1, sets=3),
+    ])
+    session.commit()
+
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        autocomplete.load(session)
+        client = TestClient(app)
+        names = [r["name"] for r in client.get("/autocomplete/exercises", params={"q": "p"}).json()]
+        assert names[0] == "tricep pushdown"
+        assert len(names) == 10 and "pull up" in names and "bench press" in names
+        assert all(any(word.startswith("p") for word in n.split()) for n in names)
+
+        assert client.get("/autocomplete/machines", params={"q": "ba"}).json()[0]["name"] == "barbell"
+        assert client.get("/autocomplete/usernames", params={"q": "BEN"}).json()[0]["name"] == "benny"
+        assert client.get("/autocomplete/recipes", params={"q": "x"}).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+        autocomplete.__init__()
+        session.close()
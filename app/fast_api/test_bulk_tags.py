@@ -0,0 +1,114 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import bulk_tags, repos
+from app.core.db import Base, Meals, Exercises, meal_tags, meal_dietary_tags, exercise_muscle_groups
+from app.core.tag_index import meal_tag_index
+from app.core.tag_summary import meal_tag_summary
+from app.fast_api.api import app, get_db
+
+
+def _session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    for populate in (
+        repos.populate_spice_levels, repos.populate_cuisines, repos.populate_complexities,
+        repos.populate_goals, repos.populate_prep_times, repos.populate_cook_times,
+        repos.populate_dietary_tags, repos.populate_muscle_groups, repos.populate_difficulties,
+        repos.populate_exercise_types,
+    ):
+        populate(session)
+    session.add_all([Meals(name=f"meal {i}") for i in range(1, 21)])
+    session.add_all([Exercises(name=f"exercise {i}") for i in range(1, 4)])
+    session.commit()
+    return session
+
+
+def _meal(meal_id, cuisine_id=1, dietary=()):
+    return {
+        "meal_id": meal_id, "spice_level_id": 1, "cuisine_id": cuisine_id, "complexity_id": 1,
+        "goal_id": 1, "prep_time_id": 1, "cook_time_id": 1, "dietary_tag_ids": list(dietary),
+    }
+
+
+def test_bulk_meal_tagging_reports_errors_and_upserts():
+    session = _session()
+    try:
+        meal_tag_index.load(session)
+        repos.tag_meal(session, **_meal(1, cuisine_id=2, dietary=[3]))
+        repos.meal_tag_summary_counts(session)
+
+        items = [_meal(i, dietary=[1, 2]) for i in range(1, 11)]
+        items += [_meal(99), _meal(11, cuisine_id=999), _meal(12, dietary=[1, 404]), _meal(3)]
+        out = bulk_tags.bulk_tag_meals(session, items)
+
+        assert out["tagged"] == 10
+        assert [(e["index"], e["meal_id"]) for e in out["errors"]] == [(10, 99), (11, 11), (12, 12), (13, 3)]
+        assert out["errors"][0]["detail"] == "Meal not found"
+        assert "unknown cuisine_id: 999" in out["errors"][1]["detail"]
+        assert "[404]" in out["errors"][2]["detail"]
+
+        assert session.query(meal_tags).count() == 10
+        assert session.query(meal_tags).filter_by(MealID=1).one().CuisineID == 1
+        assert session.query(meal_dietary_tags).filter_by(MealID=1).count() == 2
+
+        patched = repos.meal_tag_summary_counts(session)
+        meal_tag_summary.invalidate(session)
+        assert patched == repos.meal_tag_summary_counts(session)
+        assert repos.filter_meals_by_tags(session, all_of={"dietary": [1, 2]})["total"] == 10
+    finally:
+        meal_tag_index.__init__()
+        session.close()
+
+
+def test_bulk_exercise_endpoint():
+    session = _session()
+
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        items = [
+            {"exercise_id": 1, "difficulty_id": 1, "exercise_type_id": 1, "muscle_group_ids": [1, 2]},
+            {"exercise_id": 2, "difficulty_id": 2, "exercise_type_id": 2, "muscle_group_ids": [3]},
+            {"exercise_id": 3, "difficulty_id": 9, "exercise_type_id": 1},
+        ]
+        response = client.post("/exercises/tags/bulk", json={"items": items})
+        assert response.status_code == 200
+        assert response.json()["tagged"] == 2
+        assert response.json()["errors"][0]["exercise_id"] == 3
+        assert session.query(exercise_muscle_groups).count() == 3
+    finally:
+        app.dependency_overrides.clear()
+        session.close()
+
+
+def test_bulk_meal_endpoint():
+    session = _session()
+
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        meal_tag_index.load(session)
+        client = TestClient(app)
+        response = client.post("/meals/tags/bulk", json={"items": [_meal(1, dietary=[1]), _meal(2), _meal(99)]})
+        assert response.status_code == 200
+        assert response.json()["tagged"] == 2
+        assert [e["meal_id"] for e in response.json()["errors"]] == [99]
+        assert session.query(meal_tags).count() == 2
+        assert client.get("/meals/filter", params={"dietary_tag": "vegetarian"}).json()["total"] == 1
+    finally:
+        app.dependency_overrides.clear()
+        meal_tag_index.__init__()
+        session.close()
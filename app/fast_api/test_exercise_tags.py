@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base, Exercises, exercise_muscle_groups
+from app.core.seed import seed_static
+from app.core.session import get_db
+from app.core.tag_index import exercise_tag_index
+from app.core.tag_summary import exercise_tag_summary
+from app.fast_api import tags
+
+
+def _client():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    seed_static(session)
+
+    def override_get_db():
+        yield session
+
+    tags.app.dependency_overrides[get_db] = override_get_db
+    exercise_tag_index.load(session)
+    return TestClient(tags.app), session
+
+
+def _body(name, muscles, difficulty="beginner", kind="strength"):
+    return {"name": name, "tags": {"muscle_groups": muscles, "difficulty": difficulty, "exercise_type": kind}}
+
+
+def test_exercises_persist_and_filter_from_index():
+    client, session = _client()
+    try:
+        assert client.get("/tags/summary").json()["by_difficulty"] == {}     # cached now, patched by the writes below
+        squat = client.post("/exercises", json=_body("squat", ["quads", "glutes"])).json()
+        row = client.post("/exercises", json=_body("row", ["back"], "advanced")).json()
+        client.post("/exercises", json=_body("run", ["full_body"], kind="cardio"))
+        assert session.get(Exercises, squat["id"]).name == "squat"
+        assert session.query(exercise_muscle_groups).filter_by(ExerciseID=squat["id"]).count() == 2
+
+        assert [e["name"] for e in client.get("/exercises", params={"muscle_group": "glutes"}).json()] == ["squat"]
+        assert [e["name"] for e in client.get("/exercises", params={"difficulty": "beginner", "exercise_type": "strength"}).json()] == ["squat"]
+
+        patched = client.patch(f"/exercises/{row['id']}", json={"description": "bent over", "tags": _body("", ["back", "biceps"])["tags"]})
+        assert patched.json()["description"] == "bent over"
+        assert [e["name"] for e in client.get("/exercises", params={"muscle_group": "biceps"}).json()] == ["row"]
+
+        assert client.delete(f"/exercises/{squat['id']}").status_code == 204
+        assert client.get(f"/exercises/{squat['id']}").status_code == 404
+        assert session.get(Exercises, squat["id"]) is None
+
+        session.add(Exercises(name="plank"))       # exists, never tagged
+        session.commit()
+        summary = client.get("/tags/summary").json()
+        assert summary["total_exercises"] == session.query(Exercises).count() > 2   # seeded + untagged too
+        assert summary["by_muscle_group"] == {"back": 1, "biceps": 1, "full_body": 1}
+        exercise_tag_summary.invalidate(session)
+        assert client.get("/tags/summary").json() == summary
+
+        # a restart rebuilds the same index from the tables
+        before = client.get("/exercises").json()
+        exercise_tag_index.__init__()
+        assert client.get("/exercises").json() == before
+    finally:
+        tags.app.dependency_overrides.clear()
+        exercise_tag_index.__init__()
+        session.close()
@@ -0,0 +1,129 @@
+import re
+import sqlite3
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base, Profiles, menu_meals
+from app.core.session import make_engine
+from scripts.export_sqlite_to_supabase_sql import export, export_parallel
+
+TRICKY = "Bob's \"big\"\tmeal\nwith a \\ and ;"
+
+
+def _snapshot(path, meals=7):
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    if not meals:
+        return engine.dispose()
+    with sessionmaker(bind=engine)() as session:
+        session.execute(insert(Profiles), [
+            {"ProfileID": i, "age": 30, "weight": 170.5, "height_in": 70, "gender": "male"} for i in range(1, 4)
+        ])
+        session.execute(insert(menu_meals), [
+            {"MenuMealID": i, "restaurant": "KFC", "category": "c", "product": TRICKY if i == 1 else f"item {i}",
+             "protein_g": None if i == 2 else i * 1.5, "chicken": i % 2 == 0, "features": i}
+            for i in range(1, meals + 1)
+        ])
+        session.commit()
+    engine.dispose()
+
+
+def _statements(sql: str, prefix: str) -> list[str]:
+    """complete statements of the dump that start with prefix"""
+    found, buf = [], ""
+    for line in sql.splitlines(keepends=True):
+        if not buf and not line.startswith(prefix):
+            continue
+        buf += line
+        if sqlite3.complete_statement(buf):
+            found.append(buf)
+            buf = ""
+    return found
+
+
+def _rows(db, table):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute(f'SELECT * FROM "{table}" ORDER BY rowid').fetchall()
+    finally:
+        conn.close()
+
+
+def test_insert_export_round_trips(tmp_path):
+    src, out = tmp_path / "forge.db", tmp_path / "out.sql"
+    _snapshot(src)
+    timings = export(src, out, "insert", batch_size=3)
+    assert dict((t, n) for t, n, _ in timings)["menu_meals"] == 7
+
+    sql = out.read_text()
+    inserts = _statements(sql, 'INSERT INTO "menu_meals"')
+    assert len(inserts) == 3                                     # 3 + 3 + 1 rows
+    assert "TRUE" in sql and "FALSE" in sql                     # booleans, not 0 / 1
+
+    dest = tmp_path / "dest.db"
+    _load_inserts(dest, sql)
+    assert _rows(dest, "menu_meals") == _rows(src, "menu_meals")
+    assert _rows(dest, "Profiles") == _rows(src, "Profiles")
+
+
+def _load_inserts(dest, sql):
+    _snapshot(dest, meals=0)
+    conn = sqlite3.connect(dest)
+    for stmt in _statements(sql, "INSERT INTO"):
+        conn.execute(stmt)
+    conn.commit()
+    conn.close()
+
+
+def test_parallel_export_matches_the_serial_one(tmp_path):
+    src, out = tmp_path / "forge.db", tmp_path / "out.sql"
+    _snapshot(src)
+    timings = export_parallel(src, out, "insert", batch_size=2, jobs=2, partition_rows=3)
+    assert {t: n for t, n, _ in timings} == {"Profiles": 3, "menu_meals": 7}
+
+    manifest = out.read_text()
+    includes = re.findall(r"^\\ir (\S+)$", manifest, re.M)
+    assert [Path(i).parent.name for i in includes] == ["out.parts"] * 4
+    tables = [re.match(r"\d+_(\w+)_\d+\.sql", Path(i).name).group(1) for i in includes]
+    assert sorted(tables) == ["Profiles", "menu_meals", "menu_meals", "menu_meals"]
+    order = [t.name for t in Base.metadata.sorted_tables]
+    assert tables == sorted(tables, key=order.index)        # parents before children
+    assert manifest.index("CREATE TABLE") < manifest.index("\\ir") < manifest.index("COMMIT")
+
+    dest = tmp_path / "dest.db"
+    _load_inserts(dest, "".join((tmp_path / i).read_text() for i in includes))
+    assert _rows(dest, "menu_meals") == _rows(src, "menu_meals")
+    assert _rows(dest, "Profiles") == _rows(src, "Profiles")
+
+
+def test_copy_export(tmp_path):
+    src, out = tmp_path / "forge.db", tmp_path / "out.sql"
+    _snapshot(src)
+    export(src, out, "copy", batch_size=5)
+
+    sql = out.read_text()
+    blocks = re.findall(r'COPY "menu_meals" \((.*?)\) FROM STDIN;\n(.*?)\\\.\n', sql, re.S)
+    assert len(blocks) == 2
+    lines = [line for _, body in blocks for line in body.splitlines()]
+    assert len(lines) == 7
+    first = lines[0].split("\t")
+    assert first[3] == "Bob's \"big\"\\tmeal\\nwith a \\\\ and ;"
+    assert lines[1].split("\t")[6] == "\\N"                    # protein_g of meal 2
+    assert {line.split("\t")[-2] for line in lines} == {"t", "f"}
+
+
+def test_snapshot_older_than_the_schema(tmp_path):
+    src, out = tmp_path / "forge.db", tmp_path / "out.sql"
+    _snapshot(src)
+    conn = sqlite3.connect(src)
+    conn.execute('ALTER TABLE "menu_meals" DROP COLUMN "features"')
+    conn.execute('DROP TABLE "profile_macro_goals"')
+    conn.commit()
+    conn.close()
+
+    timings = export(src, out, "copy")
+    assert "profile_macro_goals" not in {t for t, _, _ in timings}
+    body = re.search(r'COPY "menu_meals" .*?\n(.*?)\\\.\n', out.read_text(), re.S).group(1)
+    assert {line.split("\t")[-1] for line in body.splitlines()} == {"0"}
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import macro_goals
+from app.core.db import Accounts, Base, Profiles, profile_macro_goals
+from app.core.macro_store import MacroLogStore
+
+
+def _factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def test_targets_follow_profile_and_goal():
+    male = {"age": 30, "weight": 180, "height_in": 70, "gender": "Male", "health_goals": ""}
+    # Mifflin-St Jeor: 10*81.6 + 6.25*177.8 - 150 + 5 = 1782.5, x1.375 -> 2450
+    assert macro_goals.goals_for(Profiles(**male))["calories"] == 2450
+    cut = macro_goals.goals_for(Profiles(**{**male, "health_goals": "Lose some fat, keep muscle"}))
+    bulk = macro_goals.goals_for(Profiles(**{**male, "health_goals": "build muscle"}))
+    assert (cut["calories"], bulk["calories"]) == (1950, 2750)
+    assert cut["protein"] == round(180 * macro_goals.KG_PER_LB * 2.0)
+    assert abs(cut["protein"] * 4 + cut["carbs"] * 4 + cut["fat"] * 9 - 1950) <= 4     # gram rounding
+    small = macro_goals.goals_for(Profiles(age=80, weight=90, height_in=58, gender="female", health_goals="cut"))
+    assert small["calories"] == macro_goals.MIN_CALORIES
+
+
+def test_recompute_all_pages_and_new_days_start_from_targets():
+    factory = _factory()
+    with factory() as sess:
+        for i in range(1, 8):
+            sess.add(Accounts(UserID=i, email=f"u{i}@x.io", username=f"u{i}", password_hash="x"))
+            sess.add(Profiles(ProfileID=i, age=20 + i, weight=150 + i * 5, height_in=66,
+                              gender="female" if i % 2 else "male", health_goals="muscle gain"))
+        sess.commit()
+        assert macro_goals.recompute_all(sess, chunk=3) == 7
+        assert sess.query(profile_macro_goals).count() == 7
+        expected = macro_goals.goals_for(sess.get(Profiles, 4))
+
+    store = MacroLogStore(factory, background=False)
+    log = store.get_log(4)
+    assert {t.id: t.goal for t in log.trackers} == expected
+    with pytest.raises(KeyError):
+        store.get_log(99)                                           # no profile, nothing to log against
+
+
+def test_stored_goals_recompute_after_a_profile_edit():
+    factory = _factory()
+    with factory() as sess:
+        sess.add(Accounts(UserID=1, email="u1@x.io", username="u1", password_hash="x"))
+        sess.add(Profiles(ProfileID=1, age=30, weight=180, height_in=70, gender="male", health_goals="build muscle"))
+        sess.commit()
+        macro_goals.recompute_all(sess)
+        sess.get(profile_macro_goals, 1).water = 99.0                   # marks which answers come from the table
+        sess.commit()
+        assert macro_goals.stored_goals(sess, 1)["water"] == 99.0
+
+        profile = sess.get(Profiles, 1)
+        profile.weight, profile.health_goals = 220, "cut"
+        sess.commit()
+        assert macro_goals.stored_goals(sess, 1) == macro_goals.goals_for(profile)
+
+        macro_goals.recompute_all(sess)
+        assert sess.get(profile_macro_goals, 1).calories == macro_goals.goals_for(profile)["calories"]
+        assert macro_goals.stored_goals(sess, 1)["water"] != 99.0
+
+
+def test_input_keys_follow_every_input():
+    rows = [(30, 180, 70, "male", "cut"), (30, 180, 70, "Male", "lose fat"), (31, 180, 70, "male", "cut"),
+            (30, 181, 70, "male", "cut"), (30, 180, 71, "male", "cut"), (30, 180, 70, "female", "cut"),
+            (30, 180, 70, "male", "bulk")]
+    keys = macro_goals.input_keys(*macro_goals.encode_rows(rows)).tolist()
+    assert keys[0] == keys[1]                                       # same buckets, same targets
+    assert len(set(keys[1:])) == len(rows) - 1
+    assert keys[:1] == macro_goals.input_keys(*macro_goals.encode_rows(rows[:1])).tolist()
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core.macro_history import MacroHistory
+from app.core.macro_tracker import DailyLog
+
+
+def _rows(start, values, goal=2000.0, direction="under", tracker="calories"):
+    return [
+        SimpleNamespace(log_date=start + timedelta(days=i), tracker_id=tracker, value=v, goal=goal, direction=direction)
+        for i, v in enumerate(values) if v is not None
+    ]
+
+
+def test_masks_match_tracker_semantics():
+    start = date(2026, 3, 2)   # a Monday
+    values = [1800, 2100, 0, 1900, 1950, None, 1700]
+    history = MacroHistory.from_rows(_rows(start, values), start, start + timedelta(days=6))
+    j = history.tracker_ids.index("calories")
+
+    for d, v in enumerate(values):
+        log = DailyLog.default()
+        if v is not None:
+            log.set_goal("calories", 2000, "under")
+            if v:
+                log.log("calories", v)
+        expected = log.get("calories").is_goal_met
+        assert (bool(history.goal_met()[d, j]) if history.verdict()[d, j] else None) == expected
+        assert history.progress_pct()[d, j] == (log.get("calories").progress_pct if v is not None else 0.0)
+
+    # a miss, a zero and an unlogged day all break the streak
+    assert history.logged.tolist() == [True, True, True, True, True, False, True]
+    streaks = history.streaks()
+    assert streaks["longest"][j] == 2 and streaks["current"][j] == 1
+
+
+def test_rollups_and_rolling_mean():
+    start = date(2026, 1, 29)
+    values = [100.0] * 3 + [200.0] * 10
+    history = MacroHistory.from_rows(_rows(start, values, goal=None), start, start + timedelta(days=12))
+    j = history.tracker_ids.index("calories")
+
+    monthly = history.rollup("month")
+    assert monthly["starts"] == ["2026-01-29", "2026-02-01"]
+    assert monthly["mean"][:, j].tolist() == [100.0, 200.0]
+
+    weekly = history.rollup("week")
+    assert weekly["starts"][1] == "2026-02-02"
+    assert weekly["logged_days"] == [4, 7, 2]
+
+    roll = history.rolling_mean(4)[:, j]
+    assert roll[3] == 125.0 and roll[-1] == 200.0
+    summary = history.summary(rolling=4, period="month")
+    assert summary["trackers"]["calories"]["mean"] == round(sum(values) / len(values), 2)
+    assert summary["trackers"]["calories"]["trend_per_day"] > 0
+    assert summary["trackers"]["calories"]["goal_met_rate"] is None
+    assert np.isnan(history.rolling_mean(4)[:, history.tracker_ids.index("water")]).sum() == 0
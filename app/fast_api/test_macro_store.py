@@ -0,0 +1,288 @@
+import threading
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import macro_events as events
+from app.core.db import Accounts, Base, Profiles, daily_macro_logs, macro_events, macro_snapshots
+from app.core.macro_store import MacroLogStore, get_macro_store
+from app.core.meal_nutrients import TRACKERS, menu_nutrients
+from app.core.menu_catalog import load_catalog
+from app.core.session import get_db
+from app.fast_api.api import app
+
+
+def _store():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as sess:
+        sess.add_all(Accounts(UserID=i, email=f"{i}@x.io", username=f"u{i}", password_hash="x") for i in range(1, 10))
+        sess.flush()
+        sess.add_all(Profiles(ProfileID=i, age=30, weight=170, height_in=70, gender="male") for i in range(1, 10))
+        sess.commit()
+    return MacroLogStore(factory, background=False), factory
+
+
+def test_mutations_are_written_behind_in_one_batch():
+    store, factory = _store()
+    store.log(1, "calories", 500)
+    store.log(1, "calories", 250)
+    store.set_goal(1, "protein", 180, "over")
+    store.log(2, "water", 2)
+    with factory() as sess:
+        assert sess.query(daily_macro_logs).count() == 0
+
+    assert store.flush() == 3
+    with factory() as sess:
+        row = sess.query(daily_macro_logs).filter_by(ProfileID=1, tracker_id="calories").one()
+        assert row.value == 750 and row.log_date == date.today()
+        assert sess.query(daily_macro_logs).filter_by(ProfileID=1, tracker_id="protein").one().goal == 180
+    assert store.flush() == 0
+
+    # a new process reads the day back, and the next day starts at zero with the same goals
+    reopened = MacroLogStore(factory, background=False)
+    assert reopened.get_log(1).get("calories").value == 750
+    tomorrow = reopened.get_log(1, date.today() + timedelta(days=1))
+    assert tomorrow.get("calories").value == 0
+    assert tomorrow.get("protein").goal == 180
+
+
+def test_macro_endpoints_and_shutdown_flush():
+    store, factory = _store()
+    app.dependency_overrides[get_macro_store] = lambda: store
+    try:
+        client = TestClient(app)
+        out = client.post("/macros/7/log", json={"tracker_id": "protein", "amount": 40}).json()
+        assert next(t for t in out["trackers"] if t["id"] == "protein")["value"] == 40
+        assert client.post("/macros/7/log", json={"tracker_id": "vitamins", "amount": 1}).status_code == 404
+        client.delete("/macros/7/goals/water")
+        assert client.post("/macros/7/log", json={"tracker_id": "water", "amount": 1}).status_code == 400
+        assert client.put("/macros/7/goals/water", json={"goal": 10}).status_code == 200
+
+        store.close()
+        with factory() as sess:
+            assert sess.query(daily_macro_logs).filter_by(ProfileID=7).count() == 2
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_history_combines_stored_and_cached_days():
+    store, factory = _store()
+    yesterday = date.today() - timedelta(days=1)
+    store.record(3, "log", {"tracker_id": "protein", "amount": 120}, day=yesterday)
+    store.flush()
+    store.log(3, "protein", 60)     # today, still only in the cache
+    store.get_log(3, yesterday - timedelta(days=1))     # opened but nothing logged, not a logged day
+    app.dependency_overrides[get_macro_store] = lambda: store
+    app.dependency_overrides[get_db] = lambda: factory()
+    try:
+        client = TestClient(app)
+        out = client.get("/macros/3/history", params={"days": 3, "rolling": 2}).json()
+        assert out["logged_days"] == 2
+        assert out["trackers"]["protein"]["rolling_mean"] == [None, 120.0, 90.0]
+        assert client.get("/macros/3/history", params={"period": "year"}).status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_log_items_applies_menu_nutrients_in_one_call():
+    catalog = load_catalog()
+    first, second = int(catalog.ids[0]), int(catalog.ids[1])
+    table = menu_nutrients()
+    expected = table.matrix[table.rows([first])][0] * 2 + table.matrix[table.rows([second])][0]
+
+    store, _ = _store()
+    store.clear_goal(5, "sugar")
+    app.dependency_overrides[get_macro_store] = lambda: store
+    try:
+        client = TestClient(app)
+        out = client.post("/macros/5/log-items", json={"items": [
+            {"menu_meal_id": first, "servings": 2}, {"menu_meal_id": second},
+        ]}).json()
+        values = {t["id"]: t["value"] for t in out["trackers"]}
+        assert out["skipped_no_goal"] == ["sugar"]
+        assert values["sugar"] == 0
+        assert abs(values["calories"] - expected[TRACKERS.index("calories")]) < 0.1
+        assert abs(values["sodium"] - expected[TRACKERS.index("sodium")]) < 0.1
+
+        # one unknown id rejects the whole batch
+        bad = client.post("/macros/5/log-items", json={"items": [{"menu_meal_id": first}, {"menu_meal_id": -1}]})
+        assert bad.status_code == 404
+        assert round(store.get_log(5).get("calories").value, 1) == values["calories"]
+        assert client.post("/macros/5/log-items", json={"items": [{"servings": 1}]}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_events_rebuild_undo_and_compaction():
+    store, factory = _store()
+    store.snapshot_every = 3
+    store.log(4, "calories", 500)
+    store.log_many(4, {"calories": 300, "protein": 20})
+    store.flush()
+    store.remove(4, "calories", 100)
+    store.set_goal(4, "water", 12)
+    store.log(4, "water", 2)
+    store.flush()
+    with factory() as sess:
+        # open + 5 entries, snapshots after the first and the second flush
+        assert sess.query(macro_events).filter_by(ProfileID=4).count() == 6
+        assert [s.seq for s in sess.query(macro_snapshots).order_by(macro_snapshots.seq)] == [3, 6]
+
+    # undo walks back over entries only, the goal change stays
+    assert store.undo(4).get("water").value == 0
+    log = store.undo(4)
+    assert log.get("calories").value == 800 and log.get("water").goal == 12
+    log = store.undo(4)
+    assert (log.get("calories").value, log.get("protein").value) == (500, 0)
+    trail = store.audit_trail(4)
+    assert [e["undone"] for e in trail if e["kind"] != "undo"] == [False, True, True, False, True]
+
+    # a new process rebuilds the same state from snapshot + tail
+    store.close()
+    reopened = MacroLogStore(factory, background=False)
+    assert reopened.get_log(4).summary() == log.summary()
+
+    # once the day is old it folds into one final snapshot and still reads back the same
+    with factory() as sess:
+        assert events.compact(sess, date.today() + timedelta(days=1)) == 1
+        sess.commit()
+        snaps = sess.query(macro_snapshots).filter_by(ProfileID=4).all()
+        assert [(s.seq, s.final) for s in snaps] == [(9, True)]
+        assert events.rebuild(sess, 4, date.today()).summary() == log.summary()
+
+
+def test_compaction_runs_in_batches_from_the_newest_final_day():
+    store, factory = _store()
+    store.compact_batch = 2
+    today = date.today()
+    for back in (6, 5, 4, 3):
+        for profile_id in (1, 2):
+            store.record(profile_id, "log", {"tracker_id": "calories", "amount": back}, today - timedelta(days=back))
+    store.flush()
+
+    def finals(sess):
+        return sorted((s.ProfileID, (today - s.log_date).days) for s in sess.query(macro_snapshots).filter_by(final=True))
+
+    with factory() as sess:
+        assert events.compact(sess, today - timedelta(days=5), limit=1) == 1
+        sess.commit()
+        assert finals(sess) == [(1, 6)]
+        # a day older than the newest final one is taken as done and not scanned again
+        sess.execute(macro_snapshots.__table__.delete().where(macro_snapshots.ProfileID == 1))
+        sess.add(macro_snapshots(**events.snapshot_row(2, today - timedelta(days=5), 2, events.rebuild(sess, 2, today - timedelta(days=5)), final=True)))
+        sess.commit()
+        assert events.compacted_through(sess) == today - timedelta(days=5)
+
+    assert store.compact(today - timedelta(days=2)) == 5          # 2 + 2 + 1 over three transactions
+    with factory() as sess:
+        assert finals(sess) == [(1, 3), (1, 4), (1, 5), (2, 3), (2, 4), (2, 5)]
+        assert events.rebuild(sess, 2, today - timedelta(days=3)).get("calories").value == 3
+
+
+def test_compaction_runs_off_the_flusher_thread():
+    store, _ = _store()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_compact(before=None):
+        started.set()
+        release.wait(5)
+        return 0
+
+    store.compact = slow_compact
+    store._start_compaction()
+    assert started.wait(5)
+    assert store._compactor.name == "macro-log-compactor"
+    store.log(1, "calories", 10)
+    assert store.flush() == 1                                     # not held up by the running compaction
+    store._start_compaction()                                     # one at a time
+    release.set()
+    store._compactor.join(5)
+    assert store._compacted == date.today()
+    store.close()
+
+
+def test_unknown_profile_is_rejected_before_anything_is_queued():
+    store, _ = _store()
+    with pytest.raises(KeyError):
+        store.log(404, "calories", 100)
+    assert not store.events and not store.dirty
+    app.dependency_overrides[get_macro_store] = lambda: store
+    try:
+        client = TestClient(app)
+        assert client.get("/macros/404").status_code == 404
+        assert client.post("/macros/404/log", json={"tracker_id": "protein", "amount": 1}).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_one_bad_profile_does_not_block_the_flush():
+    store, factory = _store()
+    store.log(1, "calories", 500)
+    store.log(8, "calories", 300)
+    with factory() as sess:
+        sess.delete(sess.get(Profiles, 8))     # account deleted while its entries were pending
+        sess.commit()
+
+    assert store.flush() == 1
+    with factory() as sess:
+        assert sess.query(daily_macro_logs).filter_by(ProfileID=1).one().value == 500
+        assert sess.query(macro_events).filter_by(ProfileID=8).count() == 0
+    assert [e["kind"] for e in store.quarantined[8]["events"]] == ["open", "log"]
+    assert not store.events and not store.dirty and store.flush() == 0
+    with pytest.raises(KeyError):
+        store.get_log(8)
+
+    # the rest of the store carries on
+    store.log(1, "calories", 1)
+    assert store.flush() == 1
+
+
+def test_record_after_the_day_is_evicted_continues_its_seq():
+    store, factory = _store()
+    yesterday = date.today() - timedelta(days=1)
+    log = store.get_log(2, yesterday)
+    store.record(2, "log", {"tracker_id": "water", "amount": 1}, day=yesterday)
+    store.flush()                           # yesterday, nothing pending: evicted
+    assert (2, yesterday) not in store.logs
+
+    # a caller that fetched the log just before it was evicted must not restart the day at seq 1
+    stale, real = [log], store.get_log
+    store.get_log = lambda profile_id, day=None: stale.pop() if stale else real(profile_id, day)
+    store.record(2, "log", {"tracker_id": "water", "amount": 1}, day=yesterday)
+    store.flush()
+    with factory() as sess:
+        assert [e.seq for e in sess.query(macro_events).filter_by(ProfileID=2).order_by(macro_events.seq)] == [1, 2, 3]
+
+
+def test_loading_one_profile_does_not_block_the_others():
+    store, factory = _store()
+    store.log(1, "calories", 1)
+    gate, loading = threading.Event(), threading.Event()
+
+    def slow_factory():
+        loading.set()
+        gate.wait(5)
+        return factory()
+
+    store.session_factory = slow_factory
+    reader = threading.Thread(target=store.get_log, args=(6,))
+    reader.start()
+    assert loading.wait(5)
+    store.log(1, "calories", 1)             # would wait for the slow load if it held the store lock
+    assert store.get_log(1).get("calories").value == 2
+    assert reader.is_alive()
+    gate.set()
+    reader.join(5)
+    assert (6, date.today()) in store.logs
@@ -0,0 +1,31 @@
+from datetime import date
+
+from app.core.macro_tracker import MACROS, DailyLog, Tracker
+
+
+def test_logs_share_one_schema_and_keep_the_summary_shape():
+    a, b = DailyLog.default(), DailyLog.blank()
+    assert a.schema is b.schema is MACROS
+    assert len(a.data) == 2 * len(MACROS)
+
+    a.log("protein", 52.25)
+    a.clear_goal("water")
+    summary = a.summary()
+    protein = next(t for t in summary["trackers"] if t["id"] == "protein")
+    assert protein == {
+        "id": "protein", "name": "Protein", "unit": "g", "value": 52.2, "goal": 150,
+        "has_goal": True, "direction": "over", "progress_pct": 34.8, "goal_met": False,
+        "status": "97.8g to go",
+    }
+    assert summary["missing_goals"] == ["water"]
+    assert b.summary()["missing_goals"] == list(MACROS.ids)
+
+
+def test_tracker_views_write_through_to_the_log():
+    log = DailyLog(date(2026, 1, 2), [Tracker("a", "A", "g", None), Tracker("b", "B", "mg", 5, "over", 6.0)])
+    log.get("a").set_goal(10.5, "over")
+    log.get("b").direction = "under"
+    assert log.get("a") == Tracker("a", "A", "g", 10.5, "over")
+    assert log.summary()["trackers"][1]["status"] == "1.0mg over"
+    log.reset_all()
+    assert [t.value for t in log.trackers] == [0.0, 0.0]
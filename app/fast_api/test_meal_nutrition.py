@@ -0,0 +1,93 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import repos
+from app.core.db import Base, Ingredients, Meals, ingredient_nutrients, meal_ingredients
+from app.core.meal_nutrition import MealNutrition, meal_nutrition, sparse
+from app.fast_api.api import app, get_db
+
+
+def _session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Meals(MealID=i, name=f"meal {i}") for i in (1, 2, 3)])
+    session.add_all([Ingredients(IngredientID=i, name=n) for i, n in ((1, "rice"), (2, "chicken"), (3, "oil"))])
+    session.add_all([
+        ingredient_nutrients(IngredientID=1, per_grams=100, energy_kcal=130, carbohydrates_g=28, protein_g=2.7),
+        ingredient_nutrients(IngredientID=2, per_grams=100, energy_kcal=165, protein_g=31, total_fat_g=3.6, sodium_mg=74),
+    ])
+    session.add_all([
+        meal_ingredients(MealID=1, IngredientID=1, serving_size=200),
+        meal_ingredients(MealID=1, IngredientID=2, serving_size=150),
+        meal_ingredients(MealID=2, IngredientID=2, serving_size=100),
+        meal_ingredients(MealID=2, IngredientID=3, serving_size=10),
+    ])
+    session.commit()
+    return session
+
+
+@pytest.mark.parametrize("use_scipy", [False] + ([True] if sparse is not None else []))
+def test_totals_and_incremental_updates(use_scipy):
+    session = _session()
+    try:
+        engine = MealNutrition(use_scipy=use_scipy).load(session)
+        bowl = engine.get(1)
+        assert bowl["energy_kcal"] == 2 * 130 + 1.5 * 165
+        assert bowl["protein_g"] == round(2 * 2.7 + 1.5 * 31, 2)
+        assert engine.get(2)["ingredients_missing_nutrients"] == 1      # no data for oil yet
+        with pytest.raises(KeyError):
+            engine.get(3)
+
+        before = engine.totals[engine.meal_row[1]].copy()
+        assert engine.set_ingredient(3, {"energy_kcal": 884, "total_fat_g": 100}) == 1
+        assert engine.get(2)["energy_kcal"] == 165 + 88.4
+        assert engine.get(2)["ingredients_missing_nutrients"] == 0
+        assert (engine.totals[engine.meal_row[1]] == before).all()       # meal 1 has no oil
+
+        engine.set_recipe(3, {1: 100, 3: 5})
+        assert engine.get(3)["energy_kcal"] == round(130 + 44.2, 2)
+        assert engine.table().totals([3, 1], [2, 1])[0] == 2 * (130 + 44.2) + bowl["energy_kcal"]
+    finally:
+        session.close()
+
+
+def test_repos_persist_and_patch_the_shared_engine():
+    session = _session()
+    try:
+        meal_nutrition.load(session)
+        out = repos.set_ingredient_nutrients(session, 2, {"energy_kcal": 120, "protein_g": 25}, per_grams=100)
+        assert out["meals_recomputed"] == 2
+        assert repos.set_meal_ingredients(session, 3, {2: 200})["energy_kcal"] == 240
+        # a fresh load from the tables agrees with the patched cache
+        fresh = MealNutrition().load(session)
+        for meal_id in (1, 2, 3):
+            assert fresh.get(meal_id) == meal_nutrition.get(meal_id)
+    finally:
+        meal_nutrition.loaded = False
+        session.close()
+
+
+def test_empty_ingredient_list_clears_the_recipe():
+    session = _session()
+    try:
+        meal_nutrition.load(session)
+        app.dependency_overrides[get_db] = lambda: session
+        try:
+            res = TestClient(app).put("/meals/1/ingredients", json={"ingredients": []})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+        assert res.status_code == 200
+        assert res.json()["ingredients"] == 0 and res.json()["energy_kcal"] == 0
+        assert session.query(meal_ingredients).filter_by(MealID=1).count() == 0
+        assert 1 not in meal_nutrition.table().ids
+    finally:
+        meal_nutrition.loaded = False
+        session.close()
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import repos
+from app.core.db import Base, Meals, DietaryTags, CuisineTags
+from app.core.tag_index import BitmapIndex, NamedTagIndex, bits_to_ids, meal_tag_index
+from app.fast_api.api import app, get_db
+
+
+def _session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    for populate in (
+        repos.populate_spice_levels, repos.populate_cuisines, repos.populate_complexities,
+        repos.populate_goals, repos.populate_prep_times, repos.populate_cook_times,
+        repos.populate_dietary_tags,
+    ):
+        populate(session)
+    session.add_all([Meals(name=f"meal {i}") for i in range(1, 41)])
+    session.commit()
+    return session
+
+
+def test_bitmap_match_matches_brute_force():
+    rng = random.Random(5)
+    index = BitmapIndex(["cuisine", "dietary"])
+    tags = {}
+    for item in range(1, 300):
+        tags[item] = {"cuisine": [rng.randint(1, 4)], "dietary": rng.sample(range(1, 6), rng.randint(0, 3))}
+        index.set(item, tags[item])
+    index.remove(7)
+    del tags[7]
+
+    bits = index.match(any_of={"cuisine": [1, 3]}, all_of={"dietary": [2]}, none_of={"dietary": [5]})
+    expected = [
+        i for i, t in sorted(tags.items())
+        if t["cuisine"][0] in (1, 3) and 2 in t["dietary"] and 5 not in t["dietary"]
+    ]
+    assert bits_to_ids(bits) == expected
+    assert index.facet_counts(bits)["dietary"][2] == len(expected)
+
+    bulk = BitmapIndex(["cuisine", "dietary"])
+    bulk.set_many(tags)
+    assert (bulk.bitmaps, bulk.universe, bulk.assigned) == (index.bitmaps, index.universe, index.assigned)
+
+
+def test_filter_tracks_tag_and_delete():
+    session = _session()
+    try:
+        meal_tag_index.load(session)
+        cuisine = {row.name: row.CuisineID for row in session.query(CuisineTags)}
+        dietary = {row.name: row.DietaryID for row in session.query(DietaryTags)}
+        for meal_id in range(1, 41):
+            repos.tag_meal(
+                session, meal_id=meal_id, spice_level_id=1,
+                cuisine_id=cuisine["mexican"] if meal_id % 2 else cuisine["italian"],
+                complexity_id=1, goal_id=1, prep_time_id=1, cook_time_id=1,
+                dietary_tag_ids=[dietary["vegan"]] + ([dietary["gluten_free"]] if meal_id % 3 == 0 else []),
+            )
+
+        out = repos.filter_meals_by_tags(
+            session,
+            any_of={"cuisine": [cuisine["mexican"]]},
+            all_of={"dietary": [dietary["vegan"], dietary["gluten_free"]]},
+        )
+        assert [m["meal_id"] for m in out["meals"]] == [3, 9, 15, 21, 27, 33, 39]
+        assert out["meals"][0]["name"] == "meal 3"
+        assert out["facet_counts"]["dietary"] == {"vegan": 7, "gluten_free": 7}
+        page = repos.filter_meals_by_tags(session, any_of={"cuisine": [cuisine["mexican"]]}, limit=5, offset=5)
+        assert page["total"] == 20
+        assert [m["meal_id"] for m in page["meals"]] == [11, 13, 15, 17, 19]
+
+        repos.delete_meal_tags(session, 9)
+        out = repos.filter_meals_by_tags(session, none_of={"dietary": [dietary["gluten_free"]]})
+        assert out["total"] == 40 - 13
+        assert out["facet_counts"]["cuisine"] == {"mexican": 20 - 7, "italian": 20 - 6}
+
+        # a fresh load from the tables agrees with the incrementally maintained index
+        incremental = dict(meal_tag_index.bitmaps["dietary"])
+        lock = meal_tag_index.lock
+        assert meal_tag_index.load(session).bitmaps["dietary"] == incremental
+        assert meal_tag_index.lock is lock          # state is swapped in, the lock readers wait on stays
+    finally:
+        meal_tag_index.__init__()
+        session.close()
+
+
+def test_named_index_requires_load():
+    with pytest.raises(TypeError):
+        NamedTagIndex(["cuisine"])
+
+
+def test_filter_endpoint_is_mounted():
+    session = _session()
+    app.dependency_overrides[get_db] = lambda: session
+    try:
+        client = TestClient(app)
+        assert client.post("/meals/tags", json={
+            "meal_id": 1, "spice_level_id": 1, "cuisine_id": 1, "complexity_id": 1, "goal_id": 1,
+            "prep_time_id": 1, "cook_time_id": 1, "dietary_tag_ids": [],
+        }).status_code == 201
+        out = client.get("/meals/filter", params={"cuisine": "american"}).json()
+        assert [m["meal_id"] for m in out["meals"]] == [1]
+        assert client.get("/meals/filter", params={"cuisine": "martian"}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+        meal_tag_index.__init__()
+        session.close()
@@ -0,0 +1,145 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import ingest_menu_meals, menu_catalog, repos
+from app.core.db import Base, menu_meals
+from app.core.ingest_menu_meals import MENU_MEALS_CSV
+from app.core.meal_nutrients import menu_nutrients
+from app.core.menu_features import (
+    FEATURE_BITS,
+    CompiledRules,
+    decode_features,
+    derive_feature_bits,
+    feature_mask,
+    keyword,
+    regex,
+    threshold,
+)
+
+
+def _session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    repos.populate_menu_meals(session)
+    return session
+
+
+def test_chicken_rules_match_legacy_flag():
+    df = pd.read_csv(MENU_MEALS_CSV)
+    bits = derive_feature_bits(df)
+    chicken = (bits & FEATURE_BITS["chicken"]) != 0
+    assert np.array_equal(chicken, df["chicken"].to_numpy(dtype=bool))
+
+
+def test_rule_kinds_combine():
+    rules = CompiledRules([
+        keyword("spicy", "hot", "spicy", exclude=["chocolate"]),
+        regex("sized", r"\((small|large)\)"),
+        threshold("light", energy_kcal=(None, 300), restaurant="A"),
+        keyword("plain", unless=("spicy",)),
+    ])
+    table = {
+        "restaurant": ["A", "A", "B", "A"],
+        "product": ["Spicy Wrap (Large)", "Hot Chocolate", "Fries (small)", None],
+        "energy_kcal": [250.0, 400.0, 200.0, float("nan")],
+    }
+    bits = rules.evaluate(table)
+    spicy, sized, light, plain = (1 << i for i in range(4))
+    assert list(bits) == [spicy | sized | light, plain, sized | plain, plain]
+
+
+def test_feature_mask_unknown_feature():
+    assert feature_mask("chicken", "low_cal") == FEATURE_BITS["chicken"] | FEATURE_BITS["low_cal"]
+    assert decode_features(feature_mask("beef", "high_protein")) == ["beef", "high_protein"]
+    with pytest.raises(KeyError):
+        feature_mask("unicorn")
+
+
+def test_lookup_by_features_uses_bitmask():
+    session = _session()
+    try:
+        chicken = repos.lookup_menumeal_by_protein(session, "chicken")
+        assert len(chicken) == 311
+        assert all(m.chicken for m in chicken)
+
+        lean = repos.lookup_menumeal_by_features(session, ["chicken", "high_protein"], restaurant="Chick-fil-A")
+        assert lean
+        for m in lean:
+            assert m.restaurant == "Chick-fil-A"
+            assert m.protein_g >= 20
+            assert "chicken" in decode_features(m.features)
+
+        assert repos.lookup_menumeal_by_protein(session, "tofu") == []
+    finally:
+        session.close()
+
+
+def _catalog_table(rows):
+    catalog = menu_catalog.load_catalog()
+    cols = ["MenuMealID", "features", *menu_catalog.TEXT_COLS, *menu_catalog.NUMERIC_COLS]
+    return {c: catalog.column(c)[:rows] for c in cols}
+
+
+def test_snapshot_is_replaced_whole(tmp_path, monkeypatch):
+    path = str(tmp_path / "snap")
+    menu_catalog.write_snapshot(_catalog_table(10), path)
+    with open(os.path.join(path, "pareto.json"), "w") as f:
+        f.write("{}")
+
+    menu_catalog.write_snapshot(_catalog_table(5), path)
+    assert len(menu_catalog.read_snapshot(path)) == 5
+    assert os.path.exists(os.path.join(path, "pareto.json"))        # carried over
+    assert os.listdir(tmp_path) == ["snap"]
+
+    # a write that dies halfway leaves the previous snapshot in place and no temp dirs behind
+    def boom(columns):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(menu_catalog, "_intern", boom)
+    with pytest.raises(RuntimeError):
+        menu_catalog.write_snapshot(_catalog_table(3), path)
+    assert len(menu_catalog.read_snapshot(path)) == 5
+    assert os.listdir(tmp_path) == ["snap"]
+
+
+def test_snapshot_from_other_rules_is_stale(tmp_path, monkeypatch):
+    path = str(tmp_path / "snap")
+    menu_catalog.write_snapshot(_catalog_table(3), path)
+    monkeypatch.setattr(menu_catalog, "rules_digest", lambda: "0" * 16)    # a rule changed, names did not
+    with pytest.raises(ValueError):
+        menu_catalog.read_snapshot(path)
+
+
+def test_rewritten_snapshot_replaces_cached_catalog(tmp_path, monkeypatch):
+    table = _catalog_table(10)
+    path = str(tmp_path / "snap")
+    monkeypatch.setattr(menu_catalog, "SNAPSHOT_DIR", path)
+    menu_catalog.write_snapshot(table, path)
+    assert len(menu_catalog.load_catalog()) == len(menu_nutrients()) == 10
+
+    menu_catalog.write_snapshot({c: v[:4] for c, v in table.items()}, path)
+    assert len(menu_catalog.load_catalog()) == len(menu_nutrients()) == 4
+
+
+def test_stale_snapshot_is_rebuilt(monkeypatch):
+    record = menu_catalog.load_catalog().record(0)
+
+    def stale():
+        raise ValueError("Stale menu snapshot")
+    monkeypatch.setattr(repos, "load_catalog", stale)
+    monkeypatch.setattr(ingest_menu_meals, "ingest_menu_meals", lambda: [record])
+    session = _session()
+    try:
+        assert session.query(menu_meals).one().MenuMealID == record["MenuMealID"]
+    finally:
+        session.close()
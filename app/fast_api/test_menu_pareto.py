@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import menu_catalog, menu_pareto
+from app.core.menu_catalog import load_catalog
+from app.fast_api.api import app
+
+
+def _brute_force_front(values):
+    keep = []
+    for i, v in enumerate(values):
+        dominated = any(
+            np.all(w <= v) and np.any(w < v)
+            for j, w in enumerate(values) if j != i
+        )
+        if not dominated:
+            keep.append(i)
+    return keep
+
+
+def test_pareto_front_matches_brute_force():
+    rng = np.random.default_rng(7)
+    values = rng.integers(0, 12, size=(300, 3)).astype(float)
+    assert sorted(menu_pareto.pareto_front(values)) == _brute_force_front(values)
+
+
+def test_global_front_is_front_of_restaurant_fronts():
+    catalog = load_catalog()
+    index = menu_pareto.build_pareto_index(catalog)
+    rows = np.arange(len(catalog))
+    direct = catalog.ids[menu_pareto._frontier_rows(catalog, menu_pareto.PARETO_AXES, rows)]
+    assert sorted(index["global"]) == sorted(int(i) for i in direct)
+
+
+def test_reingest_only_recomputes_changed_restaurants():
+    catalog = load_catalog()
+    fresh = menu_pareto.build_pareto_index(catalog)
+
+    # a group whose digest still matches is reused verbatim, a changed digest is rebuilt
+    previous = menu_pareto.build_pareto_index(catalog)
+    marker = fresh["groups"]["KFC"]["ids"][::-1]
+    previous["groups"]["KFC"]["ids"] = marker
+    previous["groups"]["Starbucks"]["digest"] = "stale"
+    previous["groups"]["Starbucks"]["ids"] = []
+
+    index = menu_pareto.build_pareto_index(catalog, previous=previous)
+    assert index["groups"]["KFC"]["ids"] == marker
+    assert index["groups"]["Starbucks"]["ids"] == fresh["groups"]["Starbucks"]["ids"]
+
+    # different axes never reuse a stored frontier
+    other_axes = menu_pareto.build_pareto_index(catalog, [("protein_g", "max")], previous=previous)
+    assert other_axes["groups"]["KFC"]["ids"] != marker
+
+
+def test_pareto_endpoint():
+    client = TestClient(app)
+    response = client.get("/meals/pareto", params={"restaurant": "chick-fil-a"})
+    assert response.status_code == 200
+    items = response.json()
+    assert items and all(item["restaurant"] == "Chick-fil-A" for item in items)
+
+    custom = client.get("/meals/pareto", params={"axes": "protein_g:max,sugar_g:min"})
+    assert custom.status_code == 200 and custom.json()
+
+    assert client.get("/meals/pareto", params={"restaurant": "Nowhere"}).status_code == 404
+    assert client.get("/meals/pareto", params={"axes": "flavor:max"}).status_code == 400
+
+
+def test_refresh_replaces_pareto_json_whole(tmp_path, monkeypatch):
+    catalog = load_catalog()
+    path = str(tmp_path / "snap")
+    cols = ["MenuMealID", "features", *menu_catalog.TEXT_COLS, *menu_catalog.NUMERIC_COLS]
+    menu_catalog.write_snapshot({c: catalog.column(c) for c in cols}, path)
+    monkeypatch.setattr(menu_pareto, "SNAPSHOT_DIR", path)
+    first = menu_pareto.refresh_pareto_index(path)
+    assert menu_pareto.load_pareto_index() == json.loads(json.dumps(first))
+
+    def boom(*args, **kwargs):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(menu_pareto.json, "dump", boom)
+    with pytest.raises(RuntimeError):
+        menu_pareto.refresh_pareto_index(path)
+    assert sorted(os.listdir(path)) == sorted(os.listdir(menu_catalog.SNAPSHOT_DIR))   # no temp file left
+    monkeypatch.undo()
+    with open(os.path.join(path, menu_pareto.PARETO_FILE), encoding="utf-8") as f:
+        assert json.load(f) == json.loads(json.dumps(first))                         # old file intact
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import menu_swaps
+from app.core.menu_catalog import load_catalog
+from app.fast_api.api import app
+
+
+def test_swaps_are_strictly_better_and_sorted():
+    space = menu_swaps.get_nutrient_space()
+    kcal = space.axis_values("energy_kcal")
+    row = int(np.nanargmax(kcal))
+    swaps = space.swaps(row, "energy_kcal", k=8, use_tree=False)
+    assert len(swaps) == 8
+    assert all(kcal[s.row] < kcal[row] and s.improvement > 0 for s in swaps)
+    assert [s.distance for s in swaps] == sorted(s.distance for s in swaps)
+
+
+def test_same_category_filter():
+    space = menu_swaps.get_nutrient_space()
+    protein = space.axis_values("protein_g")
+    row = int(np.nanargmin(protein))
+    for s in space.swaps(row, "protein_g", k=5, same_category=True, use_tree=False):
+        assert space.categories[s.row] == space.categories[row]
+        assert protein[s.row] > protein[row]
+
+
+def test_batch_matches_single_queries():
+    space = menu_swaps.get_nutrient_space()
+    rows, dist = space.precompute_swaps("sodium_mg", k=4, jobs=3, block=97)
+    for r in range(0, len(space), 37):
+        single = space.swaps(r, "sodium_mg", k=4, use_tree=False)
+        np.testing.assert_allclose(dist[r, :len(single)], [s.distance for s in single], atol=1e-9)
+        assert (rows[r, len(single):] == -1).all()
+
+
+@pytest.mark.skipif(menu_swaps.cKDTree is None, reason="scipy not installed")
+def test_tree_matches_brute_force():
+    space = menu_swaps.get_nutrient_space()
+    for r in range(0, len(space), 101):
+        brute = space.swaps(r, "energy_kcal", k=5, use_tree=False)
+        tree = space.swaps(r, "energy_kcal", k=5, use_tree=True)
+        np.testing.assert_allclose([s.distance for s in tree], [s.distance for s in brute], atol=1e-9)
+
+
+def test_swap_endpoints():
+    client = TestClient(app)
+    menu_meal_id = int(load_catalog().ids[10])
+
+    response = client.get(f"/meals/menu/{menu_meal_id}/swaps", params={"axis": "protein_g", "k": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert 0 < len(body) <= 3
+    assert all(item["improvement"] > 0 for item in body)
+
+    assert client.get(f"/meals/menu/{menu_meal_id}/swaps", params={"axis": "vibes"}).status_code == 400
+    assert client.get("/meals/menu/999999/swaps").status_code == 404
+
+    table = client.get("/meals/menu/swaps/energy_kcal", params={"k": 2}).json()
+    assert len(table) == len(load_catalog())
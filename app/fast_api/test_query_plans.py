@@ -0,0 +1,197 @@
+"""
+query-plan regression suite: hot endpoints run against a seeded large database, every statement
+they send is captured and EXPLAINed, and a full scan of a large table fails the test.
+Set TEST_POSTGRES_URL to an empty scratch postgres database to run the same checks there.
+"""
+import os
+import re
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.async_session import ThreadedSession, get_async_db
+from app.core.auth_tokens import create_access_token, hash_refresh_token, utcnow
+from app.core.db import (
+    Accounts, Base, Comments, Exercises, Friends, Likes, Machines, Profiles, Workouts, menu_meals, workout_exercises,
+)
+from app.core.session import make_engine
+from app.fast_api.api import app, get_db
+
+ACCOUNTS = 5_000
+WORKOUTS = 2_000
+MENU_MEALS = 4_000
+RESTAURANTS = ["KFC", "Pizza Hut", "Burger King", "Starbucks", "McDonalds", "Dominos", "Chick fil A", "Shake Shack"]
+
+# statements that read a whole table on purpose, (table, pattern in the SQL, why)
+EXPECTED_SCANS = [
+    ("menu_meals", r"features & ", "feature bits are a bitmask, no index can answer an AND over them"),
+    ("menu_meals", r"SELECT DISTINCT menu_meals.restaurant", "index-only pass over the distinct chain names"),
+]
+
+
+def _seed(engine) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Accounts), [
+            {"UserID": i, "email": f"u{i}@x.io", "username": f"u{i}", "password_hash": "x",
+             "refresh_token_hash": hash_refresh_token(f"token-{i}"), "refresh_expires_at": utcnow() + timedelta(days=7)}
+            for i in range(1, ACCOUNTS + 1)
+        ])
+        conn.execute(insert(Profiles), [
+            {"ProfileID": i, "age": 30, "weight": 170, "height_in": 70, "gender": "male"} for i in range(1, ACCOUNTS + 1)
+        ])
+        conn.execute(insert(Exercises), [{"ExerciseID": i, "name": f"exercise {i}"} for i in range(1, 201)])
+        conn.execute(insert(Machines), [{"MachineID": i, "name": f"machine {i}"} for i in range(1, 11)])
+        conn.execute(insert(Workouts), [{"WorkoutID": i, "name": f"workout {i}"} for i in range(1, WORKOUTS + 1)])
+        conn.execute(insert(workout_exercises), [
+            {"ProfileID": p, "WorkoutID": (p * 7 + w) % WORKOUTS + 1, "ExerciseID": e, "MachineID": 1, "sets": 3, "reps": 10}
+            for p in range(1, ACCOUNTS + 1) for w in range(3) for e in (1 + p % 50, 51 + p % 50)
+        ])
+        conn.execute(insert(menu_meals), [
+            {"MenuMealID": i, "restaurant": RESTAURANTS[i % len(RESTAURANTS)], "category": "c",
+             "product": f"{'Chicken ' if i % 3 == 0 else ''}item {i}", "features": i % 16}
+            for i in range(1, MENU_MEALS + 1)
+        ])
+        conn.execute(insert(Friends), [
+            {"ProfileID1": p, "ProfileID2": (p * 13 + k) % ACCOUNTS + 1} for p in range(1, ACCOUNTS + 1) for k in range(4)
+        ])
+        conn.execute(insert(Likes), [{"PostID": i // 7, "ProfileID": i % ACCOUNTS + 1} for i in range(20_000)])
+        conn.execute(insert(Comments), [
+            {"PostID": i // 7, "ProfileID": i % ACCOUNTS + 1, "text": "nice"} for i in range(20_000)
+        ])
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        conn.commit()
+
+
+def _scans(conn, statement: str, params) -> list[str]:
+    """tables a statement reads start to end, from the dialect's plan"""
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params).all()
+        return [
+            m.group(1) for *_, detail in rows
+            if (m := re.match(r'SCAN (?:TABLE )?"?(\w+)"?', detail)) and "USING" not in detail
+        ]
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", params).scalar()
+    found = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan":
+            found.append(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return found
+
+
+def _assert_no_full_scans(engine, captured, large) -> None:
+    problems = []
+    with engine.connect() as conn:
+        for statement, params in captured:
+            for table in _scans(conn, statement, params):
+                if table not in large:
+                    continue
+                if any(t == table and re.search(p, statement) for t, p, _ in EXPECTED_SCANS):
+                    continue
+                problems.append(f"full scan of {table}: {statement}")
+    assert not problems, "\n".join(problems)
+
+
+def _urls():
+    yield "sqlite"
+    if os.getenv("TEST_POSTGRES_URL"):
+        yield "postgres"
+
+
+@pytest.fixture(params=list(_urls()))
+def seeded(request, tmp_path):
+    url = f"sqlite:///{tmp_path / 'plans.db'}" if request.param == "sqlite" else os.environ["TEST_POSTGRES_URL"]
+    engine = make_engine(url)
+    if request.param == "postgres":
+        Base.metadata.drop_all(bind=engine)
+    _seed(engine)
+    factory = sessionmaker(bind=engine)
+
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, params, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            captured.append((statement, params))
+
+    def override_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_async_db():
+        yield ThreadedSession(factory)
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_async_db] = override_async_db
+    yield engine, captured
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+    if request.param == "postgres":
+        Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+LARGE = {"Accounts", "Profiles", "Workouts", "workout_exercises", "menu_meals", "Friends", "Likes", "Comments"}
+
+
+def test_hot_endpoints_use_indexes(seeded):
+    engine, captured = seeded
+    client = TestClient(app, raise_server_exceptions=False)
+    token = create_access_token(user_id=42)
+
+    assert len(client.get("/workouts/42").json()) == 3
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).json()["profile_id"] == 42
+    client.post("/auth/refresh", json={"refresh_token": "token-42"})      # only its lookup matters here
+    assert client.get("/meals/menu/pizza").json()
+    client.get("/meals/protein/chicken")
+    saved = client.post("/workouts", json={
+        "profile_id": 42, "workout_name": "workout 7",
+        "exercises": [{"exercise_id": 1, "machine_id": 1, "sets": 3, "reps": 8}],
+    })
+    assert saved.json()["workout_id"] == 7
+    assert client.delete("/workouts/42/7").status_code == 200
+    assert captured
+
+    _assert_no_full_scans(engine, captured, LARGE)
+
+
+def test_social_access_patterns_use_indexes(seeded):
+    """Friends / Likes / Comments have no endpoints yet, these are the lookups their indexes are for"""
+    engine, _ = seeded
+    statements = [
+        select(Friends.ProfileID1).where(Friends.ProfileID2 == 7),
+        select(Likes.PostID).where(Likes.ProfileID == 7),
+        select(Comments.text).where(Comments.PostID == 7),
+    ]
+    captured = []
+    with engine.connect() as conn:
+        for stmt in statements:
+            compiled = stmt.compile(dialect=conn.dialect)
+            params = tuple(compiled.params.values()) if conn.dialect.paramstyle == "qmark" else compiled.params
+            captured.append((str(compiled), params))
+    _assert_no_full_scans(engine, captured, LARGE)
+
+
+def test_the_check_catches_a_regression(seeded):
+    engine, _ = seeded
+    with engine.connect() as conn:
+        dropped = "DROP INDEX ix_Workouts_name" if conn.dialect.name == "sqlite" else 'DROP INDEX "ix_Workouts_name"'
+        conn.exec_driver_sql(dropped)
+        conn.commit()
+        stmt = select(Workouts).where(Workouts.name == "workout 7").compile(dialect=conn.dialect)
+        params = tuple(stmt.params.values()) if conn.dialect.paramstyle == "qmark" else stmt.params
+        assert _scans(conn, str(stmt), params) == ["Workouts"]
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base, Exercises, menu_meals
+from app.core.menu_features import feature_mask
+from app.core.schema_upgrade import upgrade_schema
+
+
+def test_upgrade_adds_missing_columns_and_backfills(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # the two tables as they were before features / description existed
+        conn.exec_driver_sql('CREATE TABLE "Exercises" ("ExerciseID" INTEGER PRIMARY KEY, name TEXT NOT NULL)')
+        conn.exec_driver_sql(
+            "CREATE TABLE menu_meals (\"MenuMealID\" INTEGER PRIMARY KEY, restaurant TEXT NOT NULL, category TEXT NOT NULL,"
+            " product TEXT NOT NULL, serving_size FLOAT, energy_kcal FLOAT, carbohydrates_g FLOAT, protein_g FLOAT,"
+            " fiber_g FLOAT, sugar_g FLOAT, total_fat_g FLOAT, saturated_fat_g FLOAT, trans_fat_g FLOAT,"
+            " cholesterol_mg FLOAT, sodium_mg FLOAT, chicken BOOLEAN)"
+        )
+        conn.exec_driver_sql('INSERT INTO "Exercises" VALUES (1, \'squat\')')
+        conn.exec_driver_sql(
+            "INSERT INTO menu_meals (\"MenuMealID\", restaurant, category, product, energy_kcal, protein_g) VALUES"
+            " (1, 'KFC', 'Chicken', 'Grilled Chicken Breast', 210, 38), (2, 'Pizza Hut', 'Pizza', 'Cheese Pizza', NULL, NULL)"
+        )
+    Base.metadata.create_all(bind=engine)
+
+    changes = upgrade_schema(engine)
+    assert {"column menu_meals.features", "column Exercises.description"} <= set(changes)
+    assert upgrade_schema(engine) == []
+
+    with sessionmaker(bind=engine)() as sess:
+        assert sess.query(Exercises).one().description is None
+        chicken = sess.query(menu_meals).filter(menu_meals.features.op("&")(feature_mask("chicken")) != 0).all()
+        assert [m.MenuMealID for m in chicken] == [1]
+    assert any(c["name"] == "features" for c in inspect(engine).get_columns("menu_meals"))
+    engine.dispose()
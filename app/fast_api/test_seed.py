@@ -0,0 +1,42 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base, Machines, DietaryTags, seed_versions
+from app.core.seed import seed_static
+from app.core.seed_data import SEED_DATA
+
+
+def _engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def test_seed_is_set_based_and_versioned():
+    engine = _engine()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session = sessionmaker(bind=engine)()
+    try:
+        assert seed_static(session) is True
+        # version lookup, then one SELECT + one INSERT per table, then the version row
+        assert len(statements) <= 2 * len(SEED_DATA) + 3
+        assert session.query(Machines).filter_by(name="dumbbell").count() == 1
+        assert session.query(DietaryTags).count() == len(SEED_DATA[DietaryTags])
+
+        statements.clear()
+        assert seed_static(session) is False
+        assert len(statements) == 1
+
+        session.query(DietaryTags).filter_by(name="kosher").delete()
+        session.commit()
+        assert seed_static(session, force=True) is True
+        assert session.query(DietaryTags).filter_by(name="kosher").count() == 1
+        assert session.query(seed_versions).count() == 1
+    finally:
+        session.close()
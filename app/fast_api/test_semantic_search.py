@@ -0,0 +1,132 @@
+from pathlib import Path
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import semantic_search as ss
+from app.core.db import Base, Meals
+from app.core.meal_nutrients import NutrientTable
+from app.core.meal_nutrition import NUTRIENTS, meal_nutrition
+from app.fast_api.api import app, get_db
+
+
+def _session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    session.add_all([Meals(name="spicy chicken burrito bowl"), Meals(name="oatmeal")])
+    session.commit()
+    return session
+
+
+def test_parse_query_extracts_nutrient_filters():
+    parsed = ss.parse_query("spicy chicken under 500 calories with at least 30g protein")
+    assert parsed.text == "spicy chicken with"
+    assert parsed.filters == [("energy_kcal", "<=", 500.0), ("protein_g", ">=", 30.0)]
+    assert ss.parse_query("wrap < 400 calories").filters == [("energy_kcal", "<=", 400.0)]
+    assert ss.parse_query("bowl >30g protein").filters == [("protein_g", ">=", 30.0)]
+    assert ss.parse_query("thunder 5 calories").filters == []
+
+
+def test_embedding_cache_round_trip(tmp_path):
+    cache = ss.EmbeddingCache(str(tmp_path / "cache.db"))
+    calls = []
+
+    class CountingEmbedder(ss.HashingEmbedder):
+        def embed(self, texts):
+            calls.append(list(texts))
+            return super().embed(texts)
+
+    embedder = ss.CachedEmbedder(CountingEmbedder(64), cache)
+    first = embedder.embed(["big mac", "fries"])
+    second = embedder.embed(["fries", "big mac", "nuggets"])
+    assert calls == [["big mac", "fries"], ["nuggets"]]
+    np.testing.assert_allclose(second[:2], first[::-1])
+
+    reopened = ss.CachedEmbedder(CountingEmbedder(64), ss.EmbeddingCache(str(tmp_path / "cache.db")))
+    reopened.embed(["big mac"])
+    assert len(calls) == 2
+
+
+def test_ivf_recall_against_exact():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(2000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact = ss.BruteForceIndex(vectors)
+    ivf = ss.IVFIndex(vectors, nlist=20, nprobe=8)
+    hits = 0
+    for q in vectors[:50]:
+        truth = set(exact.search(q, 10)[0])
+        hits += len(truth & set(ivf.search(q, 10)[0]))
+    assert hits / 500 >= 0.8
+
+    allowed = np.zeros(len(vectors), dtype=bool)
+    allowed[:3] = True
+    assert sorted(ivf.search(vectors[500], 10, allowed)[0]) == [0, 1, 2]
+
+
+def test_search_combines_text_and_filters(tmp_path):
+    session = _session()
+    try:
+        engine = ss.build_search(
+            session, cache=ss.EmbeddingCache(str(tmp_path / "cache.db")), meals=NutrientTable([], np.zeros((0, 7))),
+        )
+        for mode in ("exact", "ivf"):
+            out = engine.search("chicken nuggets under 400 calories", k=10, mode=mode)
+            assert out["filters"] == [["energy_kcal", "<=", 400.0]]
+            assert len(out["results"]) == 10
+            for item in out["results"]:
+                assert item["energy_kcal"] <= 400
+            assert any("nugget" in item["name"].lower() for item in out["results"][:3])
+
+        meal = engine.search("spicy chicken burrito", k=3)
+        assert meal["results"][0] == {**meal["results"][0], "kind": "meal", "name": "spicy chicken burrito bowl"}
+    finally:
+        session.close()
+
+
+def test_homemade_meals_pass_nutrient_filters(tmp_path):
+    session = _session()
+    try:
+        bowl = np.zeros(len(NUTRIENTS))
+        bowl[NUTRIENTS.index("energy_kcal")], bowl[NUTRIENTS.index("protein_g")] = 650, 45
+        meals = NutrientTable([1], bowl[None, :], label="MealID")      # oatmeal (2) has no recipe
+        engine = ss.build_search(session, cache=ss.EmbeddingCache(str(tmp_path / "cache.db")), meals=meals)
+
+        out = engine.search("spicy chicken burrito at least 40g protein", k=5)
+        assert out["results"][0]["kind"] == "meal" and out["results"][0]["protein_g"] == 45
+        assert all(r["kind"] != "meal" for r in engine.search("spicy chicken burrito < 600 calories", k=5)["results"])
+        assert all(r["id"] != 2 or r["kind"] != "meal" for r in engine.search("oatmeal under 900 calories")["results"])
+    finally:
+        session.close()
+
+
+def test_search_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEARCH_CACHE_PATH", str(tmp_path / "cache.db"))
+    session = _session()
+
+    def override_get_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        response = client.get("/search/meals", params={"q": "iced coffee", "k": 5})
+        assert response.status_code == 200
+        assert len(response.json()["results"]) == 5
+        assert client.get("/search/meals", params={"q": "coffee", "mode": "hnsw"}).status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+        meal_nutrition.loaded = False
+        session.close()
+
+
+def test_cache_path_does_not_depend_on_the_working_directory():
+    assert ss.CACHE_PATH == str(Path(ss.__file__).resolve().parent / "embedding_cache.db")
@@ -0,0 +1,67 @@
+import importlib
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+
+from app.core import seed, session
+from app.core.session import TimedQueuePool, make_engine, pool_stats, sqlite_pragmas
+
+
+def test_one_engine_shared_by_every_module():
+    assert seed.engine is session.engine
+    assert seed.SessionLocal is session.SessionLocal
+    meal_tags = importlib.import_module("app.fast_api.meal_tags")
+    assert meal_tags.get_session is session.get_db
+
+
+def test_pool_settings_and_live_stats(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "1")
+    engine = make_engine(f"sqlite:///{tmp_path / 'pool.db'}", pool_timeout=0.05)
+    try:
+        assert isinstance(engine.pool, TimedQueuePool)
+        held = [engine.connect() for _ in range(3)]
+        stats = pool_stats(engine)
+        assert (stats["size"], stats["checked_out"], stats["overflow"], stats["max_overflow"]) == (2, 3, 1, 1)
+
+        with pytest.raises(PoolTimeout):
+            engine.connect()
+        stats = pool_stats(engine)
+        assert stats["timeouts"] == 1 and stats["wait_ms_max"] >= 40
+
+        for conn in held:
+            conn.close()
+        assert pool_stats(engine)["checked_out"] == 0
+    finally:
+        engine.dispose()
+
+
+def test_sqlite_statement_timeout(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'slow.db'}", statement_timeout_ms=50)
+    slow = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c")
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError, match="interrupted"):
+                conn.execute(slow)
+            assert conn.execute(text("SELECT 1")).scalar() == 1     # next statement gets a fresh deadline
+    finally:
+        engine.dispose()
+
+
+def test_sqlite_performance_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_SQLITE_SYNCHRONOUS", "full")
+    pragmas = ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "temp_store")
+    fast = make_engine(f"sqlite:///{tmp_path / 'fast.db'}", sqlite_pragmas={"mmap_size": 0})
+    plain = make_engine(f"sqlite:///{tmp_path / 'plain.db'}", sqlite_performance=False)
+    try:
+        with fast.connect() as conn:
+            assert [conn.execute(text(f"PRAGMA {p}")).scalar() for p in pragmas] == ["wal", 2, 5000, 0, 2]
+        with plain.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+    finally:
+        fast.dispose()
+        plain.dispose()
+
+    with pytest.raises(ValueError, match="synchronous"):
+        sqlite_pragmas(synchronous="sometimes")
@@ -0,0 +1,73 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import repos
+from app.core.db import Base, Meals, Exercises
+from app.core.tag_summary import exercise_tag_summary, meal_tag_summary
+
+
+def _session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    for populate in (
+        repos.populate_spice_levels, repos.populate_cuisines, repos.populate_complexities,
+        repos.populate_goals, repos.populate_prep_times, repos.populate_cook_times,
+        repos.populate_dietary_tags, repos.populate_muscle_groups, repos.populate_difficulties,
+        repos.populate_exercise_types,
+    ):
+        populate(session)
+    session.add_all([Meals(name=f"meal {i}") for i in range(1, 6)])
+    session.add_all([Exercises(name=f"exercise {i}") for i in range(1, 4)])
+    session.commit()
+    return session
+
+
+def _tag(session, meal_id, cuisine_id, dietary):
+    repos.tag_meal(
+        session, meal_id=meal_id, spice_level_id=1, cuisine_id=cuisine_id, complexity_id=1,
+        goal_id=1, prep_time_id=1, cook_time_id=1, dietary_tag_ids=dietary,
+    )
+
+
+def test_meal_summary_is_patched_on_writes():
+    session = _session()
+    try:
+        _tag(session, 1, 1, [1, 2])
+        _tag(session, 2, 1, [2])
+        summary = repos.meal_tag_summary_counts(session)
+        assert summary["total_meals"] == 5
+        assert summary["by_cuisine"] == {"american": 2}
+        assert summary["by_dietary"] == {"vegetarian": 1, "vegan": 2}
+
+        _tag(session, 2, 2, [])
+        _tag(session, 3, 3, [1])
+        repos.delete_meal_tags(session, 1)
+        patched = repos.meal_tag_summary_counts(session)
+        meal_tag_summary.invalidate(session)
+        assert patched == repos.meal_tag_summary_counts(session)
+        assert patched["by_cuisine"] == {"italian": 1, "mexican": 1}
+        assert patched["by_dietary"] == {"vegetarian": 1}
+    finally:
+        session.close()
+
+
+def test_exercise_summary_is_patched_on_writes():
+    session = _session()
+    try:
+        repos.tag_exercise(session, 1, difficulty_id=1, exercise_type_id=1, muscle_group_ids=[1, 2])
+        assert repos.exercise_tag_summary_counts(session)["by_difficulty"] == {"beginner": 1}
+        repos.tag_exercise(session, 1, difficulty_id=2, exercise_type_id=1, muscle_group_ids=[2])
+        patched = repos.exercise_tag_summary_counts(session)
+        exercise_tag_summary.invalidate(session)
+        assert patched == repos.exercise_tag_summary_counts(session)
+        assert patched["by_difficulty"] == {"intermediate": 1}
+        assert patched["total_exercises"] == 3
+    finally:
+        session.close()
+
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Per-keystroke latency of the autocomplete index.
+
+Builds a PrefixIndex over --names synthetic usernames with random popularity, then
+types a set of random queries one character at a time.
+
+Usage:
+  python3 scripts/bench_autocomplete.py --names 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.core.autocomplete import PrefixIndex
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(args.names)]
+    rows = [(i, f"{w}{rng.randint(0, 99)}", int(rng.paretovariate(1.2))) for i, w in enumerate(words)]
+
+    t = time.perf_counter()
+    index = PrefixIndex()
+    index.extend(rows)
+    print(f"built {len(index)} names in {time.perf_counter() - t:.2f}s")
+
+    typed = [rng.choice(words)[: rng.randint(3, 8)] for _ in range(args.queries)]
+    keystrokes, worst = 0, 0.0
+    t = time.perf_counter()
+    for query in typed:
+        for n in range(1, len(query) + 1):
+            s = time.perf_counter()
+            index.complete(query[:n], 10)
+            worst = max(worst, time.perf_counter() - s)
+            keystrokes += 1
+    total = time.perf_counter() - t
+    print(f"{keystrokes} keystrokes: {total / keystrokes * 1e6:.0f} us mean, {worst * 1e3:.2f} ms worst")
+
+    t = time.perf_counter()
+    for i in range(1000):
+        index.add(args.names + i, f"newuser{i}")
+    print(f"incremental add: {(time.perf_counter() - t) / 1000 * 1e6:.0f} us/name")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tagging N meals: one repos.tag_meal call (and commit) per meal vs one bulk_tag_meals call.
+
+Runs against a throwaway sqlite file so commits hit the disk like a real deployment.
+
+Usage:
+  python3 scripts/bench_bulk_tagging.py --items 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import bulk_tags, repos
+from app.core.db import Base, Meals
+
+
+def fresh_session(path: Path, items: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    sess = sessionmaker(bind=engine)()
+    for populate in (
+        repos.populate_spice_levels, repos.populate_cuisines, repos.populate_complexities,
+        repos.populate_goals, repos.populate_prep_times, repos.populate_cook_times,
+        repos.populate_dietary_tags,
+    ):
+        populate(sess)
+    sess.add_all([Meals(name=f"meal {i}") for i in range(items)])
+    sess.commit()
+    return sess
+
+
+def payload(items: int) -> list[dict]:
+    return [
+        {
+            "meal_id": i + 1, "spice_level_id": 1 + i % 4, "cuisine_id": 1 + i % 8,
+            "complexity_id": 1 + i % 3, "goal_id": 1 + i % 3, "prep_time_id": 1 + i % 3,
+            "cook_time_id": 1 + i % 3, "dietary_tag_ids": [1 + i % 9, 1 + (i + 3) % 9],
+        }
+        for i in range(items)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--single-items", type=int, default=1_000,
+                        help="items for the one-by-one run (it is extrapolated to --items)")
+    args = parser.parse_args()
+    items = payload(args.items)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sess = fresh_session(Path(tmp) / "single.db", args.items)
+        t = time.perf_counter()
+        for item in items[:args.single_items]:
+            repos.tag_meal(sess, **item)
+        single = (time.perf_counter() - t) / args.single_items
+        sess.close()
+
+        sess = fresh_session(Path(tmp) / "bulk.db", args.items)
+        t = time.perf_counter()
+        out = bulk_tags.bulk_tag_meals(sess, items)
+        bulk = time.perf_counter() - t
+        sess.close()
+
+    print(f"one by one: {single * 1000:.2f} ms/item, ~{single * args.items:.1f}s for {args.items}")
+    print(f"bulk:       {bulk:.2f}s for {out['tagged']} items ({len(out['errors'])} errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Nightly goal recompute at scale.
+
+Times compute_goals over --profiles synthetic profile columns, then (with --db)
+loads --db-profiles rows into a throwaway sqlite file and times recompute_all
+end to end: keyset paging, text classification, numpy, bulk upsert.
+
+Usage:
+  python3 scripts/bench_macro_goals.py --profiles 1000000 --db-profiles 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core import macro_goals
+from app.core.db import Accounts, Base, Profiles
+
+GENDERS = ["male", "female", "Male", "F", "nonbinary", ""]
+GOAL_TEXT = ["lose weight", "build muscle", "", "stay healthy", "cut for summer", "gain mass"]
+
+
+def _columns(n: int, rng: np.random.Generator) -> dict:
+    return {
+        "age": rng.integers(16, 80, n),
+        "weight": rng.integers(100, 300, n),
+        "height_in": rng.integers(58, 78, n),
+        "gender": rng.choice(GENDERS, n),
+        "health_goals": rng.choice(GOAL_TEXT, n),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", type=int, default=1_000_000)
+    parser.add_argument("--db-profiles", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    cols = _columns(args.profiles, rng)
+    t0 = time.perf_counter()
+    gender = macro_goals._codes(cols["gender"], macro_goals.gender_code, tuple(macro_goals.GENDER_OFFSET))
+    goal = macro_goals._codes(cols["health_goals"], macro_goals.goal_code, macro_goals.GOALS)
+    t1 = time.perf_counter()
+    macro_goals.compute_goals(cols["age"], cols["weight"], cols["height_in"], gender, goal)
+    t2 = time.perf_counter()
+    macro_goals.input_keys(cols["age"], cols["weight"], cols["height_in"], gender, goal)
+    t3 = time.perf_counter()
+    print(f"{args.profiles} profiles: classify {t1 - t0:.2f}s, compute {t2 - t1:.3f}s, input keys {t3 - t2:.3f}s")
+
+    if not args.db_profiles:
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        n = args.db_profiles
+        cols = _columns(n, rng)
+        with engine.begin() as conn:
+            conn.execute(insert(Accounts), [
+                {"UserID": i, "email": f"{i}@x", "username": f"u{i}", "password_hash": "x"} for i in range(1, n + 1)
+            ])
+            conn.execute(insert(Profiles), [
+                {"ProfileID": i + 1, **{k: (v[i].item() if hasattr(v[i], "item") else v[i]) for k, v in cols.items()}}
+                for i in range(n)
+            ])
+        with sessionmaker(bind=engine)() as sess:
+            t0 = time.perf_counter()
+            done = macro_goals.recompute_all(sess)
+            elapsed = time.perf_counter() - t0
+        print(f"recompute_all on sqlite: {done} profiles in {elapsed:.2f}s ({done / elapsed:,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cost of summarizing a profile's macro history.
+
+Builds --days of random daily logs for every default tracker (a few days skipped,
+goals on most trackers) and times the vectorized pieces and the full summary().
+
+Usage:
+  python3 scripts/bench_macro_history.py --days 365
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.core.macro_history import MacroHistory, TRACKER_IDS
+
+
+def _history(days: int, seed: int) -> MacroHistory:
+    rng = np.random.default_rng(seed)
+    start = date.today() - timedelta(days=days - 1)
+    n = len(TRACKER_IDS)
+    values = rng.uniform(0, 200, size=(days, n))
+    goals = np.where(rng.random(n) < 0.8, rng.uniform(50, 150, size=n), np.nan)
+    logged = rng.random(days) < 0.9
+    values[~logged] = 0
+    return MacroHistory(
+        start, TRACKER_IDS, values, np.tile(goals, (days, 1)),
+        rng.random(n) < 0.5, logged,
+    )
+
+
+def _time(label: str, fn, repeat: int) -> None:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"{label:<16} {(time.perf_counter() - t0) / repeat * 1e6:8.1f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    h = _history(args.days, args.seed)
+    print(f"{args.days} days x {len(TRACKER_IDS)} trackers")
+    # a fresh copy each time, so the cached goal masks are rebuilt
+    fresh = lambda: dataclasses.replace(h)
+    _time("goal_met", lambda: fresh().goal_met(), args.repeat)
+    _time("progress_pct", h.progress_pct, args.repeat)
+    _time("rolling_mean(7)", lambda: h.rolling_mean(7), args.repeat)
+    _time("rollup(week)", lambda: h.rollup("week"), args.repeat)
+    _time("rollup(month)", lambda: h.rollup("month"), args.repeat)
+    _time("streaks", lambda: fresh().streaks(), args.repeat)
+    _time("aggregates", lambda: fresh().summary(series=False), args.repeat)
+    _time("with series", lambda: fresh().summary(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
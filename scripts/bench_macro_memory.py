@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Memory per DailyLog and the cost of the hot operations.
+
+Builds --logs default logs (two trackers logged on each), measures the traced
+allocation per log, then times log() and summary() on one of them.
+
+Usage:
+  python3 scripts/bench_macro_memory.py --logs 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import timeit
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.core.macro_tracker import DailyLog
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs", type=int, default=100_000)
+    args = parser.parse_args()
+
+    day = date.today()
+    tracemalloc.start()
+    logs = []
+    for _ in range(args.logs):
+        log = DailyLog.default()
+        log.log_date = day
+        log.log("calories", 123.5)
+        log.log("protein", 40.25)
+        logs.append(log)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{args.logs} logs: {current / args.logs:.0f} B/log "
+          f"({current / args.logs * 30e6 / 2**30:.1f} GiB for 1M users x 30 days)")
+
+    log = logs[0]
+    n = 100_000
+    print(f"log()     {timeit.timeit(lambda: log.log('calories', 1.0), number=n) / n * 1e6:.2f} us")
+    print(f"summary() {timeit.timeit(log.summary, number=n // 10) / (n // 10) * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
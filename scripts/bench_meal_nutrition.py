@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Meal nutrition as a sparse product.
+
+Builds --meals random recipes over --ingredients ingredients (about --per-meal each),
+times the full meals x ingredients product, then one ingredient update, which only
+recomputes the meals that use it.
+
+Usage:
+  python3 scripts/bench_meal_nutrition.py --meals 100000 --ingredients 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.core.meal_nutrition import NUTRIENTS, MealNutrition, sparse
+
+
+def _engine(args, use_scipy: bool) -> MealNutrition:
+    rng = np.random.default_rng(args.seed)
+    engine = MealNutrition(use_scipy=use_scipy)
+    for i in range(args.ingredients):
+        engine._set_nutrients(i, rng.uniform(0, 5, len(NUTRIENTS)))
+    # a few common ingredients (salt, oil, ...) show up in many recipes
+    weights = 1.0 / np.arange(1, args.ingredients + 1)
+    weights /= weights.sum()
+    for m in range(args.meals):
+        r = engine._row(m)
+        cols = rng.choice(args.ingredients, size=rng.integers(2, 2 * args.per_meal), replace=False, p=weights)
+        engine.recipes[r] = {int(c): float(g) for c, g in zip(cols, rng.uniform(5, 300, len(cols)))}
+        for c in engine.recipes[r]:
+            engine.used_in[c].add(r)
+    engine.loaded = True
+    return engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meals", type=int, default=100_000)
+    parser.add_argument("--ingredients", type=int, default=5_000)
+    parser.add_argument("--per-meal", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for use_scipy in ([True] if sparse is not None else []) + [False]:
+        engine = _engine(args, use_scipy)
+        label = "scipy.sparse" if use_scipy else "numpy"
+        t0 = time.perf_counter()
+        engine._recompute(np.arange(args.meals))
+        full = time.perf_counter() - t0
+
+        rare = args.ingredients - 1
+        t0 = time.perf_counter()
+        n_rare = engine.set_ingredient(rare, {n: 1.0 for n in NUTRIENTS})
+        one_rare = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        n_common = engine.set_ingredient(0, {n: 1.0 for n in NUTRIENTS})
+        one_common = time.perf_counter() - t0
+        print(f"{label:<13} all {args.meals} meals {full * 1e3:8.1f} ms | "
+              f"rare ingredient ({n_rare} meals) {one_rare * 1e3:6.2f} ms | "
+              f"common ingredient ({n_common} meals) {one_common * 1e3:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Compare cold-start catalog load: menu_meals.csv through pandas vs the binary snapshot.
+
+Each measurement runs in a fresh interpreter so import cost is included.
+
+Usage:
+  python3 scripts/bench_menu_catalog.py --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CSV_LOAD = """
+import time
+t = time.perf_counter()
+from app.core.ingest_menu_meals import ingest_menu_meals
+rows = ingest_menu_meals(snapshot=False)
+print(time.perf_counter() - t, len(rows), int("pandas" in __import__("sys").modules))
+"""
+
+SNAPSHOT_LOAD = """
+import time
+t = time.perf_counter()
+from app.core.menu_catalog import load_catalog
+catalog = load_catalog()
+energy = catalog.column("energy_kcal")
+print(time.perf_counter() - t, len(catalog), int("pandas" in __import__("sys").modules))
+"""
+
+SNAPSHOT_ONLY = """
+import time
+import numpy
+t = time.perf_counter()
+from app.core.menu_catalog import load_catalog
+catalog = load_catalog()
+energy = catalog.column("energy_kcal")
+print(time.perf_counter() - t, len(catalog), int("pandas" in __import__("sys").modules))
+"""
+
+SNAPSHOT_RECORDS = """
+import time
+t = time.perf_counter()
+from app.core.menu_catalog import load_catalog
+rows = load_catalog().records()
+print(time.perf_counter() - t, len(rows), int("pandas" in __import__("sys").modules))
+"""
+
+
+def run(code: str, runs: int) -> tuple[float, int, bool]:
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout.split()
+        times.append(float(out[0]))
+    return statistics.median(times), int(out[1]), out[2] == "1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("csv + pandas (records)", CSV_LOAD),
+        ("snapshot (columns)", SNAPSHOT_LOAD),
+        ("snapshot, numpy warm", SNAPSHOT_ONLY),
+        ("snapshot (records)", SNAPSHOT_RECORDS),
+    ]
+    print(f"median of {args.runs} cold starts")
+    for name, code in cases:
+        seconds, rows, pandas_loaded = run(code, args.runs)
+        print(f"- {name:<24} {seconds * 1000:8.1f} ms  rows={rows}  pandas imported={pandas_loaded}")
+
+
+if __name__ == "__main__":
+    main()
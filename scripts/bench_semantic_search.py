@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of the semantic meal search: exact (brute force) vs IVF.
+
+The menu catalog is replicated with one word dropped and one random catalog word added
+per copy until it reaches --docs rows, then a fixed set of queries is run against both
+indexes. Recall@k counts approximate hits scoring at least the exact k-th best score,
+so ties between near-identical copies are not penalized.
+
+Usage:
+  python3 scripts/bench_semantic_search.py --docs 100000 --k 10 --nprobe 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.core import semantic_search as ss
+from app.core.menu_catalog import load_catalog
+
+QUERIES = [
+    "spicy chicken under 500 calories",
+    "iced coffee",
+    "cheeseburger",
+    "vegetarian pizza",
+    "chicken nuggets",
+    "chocolate shake",
+    "grilled chicken salad under 400 calories",
+    "breakfast sandwich with egg",
+    "fries",
+    "high protein wrap at least 30g protein",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    base = ss.menu_docs(catalog)
+    base_nutrients = np.column_stack([catalog.column(c) for c in ss.FILTER_COLS])
+
+    rng = np.random.default_rng(0)
+    vocab = sorted({w for d in base for w in d.text.split()})
+    docs, rows = [], []
+    while len(docs) < args.docs:
+        for r, d in enumerate(base):
+            words = d.text.split()
+            if len(docs) >= len(base):
+                words.pop(int(rng.integers(len(words))))
+                words.append(vocab[int(rng.integers(len(vocab)))])
+            docs.append(ss.SearchDoc("menu", len(docs), d.name, " ".join(words)))
+            rows.append(r)
+            if len(docs) == args.docs:
+                break
+    nutrients = base_nutrients[rows]
+
+    embedder = ss.HashingEmbedder().fit([d.text for d in base])
+    t = time.perf_counter()
+    engine = ss.SemanticSearch(docs, nutrients, embedder)
+    print(f"embedded {len(docs)} docs in {time.perf_counter() - t:.2f}s")
+
+    t = time.perf_counter()
+    exact = engine.index("exact")
+    ivf = ss.IVFIndex(engine.vectors, nlist=args.nlist, nprobe=args.nprobe)
+    engine._indexes["ivf"] = ivf
+    print(f"built IVF (nlist={ivf.nlist}, nprobe={ivf.nprobe}) in {time.perf_counter() - t:.2f}s")
+
+    queries = [ss.parse_query(q) for q in QUERIES]
+    vectors = [embedder.embed([p.text])[0] for p in queries]
+    masks = [engine.allowed(p.filters) for p in queries]
+
+    def timed(index) -> tuple[float, list[np.ndarray]]:
+        scores = [index.search(v, args.k, m)[1] for v, m in zip(vectors, masks)]
+        t = time.perf_counter()
+        for _ in range(args.repeat):
+            for v, m in zip(vectors, masks):
+                index.search(v, args.k, m)
+        return (time.perf_counter() - t) / (args.repeat * len(vectors)), scores
+
+    exact_s, truth = timed(exact)
+    ivf_s, approx = timed(ivf)
+    recall = np.mean([
+        np.sum(a >= b[-1] - 1e-6) / len(b) for a, b in zip(approx, truth) if len(b)
+    ])
+
+    print(f"exact: {exact_s * 1000:.2f} ms/query")
+    print(f"ivf:   {ivf_s * 1000:.2f} ms/query  recall@{args.k}={recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
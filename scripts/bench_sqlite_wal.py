@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+SQLite concurrency with and without performance mode (WAL + tuned pragmas).
+
+One writer thread saves workouts the way POST /workouts does (a Workouts row plus its
+workout_exercises, one commit each) while --readers threads run the GET /workouts/{id}
+join, all through make_engine's pool on a throwaway sqlite file, for --seconds per mode.
+
+Usage:
+  python3 scripts/bench_sqlite_wal.py --readers 4 --seconds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base, Workouts, workout_exercises
+from app.core.session import make_engine
+
+PROFILES = 200
+
+
+def _seed(factory, workouts: int) -> None:
+    with factory() as sess:
+        for w in range(1, workouts + 1):
+            sess.execute(insert(Workouts), [{"WorkoutID": w, "name": f"workout {w}"}])
+            sess.execute(insert(workout_exercises), [
+                {"WorkoutID": w, "ExerciseID": e, "MachineID": 1, "ProfileID": w % PROFILES, "sets": 3, "reps": 10}
+                for e in range(1, 6)
+            ])
+        sess.commit()
+
+
+def _run(performance: bool, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}", pool_size=args.readers + 1, max_overflow=0,
+            sqlite_performance=performance,
+        )
+        Base.metadata.create_all(engine)
+        factory = sessionmaker(bind=engine)
+        _seed(factory, 2_000)
+
+        stop = time.perf_counter() + args.seconds
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def writer():
+            next_id = 100_000
+            while time.perf_counter() < stop:
+                try:
+                    with factory() as sess:
+                        sess.execute(insert(Workouts), [{"WorkoutID": next_id, "name": "bench"}])
+                        sess.execute(insert(workout_exercises), [
+                            {"WorkoutID": next_id, "ExerciseID": e, "MachineID": 1,
+                             "ProfileID": next_id % PROFILES, "sets": 3, "reps": 10}
+                            for e in range(1, 6)
+                        ])
+                        sess.commit()
+                    next_id += 1
+                    key = "writes"
+                except OperationalError:
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+
+        def reader(seed: int):
+            rng = random.Random(seed)
+            while time.perf_counter() < stop:
+                try:
+                    with factory() as sess:
+                        (
+                            sess.query(Workouts.WorkoutID, Workouts.name, workout_exercises.ExerciseID)
+                            .join(workout_exercises, workout_exercises.WorkoutID == Workouts.WorkoutID)
+                            .filter(workout_exercises.ProfileID == rng.randrange(PROFILES))
+                            .all()
+                        )
+                    key = "reads"
+                except OperationalError:
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+
+        threads = [threading.Thread(target=writer)] + [
+            threading.Thread(target=reader, args=(i,)) for i in range(args.readers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+    return {k: v / args.seconds for k, v in counts.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for performance in (False, True):
+        r = _run(performance, args)
+        label = "WAL + pragmas" if performance else "default"
+        print(f"{label:<14} reads/s {r['reads']:9.0f}   writes/s {r['writes']:8.0f}   errors/s {r['errors']:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
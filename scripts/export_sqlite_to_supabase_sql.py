@@ -2,21 +2,36 @@
 """
 Generate a PostgreSQL-compatible migration SQL file from local forge.db.
 
+Rows are streamed from SQLite in chunks straight into the output file, so memory
+use does not grow with the database. Each chunk becomes one multi-row INSERT, or
+with --format copy one COPY ... FROM STDIN block (load that file with psql).
+
+With --jobs N, tables and rowid ranges of large tables (--partition-rows) are
+exported by N worker processes into part files next to --out; --out itself is
+then a psql manifest that creates the schema and includes (\\ir) the parts in
+foreign-key-safe order: psql -f docs/migrations/supabase_forge_migration.sql
+
 Usage:
   python3 scripts/export_sqlite_to_supabase_sql.py \
     --sqlite forge.db \
-    --out docs/migrations/supabase_forge_migration.sql
+    --out docs/migrations/supabase_forge_migration.sql \
+    [--format insert|copy] [--batch-size 1000] [--jobs 8] [--partition-rows 250000]
 """
 
 from __future__ import annotations
 
 import argparse
 import datetime as dt
+import os
+import math
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable, NamedTuple, Optional, TextIO
 import sys
 
+from sqlalchemy import Boolean, Table
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.schema import CreateTable
 
@@ -26,73 +41,115 @@ if str(ROOT) not in sys.path:
 
 from app.core.db import Base
 
+FORMATS = ("insert", "copy")
+
 
 def sql_literal(value: Any) -> str:
     if value is None:
         return "NULL"
     if isinstance(value, bool):
         return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and not math.isfinite(value):
+        return "'NaN'" if math.isnan(value) else ("'Infinity'" if value > 0 else "'-Infinity'")
     if isinstance(value, (int, float)):
         return str(value)
     if isinstance(value, (dt.datetime, dt.date)):
         return f"'{value.isoformat()}'"
+    if isinstance(value, bytes):
+        return f"'\\x{value.hex()}'::bytea"
     text = str(value).replace("'", "''")
     return f"'{text}'"
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--sqlite", default="forge.db")
-    parser.add_argument("--out", default="docs/migrations/supabase_forge_migration.sql")
-    args = parser.parse_args()
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
 
-    sqlite_path = Path(args.sqlite)
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    if not sqlite_path.exists():
-        raise SystemExit(f"SQLite DB not found: {sqlite_path}")
+def copy_field(value: Any) -> str:
+    """one field in COPY's text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, float) and not math.isfinite(value):
+        return "NaN" if math.isnan(value) else ("Infinity" if value > 0 else "-Infinity")
+    if isinstance(value, bytes):
+        return f"\\\\x{value.hex()}"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _converters(table: Table) -> list[Callable[[Any], Any]]:
+    # SQLite hands booleans back as 0/1, which postgres will not put in a boolean column
+    return [
+        (lambda v: v if v is None else bool(v)) if isinstance(c.type, Boolean) else (lambda v: v)
+        for c in table.columns
+    ]
 
-    conn = sqlite3.connect(str(sqlite_path))
-    conn.row_factory = sqlite3.Row
 
-    lines: list[str] = []
-    lines.append("-- Auto-generated by scripts/export_sqlite_to_supabase_sql.py")
-    lines.append("-- Source: forge.db")
-    lines.append("BEGIN;")
-    lines.append("SET session_replication_role = replica;")
-    lines.append("")
+def _select_list(conn: sqlite3.Connection, table: Table) -> str:
+    # a snapshot taken before a column was added gets the column's default (see app.core.schema_upgrade)
+    have = {row[1] for row in conn.execute(f'PRAGMA table_info("{table.name}")')}
+    cols = []
+    for c in table.columns:
+        if c.name in have:
+            cols.append(f'"{c.name}"')
+        else:
+            default = c.default.arg if c.default is not None and c.default.is_scalar else None
+            cols.append(f'{sql_literal(default)} AS "{c.name}"')
+    return ", ".join(cols)
+
+
+def iter_chunks(
+    conn: sqlite3.Connection, table: Table, batch_size: int, rowids: Optional[tuple[int, int]] = None,
+) -> Iterable[list[tuple]]:
+    """the table's rows in rowid order, batch_size at a time; rowids limits it to an inclusive range"""
+    cols = _select_list(conn, table)
+    where = "WHERE rowid BETWEEN ? AND ? " if rowids else ""
+    cur = conn.execute(f'SELECT {cols} FROM "{table.name}" {where}ORDER BY rowid', rowids or ())
+    convert = _converters(table)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield [tuple(f(v) for f, v in zip(convert, row)) for row in rows]
+
+
+def write_table(out: TextIO, table: Table, chunks: Iterable[list[tuple]], fmt: str) -> int:
+    """write the chunks as INSERT statements or COPY blocks; returns the row count"""
+    col_sql = ", ".join(f'"{c.name}"' for c in table.columns)
+    count = 0
+    for rows in chunks:
+        if fmt == "copy":
+            out.write(f'COPY "{table.name}" ({col_sql}) FROM STDIN;\n')
+            out.writelines("\t".join(copy_field(v) for v in row) + "\n" for row in rows)
+            out.write("\\.\n")
+        else:
+            out.write(f'INSERT INTO "{table.name}" ({col_sql}) VALUES\n')
+            out.write(",\n".join("(" + ", ".join(sql_literal(v) for v in row) + ")" for row in rows))
+            out.write(";\n")
+        count += len(rows)
+    return count
+
+
+def write_header(out: TextIO) -> None:
+    out.write("-- Auto-generated by scripts/export_sqlite_to_supabase_sql.py\n")
+    out.write("-- Source: forge.db\n")
+    out.write("BEGIN;\n")
+    out.write("SET session_replication_role = replica;\n\n")
 
     # Drop all app tables first, then recreate from SQLAlchemy metadata for PostgreSQL.
     for table in reversed(Base.metadata.sorted_tables):
-        lines.append(f'DROP TABLE IF EXISTS "{table.name}" CASCADE;')
-    lines.append("")
+        out.write(f'DROP TABLE IF EXISTS "{table.name}" CASCADE;\n')
+    out.write("\n")
 
     pg_dialect = postgresql.dialect()
     for table in Base.metadata.sorted_tables:
         ddl = str(CreateTable(table).compile(dialect=pg_dialect)).rstrip()
-        lines.append(f"{ddl};")
-        lines.append("")
-
-    table_counts: list[tuple[str, int]] = []
-    for table in Base.metadata.sorted_tables:
-        table_name = table.name
-        cols = [c.name for c in table.columns]
-        col_sql = ", ".join([f'"{c}"' for c in cols])
-
-        rows = conn.execute(f'SELECT * FROM "{table_name}"').fetchall()
-        table_counts.append((table_name, len(rows)))
-        if not rows:
-            continue
+        out.write(f"{ddl};\n\n")
 
-        lines.append(f'-- Data for "{table_name}" ({len(rows)} rows)')
-        for row in rows:
-            values = ", ".join(sql_literal(row[c]) for c in cols)
-            lines.append(f'INSERT INTO "{table_name}" ({col_sql}) VALUES ({values});')
-        lines.append("")
 
+def write_footer(out: TextIO) -> None:
     # Reset serial sequences after explicit PK inserts.
-    lines.append("-- Reset sequences")
+    out.write("-- Reset sequences\n")
     for table in Base.metadata.sorted_tables:
         pk_cols = list(table.primary_key.columns)
         if len(pk_cols) != 1:
@@ -100,25 +157,172 @@ def main() -> None:
         pk = pk_cols[0]
         if pk.type.__class__.__name__.lower() not in {"integer", "biginteger", "smallinteger"}:
             continue
-        lines.append(
+        out.write(
             f"SELECT setval("
             f"pg_get_serial_sequence('\"{table.name}\"', '{pk.name}'), "
             f"COALESCE((SELECT MAX(\"{pk.name}\") FROM \"{table.name}\"), 1), "
             f"(SELECT COUNT(*) > 0 FROM \"{table.name}\")"
-            f");"
+            f");\n"
         )
+    out.write("\n")
+    out.write("SET session_replication_role = DEFAULT;\n")
+    out.write("COMMIT;\n")
+
+
+def source_tables(conn: sqlite3.Connection) -> set[str]:
+    return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def connect_ro(sqlite_path: Path) -> sqlite3.Connection:
+    return sqlite3.connect(f"{sqlite_path.resolve().as_uri()}?mode=ro", uri=True)
 
-    lines.append("")
-    lines.append("SET session_replication_role = DEFAULT;")
-    lines.append("COMMIT;")
-    lines.append("")
 
-    out_path.write_text("\n".join(lines), encoding="utf-8")
+def export(sqlite_path: Path, out_path: Path, fmt: str = "insert", batch_size: int = 1000) -> list[tuple[str, int, float]]:
+    """stream every table into out_path; returns (table, rows, seconds) per table"""
+    conn = connect_ro(sqlite_path)
+    present = source_tables(conn)
+    timings: list[tuple[str, int, float]] = []
+    try:
+        with out_path.open("w", encoding="utf-8", newline="\n") as out:
+            write_header(out)
+            for table in Base.metadata.sorted_tables:
+                if table.name not in present:
+                    continue                # table newer than this snapshot, nothing to copy
+                start = time.perf_counter()
+                out.write(f'-- Data for "{table.name}"\n')
+                count = write_table(out, table, iter_chunks(conn, table, batch_size), fmt)
+                out.write(f"-- {count} rows\n\n")
+                timings.append((table.name, count, time.perf_counter() - start))
+            write_footer(out)
+    finally:
+        conn.close()
+    return timings
+
+
+class Part(NamedTuple):
+    table: str
+    index: int                          # 1-based, within the table
+    rowids: Optional[tuple[int, int]]   # None = the whole table
+    rows: int                           # estimate, for scheduling
+
+
+def plan_parts(conn: sqlite3.Connection, partition_rows: int) -> list[Part]:
+    """one part per table, or per rowid range of partition_rows rows for large tables, in FK-safe order"""
+    present = source_tables(conn)
+    parts: list[Part] = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in present:
+            continue
+        count, lo, hi = conn.execute(f'SELECT COUNT(*), MIN(rowid), MAX(rowid) FROM "{table.name}"').fetchone()
+        if not count:
+            continue
+        pieces = -(-count // partition_rows)
+        if pieces == 1:
+            parts.append(Part(table.name, 1, None, count))
+            continue
+        step = -(-(hi - lo + 1) // pieces)      # equal rowid spans; dense rowids make these equal row counts
+        for i, start in enumerate(range(lo, hi + 1, step), start=1):
+            parts.append(Part(table.name, i, (start, min(start + step - 1, hi)), count // pieces))
+    return parts
+
+
+def part_filename(order: int, part: Part) -> str:
+    return f"{order:03d}_{part.table}_{part.index:03d}.sql"
+
+
+def export_part(sqlite_path: Path, part: Part, path: Path, fmt: str, batch_size: int) -> tuple[int, float]:
+    """worker: one table or rowid range into its own file; returns (rows, seconds)"""
+    start = time.perf_counter()
+    table = Base.metadata.tables[part.table]
+    conn = connect_ro(sqlite_path)
+    try:
+        with path.open("w", encoding="utf-8", newline="\n") as out:
+            span = f" rowid {part.rowids[0]}-{part.rowids[1]}" if part.rowids else ""
+            out.write(f'-- Data for "{part.table}" part {part.index}{span}\n')
+            count = write_table(out, table, iter_chunks(conn, table, batch_size, part.rowids), fmt)
+            out.write(f"-- {count} rows\n")
+    finally:
+        conn.close()
+    return count, time.perf_counter() - start
+
+
+def export_parallel(
+    sqlite_path: Path, out_path: Path, fmt: str = "insert", batch_size: int = 1000,
+    jobs: int = os.cpu_count() or 1, partition_rows: int = 250_000,
+) -> list[tuple[str, int, float]]:
+    """
+    export the parts with a pool of `jobs` processes into <out>.parts/, then write out_path as the
+    manifest that loads them in FK-safe order; returns (table, rows, worker seconds) per table
+    """
+    conn = connect_ro(sqlite_path)
+    try:
+        parts = plan_parts(conn, partition_rows)
+    finally:
+        conn.close()
+
+    parts_dir = out_path.with_name(f"{out_path.stem}.parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    for stale in parts_dir.glob("*.sql"):
+        stale.unlink()
+    names = [part_filename(order, part) for order, part in enumerate(parts, start=1)]
+
+    # largest parts first so one big table does not start last and hold up the pool
+    schedule = sorted(range(len(parts)), key=lambda i: parts[i].rows, reverse=True)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            i: pool.submit(export_part, sqlite_path, parts[i], parts_dir / names[i], fmt, batch_size)
+            for i in schedule
+        }
+        results = [futures[i].result() for i in range(len(parts))]
+
+    timings: dict[str, list] = {}
+    with out_path.open("w", encoding="utf-8", newline="\n") as out:
+        write_header(out)
+        out.write("-- Data, one file per table or rowid range, in foreign-key-safe order\n")
+        for part, name, (count, seconds) in zip(parts, names, results):
+            out.write(f"\\ir {parts_dir.name}/{name}\n")
+            total = timings.setdefault(part.table, [part.table, 0, 0.0])
+            total[1] += count
+            total[2] += seconds
+        out.write("\n")
+        write_footer(out)
+    return [tuple(t) for t in timings.values()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sqlite", default="forge.db")
+    parser.add_argument("--out", default="docs/migrations/supabase_forge_migration.sql")
+    parser.add_argument("--format", choices=FORMATS, default="insert",
+                        help="multi-row INSERTs (any client) or COPY FROM STDIN blocks (psql, faster to load)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per INSERT / COPY block")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes; above 1, writes part files plus a psql manifest at --out")
+    parser.add_argument("--partition-rows", type=int, default=250_000,
+                        help="with --jobs, tables larger than this are split into rowid ranges of about this size")
+    args = parser.parse_args()
+
+    sqlite_path = Path(args.sqlite)
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if not sqlite_path.exists():
+        raise SystemExit(f"SQLite DB not found: {sqlite_path}")
+    if args.batch_size < 1:
+        raise SystemExit("--batch-size must be at least 1")
+    if args.jobs < 1 or args.partition_rows < 1:
+        raise SystemExit("--jobs and --partition-rows must be at least 1")
+
+    start = time.perf_counter()
+    if args.jobs > 1:
+        timings = export_parallel(sqlite_path, out_path, args.format, args.batch_size, args.jobs, args.partition_rows)
+    else:
+        timings = export(sqlite_path, out_path, args.format, args.batch_size)
 
-    print(f"Wrote SQL migration: {out_path}")
-    print("Row counts in source SQLite:")
-    for name, count in table_counts:
-        print(f"- {name}: {count}")
+    print(f"Wrote SQL migration: {out_path} ({time.perf_counter() - start:.2f}s)")
+    print("Rows exported per table:")
+    for name, count, seconds in timings:
+        print(f"- {name}: {count} rows in {seconds:.2f}s")
 
 
 if __name__ == "__main__":